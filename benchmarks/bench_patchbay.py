@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+'''Benchmarks of the patchbay manager and canvas on synthetic graphs.
+
+The graph is generated in a fake engine (no JACK needed), the GUI runs
+on the offscreen Qt platform, so it works on a server.
+
+Usage: bench_patchbay.py [--clients N] [--ports N] [--connections F]
+                         [--metadatas F] [--repeat N] [--seed N]
+                         [--json OUT_FILE] [--compare OLD_FILE]
+
+--ports is the number of output and input ports per client,
+--connections the average number of connections per output port,
+--metadatas the ratio of ports with a pretty-name metadata.
+Results are given in milliseconds, --json writes them with the
+parameters, and --compare prints the ratios with a previous result file.'''
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).parents[1] / 'src'))
+
+import offscreen_patchbay
+
+
+JACK_PORT_IS_INPUT = 0x1
+JACK_PORT_IS_OUTPUT = 0x2
+JACK_METADATA_PRETTY_NAME = 'http://jackaudio.org/metadata/pretty-name'
+
+RESULTS_FORMAT = 'patchance-bench'
+
+
+def generate_graph(n_clients: int, n_ports: int, connections: float,
+                   metadatas: float, seed: int) -> dict:
+    '''return a graph state, in the format of engine_recorder'''
+    from patshared import PortType
+
+    rand = random.Random(seed)
+    uuid = 1
+    ports = list[list]()
+    clients = dict[str, int]()
+    outs = dict[PortType, list[str]]()
+    ins = dict[PortType, list[str]]()
+    metadatas_dict = dict[str, dict[str, str]]()
+
+    for i in range(n_clients):
+        client_name = f'client_{i:04d}'
+        clients[client_name] = uuid
+        uuid += 1
+
+        for flags, prefix, port_list in (
+                (JACK_PORT_IS_OUTPUT, 'out', outs),
+                (JACK_PORT_IS_INPUT, 'in', ins)):
+            for j in range(n_ports):
+                # one MIDI port for 8 audio ports
+                if j % 8 == 7:
+                    port_type = PortType.MIDI_JACK
+                    port_name = f'{client_name}:midi_{prefix}_{j + 1}'
+                else:
+                    port_type = PortType.AUDIO_JACK
+                    port_name = f'{client_name}:audio_{prefix}_{j + 1}'
+
+                ports.append([port_name, int(port_type), flags, uuid])
+                port_list.setdefault(port_type, []).append(port_name)
+                if rand.random() < metadatas:
+                    metadatas_dict[str(uuid)] = {
+                        JACK_METADATA_PRETTY_NAME:
+                            f'Pretty {prefix} {i}.{j + 1}'}
+                uuid += 1
+
+    conns = set[tuple[str, str]]()
+    for port_type, out_names in outs.items():
+        in_names = ins.get(port_type, [])
+        if not in_names:
+            continue
+        n_conns = int(len(out_names) * connections)
+        for _ in range(n_conns):
+            conns.add((rand.choice(out_names), rand.choice(in_names)))
+
+    return {'ports': ports,
+            'connections': [list(c) for c in sorted(conns)],
+            'clients': clients,
+            'metadatas': metadatas_dict,
+            'samplerate': 48000,
+            'buffer_size': 256}
+
+
+class Bench:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results = dict[str, dict[str, float]]()
+
+    def measure(self, name: str, func: Callable,
+                setup: Callable | None=None):
+        times = list[float]()
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            t0 = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - t0) * 1000)
+
+        self.results[name] = {'min': min(times),
+                              'median': statistics.median(times),
+                              'mean': statistics.fmean(times),
+                              'max': max(times),
+                              'runs': len(times)}
+        sys.stderr.write(
+            f'{name.ljust(28)} {statistics.median(times):10.2f} ms\n')
+
+
+def run_benchmarks(graph: dict, repeat: int) -> dict[str, dict[str, float]]:
+    from qtpy.QtWidgets import QApplication
+    from patchbay.bases.elements import CanvasOptimizeIt
+    from fake_engine import FakePatchEngine
+
+    engine = FakePatchEngine()
+    config_dir = offscreen_patchbay.copy_config_dir(None)
+    main = offscreen_patchbay.build(engine, config_dir)
+    mng = main.patchbay_manager
+    mng.reconcile_on_restart = False
+    bench = Bench(repeat)
+
+    def clear():
+        engine.jack_running = False
+        mng.server_stopped()
+        QApplication.processEvents()
+        engine.set_state(graph)
+
+    def fill():
+        clear()
+        mng.server_restarted()
+
+    bench.measure('server_restarted', mng.server_restarted, clear)
+    bench.measure('first_draw', QApplication.processEvents, fill)
+
+    def add_ports():
+        with CanvasOptimizeIt(mng):
+            for port in engine.ports:
+                mng.add_port(port.name, port.type, port.flags, port.uuid)
+            for connection in engine.connections:
+                mng.add_connection(*connection)
+
+    bench.measure('add_port_optimized', add_ports, clear)
+
+    def add_ports_only():
+        clear()
+        add_ports()
+
+    bench.measure('apply_delayed_changes_now',
+                  mng.apply_delayed_changes_now, add_ports_only)
+
+    fill()
+    QApplication.processEvents()
+
+    bench.measure('pretty_diff_full_update',
+                  mng.pretty_diff_checker.full_update)
+
+    def switch_views():
+        mng.change_view(2)
+        QApplication.processEvents()
+        mng.change_view(1)
+        QApplication.processEvents()
+
+    # first switch creates the view 2
+    switch_views()
+    bench.measure('change_view_2_and_back', switch_views)
+
+    n_saves = 0
+
+    def dirty_layout():
+        # an unchanged memory is not written again
+        nonlocal n_saves
+        n_saves += 1
+        mng.custom_names.save_group('client_0000', f'bench save {n_saves}')
+
+    bench.measure('save_positions', mng.save_positions, dirty_layout)
+    bench.measure('load_memory_file', mng._load_memory_file)
+
+    main.close()
+    shutil.rmtree(config_dir, ignore_errors=True)
+    return bench.results
+
+
+def _print_comparison(results: dict, old_file: Path):
+    with open(old_file, 'r') as f:
+        old = json.load(f)
+
+    lines = [f"{'benchmark'.ljust(28)} {'old ms':>10} {'new ms':>10} "
+             f"{'ratio':>7}"]
+    for name, result in results['results'].items():
+        old_result = old.get('results', {}).get(name)
+        if old_result is None:
+            continue
+        old_median = old_result['median']
+        new_median = result['median']
+        ratio = new_median / old_median if old_median else 0.0
+        lines.append(f'{name.ljust(28)} {old_median:10.2f} '
+                     f'{new_median:10.2f} {ratio:7.2f}')
+
+    if old.get('params') != results['params']:
+        lines.append('warning: the graph parameters are different')
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks of the Patchance patchbay')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--ports', type=int, default=16,
+                        help='output and input ports per client')
+    parser.add_argument('--connections', type=float, default=1.0,
+                        help='average connections per output port')
+    parser.add_argument('--metadatas', type=float, default=0.5,
+                        help='ratio of ports with a pretty-name')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=Path, dest='json_file')
+    parser.add_argument('--compare', type=Path)
+    args = parser.parse_args()
+
+    offscreen_patchbay.prepare()
+
+    params = {'clients': args.clients,
+              'ports': args.ports,
+              'connections': args.connections,
+              'metadatas': args.metadatas,
+              'seed': args.seed}
+    graph = generate_graph(args.clients, args.ports, args.connections,
+                           args.metadatas, args.seed)
+    sys.stderr.write(
+        f"graph: {len(graph['ports'])} ports, "
+        f"{len(graph['connections'])} connections\n")
+
+    results = {'format': RESULTS_FORMAT,
+               'date': time.time(),
+               'python': platform.python_version(),
+               'params': params,
+               'results': run_benchmarks(graph, max(args.repeat, 1))}
+
+    if args.json_file is not None:
+        with open(args.json_file, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+    if args.compare is not None:
+        _print_comparison(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
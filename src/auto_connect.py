@@ -0,0 +1,346 @@
+'''Rule based auto-connection.
+
+Rules are read from auto_connect.json in the config dir:
+
+{"rules": [
+    {"out": "Ardour:Master/audio_out *",
+     "in": "system:playback_*",
+     "type": "AUDIO_JACK"},
+    {"out": "^a2j:(.*) \\\\[\\\\d+\\\\] \\\\(capture\\\\)", "regex": true,
+     "in": "Ardour:MIDI in*"}
+]}
+
+"out" and "in" are glob patterns (or regular expressions with
+"regex": true) on full port names. "type" (a PortType name)
+is optional.
+
+When one side of a rule is a literal port name, this port is connected
+to all the ports matching the other side. Else, the ports of each side
+are sorted (numbers in natural order) and paired by index, so the
+first rule above connects "Ardour:Master/audio_out 1" to
+"system:playback_1" and "Ardour:Master/audio_out 2" to
+"system:playback_2". Only ports of the same type are connected.
+
+Rules are indexed by the client name of their pattern when it is
+literal, so a new port is only checked against the rules
+of its client and the rules with a wildcard client. The ports matching
+each side of each rule are kept, rules never scan all the ports.'''
+
+import fnmatch
+import json
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from patshared import PortType
+
+
+_logger = logging.getLogger(__name__)
+
+RULES_FILE = 'auto_connect.json'
+
+JACK_PORT_IS_INPUT = 0x1
+
+_GLOB_CHARS = re.compile(r'[*?\[]')
+_REGEX_CHARS = re.compile(r'[\\.^$*+?{}\[\]|()]')
+_DIGITS = re.compile(r'(\d+)')
+
+
+@dataclass
+class AutoConnectRule:
+    out_pattern: str
+    in_pattern: str
+    port_type: str = ''
+    regex: bool = False
+    enabled: bool = True
+
+    @staticmethod
+    def from_json(json_dict: dict) -> 'AutoConnectRule':
+        return AutoConnectRule(
+            str(json_dict['out']), str(json_dict['in']),
+            str(json_dict.get('type', '')),
+            bool(json_dict.get('regex', False)),
+            bool(json_dict.get('enabled', True)))
+
+    def to_json(self) -> dict:
+        json_dict = {'out': self.out_pattern, 'in': self.in_pattern}
+        if self.port_type:
+            json_dict['type'] = self.port_type
+        if self.regex:
+            json_dict['regex'] = True
+        if not self.enabled:
+            json_dict['enabled'] = False
+        return json_dict
+
+
+@dataclass
+class _CompiledSide:
+    rule_index: int
+    matcher: re.Pattern
+    port_type: Optional['PortType']
+    literal_client: Optional[str]
+    literal: bool
+    'the pattern matches only one port name'
+
+
+def _natural_key(port_name: str) -> list:
+    '''sort key with numbers in natural order,
+    'playback_2' before 'playback_10'.'''
+    return [int(t) if t.isdigit() else t for t in _DIGITS.split(port_name)]
+
+
+def _is_literal(pattern: str, regex: bool) -> bool:
+    if regex:
+        return (pattern.startswith('^') and pattern.endswith('$')
+                and not _REGEX_CHARS.search(pattern[1:-1]))
+    return not _GLOB_CHARS.search(pattern)
+
+
+def _literal_client(pattern: str, regex: bool) -> Optional[str]:
+    '''return the client name if it is literal in the pattern'''
+    if regex:
+        if not pattern.startswith('^'):
+            return None
+        client, sep, _ = pattern[1:].partition(':')
+        if not sep or _REGEX_CHARS.search(client):
+            return None
+        return client
+
+    client, sep, _ = pattern.partition(':')
+    if not sep or _GLOB_CHARS.search(client):
+        return None
+    return client
+
+
+class RuleIndex:
+    '''rules compiled once, indexed by side and literal client name'''
+
+    def __init__(self, rules: list[AutoConnectRule]):
+        self.rules = rules
+        # index by side, True for the 'out' side
+        self._by_client = {True: dict[str, list[_CompiledSide]](),
+                           False: dict[str, list[_CompiledSide]]()}
+        self._wildcards = {True: list[_CompiledSide](),
+                           False: list[_CompiledSide]()}
+        self._sides = dict[tuple[int, bool], _CompiledSide]()
+
+        for i, rule in enumerate(rules):
+            if not rule.enabled:
+                continue
+
+            port_type: Optional['PortType'] = None
+            if rule.port_type:
+                from patshared import PortType
+                try:
+                    port_type = PortType[rule.port_type]
+                except KeyError:
+                    _logger.warning(
+                        f'unknown port type {rule.port_type}, rule ignored')
+                    continue
+
+            try:
+                compiled = [
+                    (is_out, self._compile(pattern, rule.regex))
+                    for is_out, pattern in ((True, rule.out_pattern),
+                                            (False, rule.in_pattern))]
+            except re.error as e:
+                _logger.warning(f'invalid rule pattern: {str(e)}')
+                continue
+
+            for is_out, matcher in compiled:
+                pattern = rule.out_pattern if is_out else rule.in_pattern
+                side = _CompiledSide(
+                    i, matcher, port_type,
+                    _literal_client(pattern, rule.regex),
+                    _is_literal(pattern, rule.regex))
+                self._sides[(i, is_out)] = side
+                if side.literal_client is None:
+                    self._wildcards[is_out].append(side)
+                else:
+                    self._by_client[is_out].setdefault(
+                        side.literal_client, []).append(side)
+
+    def _compile(self, pattern: str, regex: bool) -> re.Pattern:
+        if regex:
+            return re.compile(pattern)
+        return re.compile(fnmatch.translate(pattern))
+
+    def matching_rules(self, port_name: str, port_type: int,
+                       is_out: bool) -> list[int]:
+        client = port_name.partition(':')[0]
+        rule_indexes = list[int]()
+        for side in (self._by_client[is_out].get(client, [])
+                     + self._wildcards[is_out]):
+            if side.port_type is not None and side.port_type != port_type:
+                continue
+            if side.matcher.match(port_name):
+                rule_indexes.append(side.rule_index)
+        return rule_indexes
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._sides
+
+    def side(self, rule_index: int, is_out: bool) -> _CompiledSide:
+        return self._sides[(rule_index, is_out)]
+
+
+def load_rules(config_dir: Path) -> list[AutoConnectRule]:
+    path = config_dir / RULES_FILE
+    if not path.is_file():
+        return []
+
+    try:
+        with open(path, 'r') as f:
+            json_dict = json.load(f)
+        return [AutoConnectRule.from_json(r) for r in json_dict['rules']]
+    except Exception as e:
+        _logger.warning(f'{path} is incorrectly written: {str(e)}')
+        return []
+
+
+class AutoConnector:
+    '''Keeps the ports matching each side of each rule, collects
+    the ports added during a patch events pass and resolves
+    all their rules at once.'''
+
+    def __init__(self, rules: list[AutoConnectRule],
+                 connect_many: Callable[[list[tuple[str, str]]], None]):
+        self.index = RuleIndex(rules)
+        self.connect_many = connect_many
+        self.connections: Optional[Callable[[], list[tuple[str, str]]]] = None
+        'if set, returns current connections, to not connect them again'
+
+        self._ports = dict[str, tuple[int, bool]]()
+        'port type and is_out of each port'
+        self._side_ports = dict[tuple[int, bool], set[str]]()
+        'ports matching each (rule_index, is_out) side'
+        self._new_ports = list[str]()
+
+    @property
+    def active(self) -> bool:
+        return not self.index.is_empty
+
+    def set_rules(self, rules: list[AutoConnectRule]):
+        self.index = RuleIndex(rules)
+        self._side_ports.clear()
+        for port_name in self._ports:
+            self._match_port(port_name)
+
+    def _match_port(self, name: str):
+        port_type, is_out = self._ports[name]
+        for rule_index in self.index.matching_rules(name, port_type, is_out):
+            self._side_ports.setdefault(
+                (rule_index, is_out), set()).add(name)
+
+    def port_added(self, name: str, port_type: int, flags: int):
+        is_out = not bool(flags & JACK_PORT_IS_INPUT)
+        self._ports[name] = (port_type, is_out)
+        if self.active:
+            self._match_port(name)
+            self._new_ports.append(name)
+
+    def port_removed(self, name: str):
+        port = self._ports.pop(name, None)
+        if port is None:
+            return
+
+        port_type, is_out = port
+        for rule_index in self.index.matching_rules(name, port_type, is_out):
+            side_ports = self._side_ports.get((rule_index, is_out))
+            if side_ports is not None:
+                side_ports.discard(name)
+
+    def port_renamed(self, ex_name: str, new_name: str):
+        port = self._ports.get(ex_name)
+        if port is None:
+            return
+        self.port_removed(ex_name)
+        self._ports[new_name] = port
+        self._match_port(new_name)
+
+    def clear(self):
+        self._ports.clear()
+        self._side_ports.clear()
+        self._new_ports.clear()
+
+    def _rule_pairs(self, rule_index: int) -> list[tuple[str, str]]:
+        out_ports = self._side_ports.get((rule_index, True))
+        in_ports = self._side_ports.get((rule_index, False))
+        if not out_ports or not in_ports:
+            return []
+
+        pairs = list[tuple[str, str]]()
+        if (self.index.side(rule_index, True).literal
+                or self.index.side(rule_index, False).literal):
+            for port_out_name in out_ports:
+                for port_in_name in in_ports:
+                    if (self._ports[port_out_name][0]
+                            == self._ports[port_in_name][0]):
+                        pairs.append((port_out_name, port_in_name))
+            return pairs
+
+        # pair the ports by index, type by type
+        outs_by_type = dict[int, list[str]]()
+        for port_out_name in out_ports:
+            outs_by_type.setdefault(
+                self._ports[port_out_name][0], []).append(port_out_name)
+        ins_by_type = dict[int, list[str]]()
+        for port_in_name in in_ports:
+            ins_by_type.setdefault(
+                self._ports[port_in_name][0], []).append(port_in_name)
+
+        for port_type, port_out_names in outs_by_type.items():
+            port_in_names = ins_by_type.get(port_type)
+            if port_in_names is None:
+                continue
+            pairs += zip(sorted(port_out_names, key=_natural_key),
+                         sorted(port_in_names, key=_natural_key))
+        return pairs
+
+    def _pairs_for_ports(self, port_names: list[str]) \
+            -> set[tuple[str, str]]:
+        '''pairs of the rules matching these ports,
+        with at least one of these ports.'''
+        ports = set(port_names)
+        rule_indexes = set[int]()
+        for port_name in ports:
+            port = self._ports.get(port_name)
+            if port is not None:
+                rule_indexes.update(
+                    self.index.matching_rules(port_name, *port))
+
+        pairs = set[tuple[str, str]]()
+        for rule_index in rule_indexes:
+            for pair in self._rule_pairs(rule_index):
+                if pair[0] in ports or pair[1] in ports:
+                    pairs.add(pair)
+        return pairs
+
+    def resolve(self):
+        '''connect the ports added since the last call,
+        to be called at the end of each patch events pass.'''
+        if not self._new_ports:
+            return
+
+        new_ports = self._new_ports
+        self._new_ports = []
+        self._connect(self._pairs_for_ports(new_ports))
+
+    def resolve_all(self):
+        '''apply the rules to all the known ports'''
+        self._new_ports.clear()
+        pairs = set[tuple[str, str]]()
+        for rule_index in {k[0] for k in self._side_ports}:
+            pairs.update(self._rule_pairs(rule_index))
+        self._connect(pairs)
+
+    def _connect(self, pairs: set[tuple[str, str]]):
+        if self.connections is not None:
+            pairs -= set(self.connections())
+        if pairs:
+            _logger.info(f'auto-connect {len(pairs)} connections')
+            self.connect_many(sorted(pairs))
@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+_logger = logging.getLogger(__name__)
+
+BACKUP_GENERATIONS = 3
+
+
+def backup_path(path: Path, generation: int) -> Path:
+    return path.with_name(f'{path.name}.{generation}')
+
+
+def memory_file_candidates(path: Path) -> list[Path]:
+    '''the memory file, then its backups from the most recent one.'''
+    return [path] + [backup_path(path, i)
+                     for i in range(1, BACKUP_GENERATIONS + 1)]
+
+
+class MemoryFileWriter:
+    '''Writes the canvas memory file atomically.
+
+    Contents are written in a temporary file, synced and then renamed
+    over the memory file, so a crash can not leave a half written file.
+    A write with the same contents as the last one is skipped.
+    At the first write of the session, previous file is kept as
+    backup, with BACKUP_GENERATIONS rotating generations.
+    The memory file itself is never moved, so it always exists.'''
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._last_digest = b''
+        self._rotated = False
+        self._lock = threading.Lock()
+        self._pending: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _digest(self, contents: str) -> bytes:
+        return hashlib.blake2b(contents.encode()).digest()
+
+    def set_file_contents(self, contents: str):
+        '''contents read in the file at startup. Writing the same
+        contents is skipped, and does not rotate the backups.'''
+        self._last_digest = self._digest(contents)
+
+    def _rotate_backups(self):
+        if not self.path.exists():
+            return
+
+        for i in range(BACKUP_GENERATIONS, 1, -1):
+            older = backup_path(self.path, i - 1)
+            if older.exists():
+                os.replace(older, backup_path(self.path, i))
+
+        # the memory file is replaced just after,
+        # a hard link is enough to keep its contents.
+        first_backup = backup_path(self.path, 1)
+        first_backup.unlink(missing_ok=True)
+        try:
+            os.link(self.path, first_backup)
+        except OSError:
+            shutil.copy2(self.path, first_backup)
+
+    def _write_now(self, contents: str, digest: bytes):
+        tmp_path = self.path.with_name(f'.{self.path.name}.tmp')
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(contents)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if not self._rotated:
+                self._rotate_backups()
+                self._rotated = True
+
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            _logger.warning(f'Failed to save {self.path}: {str(e)}')
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return
+
+        self._last_digest = digest
+        _logger.debug(f'{self.path} saved')
+
+    def write(self, contents: str):
+        '''write contents now, in the current thread'''
+        with self._lock:
+            # contents given to the thread are obsolete
+            self._pending = None
+        self.wait()
+
+        digest = self._digest(contents)
+        if digest == self._last_digest:
+            return
+
+        self._write_now(contents, digest)
+
+    def write_in_thread(self, contents: str):
+        '''write contents in a background thread.
+        If a write is already running, only the last contents
+        given meanwhile will be written after it.'''
+        with self._lock:
+            self._pending = contents
+            if self._thread is not None:
+                # the running thread will write it
+                return
+
+            self._thread = threading.Thread(
+                target=self._thread_run, name='patchance-memory-writer',
+                daemon=True)
+            self._thread.start()
+
+    def _thread_run(self):
+        while True:
+            # the lock is held only to take the pending contents,
+            # never while writing.
+            with self._lock:
+                contents = self._pending
+                self._pending = None
+                if contents is None:
+                    self._thread = None
+                    return
+
+            digest = self._digest(contents)
+            if digest != self._last_digest:
+                self._write_now(contents, digest)
+
+    def wait(self):
+        '''wait for the background write to finish'''
+        thread = self._thread
+        if thread is not None:
+            thread.join()
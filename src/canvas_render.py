@@ -0,0 +1,167 @@
+'''Export of the patchbay canvas to SVG or PNG without showing
+any window, with `patchance --render FILE [--view N]`.
+
+The canvas memory is loaded from the config dir, the graph is
+the live JACK graph. PNG files are rendered and compressed
+strip by strip, so a huge canvas never needs a full size image
+in memory.'''
+
+import logging
+import os
+import shutil
+import struct
+import sys
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Optional, Union
+
+import offscreen_patchbay
+
+if TYPE_CHECKING:
+    from qtpy.QtCore import QRectF
+    from qtpy.QtWidgets import QGraphicsScene
+    from patch_engine import PatchEngine
+    from fake_engine import FakePatchEngine
+
+
+_logger = logging.getLogger(__name__)
+
+MARGIN = 20
+STRIP_BYTES = 16 * 1024 * 1024
+'max size of the image rendered at once for PNG export'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _write_chunk(f: BinaryIO, chunk_type: bytes, data: bytes):
+    f.write(struct.pack('>I', len(data)))
+    f.write(chunk_type)
+    f.write(data)
+    f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+def _image_bytes(image) -> bytes:
+    bits = image.constBits()
+    if hasattr(bits, 'setsize'):
+        # PyQt returns a sip.voidptr
+        bits.setsize(image.sizeInBytes())
+    return bytes(bits)
+
+
+def render_svg(scene: 'QGraphicsScene', source: 'QRectF', path: Path):
+    from qtpy.QtCore import QRectF, QSize
+    from qtpy.QtGui import QPainter
+    from qtpy.QtSvg import QSvgGenerator
+
+    width, height = int(source.width()), int(source.height())
+    generator = QSvgGenerator()
+    generator.setFileName(str(path))
+    generator.setSize(QSize(width, height))
+    generator.setViewBox(QRectF(0, 0, width, height))
+    generator.setTitle('Patchance')
+
+    painter = QPainter(generator)
+    scene.render(painter, QRectF(0, 0, width, height), source)
+    painter.end()
+
+
+def render_png(scene: 'QGraphicsScene', source: 'QRectF', path: Path):
+    from qtpy.QtCore import QRectF, Qt
+    from qtpy.QtGui import QImage, QPainter
+
+    width, height = int(source.width()), int(source.height())
+    row_bytes = width * 4
+    strip_height = max(1, min(height, STRIP_BYTES // row_bytes))
+    image = QImage(width, strip_height, QImage.Format.Format_RGBA8888)
+    compressor = zlib.compressobj(6)
+
+    with open(path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        _write_chunk(f, b'IHDR', struct.pack(
+            '>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+        for top in range(0, height, strip_height):
+            rows = min(strip_height, height - top)
+            image.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            scene.render(
+                painter, QRectF(0, 0, width, rows),
+                QRectF(source.left(), source.top() + top, width, rows))
+            painter.end()
+
+            data = _image_bytes(image)
+            line_bytes = image.bytesPerLine()
+            scanlines = bytearray()
+            for row in range(rows):
+                # filter type 0 (None) for each scanline
+                scanlines.append(0)
+                scanlines += data[row * line_bytes:
+                                  row * line_bytes + row_bytes]
+
+            compressed = compressor.compress(bytes(scanlines))
+            if compressed:
+                _write_chunk(f, b'IDAT', compressed)
+
+        _write_chunk(f, b'IDAT', compressor.flush())
+        _write_chunk(f, b'IEND', b'')
+
+
+def render(out_path: Path, config_dir: Path,
+           view_num: Optional[int]=None) -> int:
+    if out_path.suffix.lower() not in ('.svg', '.png'):
+        sys.stderr.write(f'{out_path}: only SVG and PNG are supported\n')
+        return 1
+
+    # even from a graphical session, never show any window
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    offscreen_patchbay.prepare()
+
+    from patch_engine import PatchEngine
+
+    return render_engine(
+        PatchEngine('PatchanceRender'), out_path, config_dir, view_num)
+
+
+def render_engine(engine: Union['PatchEngine', 'FakePatchEngine'],
+                  out_path: Path, config_dir: Path,
+                  view_num: Optional[int]=None) -> int:
+    '''render the graph of `engine`, once `offscreen_patchbay.prepare()`
+    has been called.'''
+    from ptc_patch_engine_outer import PtcPatchEngineOuter
+
+    # never modify the user files
+    tmp_config_dir = offscreen_patchbay.copy_config_dir(config_dir)
+    main = offscreen_patchbay.build(engine, tmp_config_dir, show=False)
+    mng = main.patchbay_manager
+
+    outer = PtcPatchEngineOuter(mng)
+    engine.start(outer)
+    if not engine.jack_running:
+        _logger.warning('JACK is not running, the canvas will be empty')
+
+    # the engine queues the events of the existing ports and
+    # connections at start, the GUI timer is not there to drain them.
+    engine.process_patch_events()
+    outer.patch_events_processed()
+
+    if view_num is not None:
+        mng.change_view(view_num)
+
+    mng.apply_delayed_changes_now()
+    main.app.processEvents()
+
+    scene = main.main_win.ui.graphicsView.scene()
+    source = scene.itemsBoundingRect().adjusted(
+        -MARGIN, -MARGIN, MARGIN, MARGIN)
+
+    if out_path.suffix.lower() == '.svg':
+        render_svg(scene, source, out_path)
+    else:
+        render_png(scene, source, out_path)
+
+    _logger.info(f'{out_path} rendered, '
+                 f'{int(source.width())}x{int(source.height())} px')
+    engine.exit()
+    main.close()
+    shutil.rmtree(tmp_config_dir, ignore_errors=True)
+    return 0
@@ -0,0 +1,66 @@
+'''Connection changes requested in one batch, without Qt,
+used by `PatchancePatchbayManager.change_connections`.
+
+The connection changes notified by the engine for the pairs of the
+batch are held, to be drawn in the canvas in one step when all of them
+are notified (or when the batch times out).'''
+
+from typing import Iterable
+
+
+class ConnectionBatch:
+    def __init__(self):
+        self.pending = set[tuple[str, str]]()
+        'connections of the batch not notified yet'
+        self._changes = list[tuple[bool, str, str]]()
+        '''(added, port_out_name, port_in_name) connection changes
+        of the batch, applied together when the batch ends'''
+        self._changed = set[tuple[str, str]]()
+        'connections in self._changes'
+
+    @property
+    def complete(self) -> bool:
+        '''all the connections of the batch are notified (or failed)'''
+        return not self.pending
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self._changes)
+
+    def add_pairs(self, pairs: Iterable[tuple[str, str]]):
+        self.pending.update(pairs)
+
+    def pairs_failed(self, pairs: Iterable[tuple[str, str]]):
+        '''these pairs will never be notified'''
+        self.pending.difference_update(pairs)
+
+    def conflicts(self, port_out_name: str, port_in_name: str) -> bool:
+        '''True if a change of this connection out of the batch follows
+        a held one, the batch must then end first to keep the order.'''
+        pair = (port_out_name, port_in_name)
+        return pair not in self.pending and pair in self._changed
+
+    def hold(self, added: bool,
+             port_out_name: str, port_in_name: str) -> bool:
+        '''keep the connection change for the end of the batch
+        if it is part of the batch.'''
+        pair = (port_out_name, port_in_name)
+        if pair not in self.pending:
+            return False
+
+        self.pending.discard(pair)
+        self._changes.append((added, port_out_name, port_in_name))
+        self._changed.add(pair)
+        return True
+
+    def take(self) -> list[tuple[bool, str, str]]:
+        '''end the batch, even if some of its connections have not been
+        notified, and return its held changes in order.'''
+        changes = self._changes
+        self.clear()
+        return changes
+
+    def clear(self):
+        self.pending = set()
+        self._changes = []
+        self._changed = set()
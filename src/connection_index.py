@@ -0,0 +1,159 @@
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from patchbay.bases.connection import Connection
+    from patchbay import PatchbayManager
+
+
+class ConnectionList:
+    '''List-like container of the manager connections,
+    keyed by connection id, so that `remove` does not scan the list.
+    Iteration is in insertion order, on a copy, so connections
+    can be removed while iterating.'''
+
+    def __init__(self, conns: Iterable['Connection']=()):
+        self._conns = {conn.connection_id: conn for conn in conns}
+
+    def append(self, conn: 'Connection'):
+        self._conns[conn.connection_id] = conn
+
+    def remove(self, conn: 'Connection'):
+        if self._conns.get(conn.connection_id) is not conn:
+            raise ValueError('ConnectionList.remove(x): x not in list')
+        del self._conns[conn.connection_id]
+
+    def clear(self):
+        self._conns.clear()
+
+    def copy(self) -> list['Connection']:
+        return list(self._conns.values())
+
+    def __iter__(self) -> Iterator['Connection']:
+        return iter(tuple(self._conns.values()))
+
+    def __reversed__(self) -> Iterator['Connection']:
+        return iter(tuple(reversed(self._conns.values())))
+
+    def __len__(self) -> int:
+        return len(self._conns)
+
+    def __contains__(self, conn: 'Connection') -> bool:
+        return self._conns.get(conn.connection_id) is conn
+
+    def __getitem__(self, index: int) -> 'Connection':
+        if index == -1 and self._conns:
+            return next(reversed(self._conns.values()))
+        return list(self._conns.values())[index]
+
+
+class ConnectionIndex:
+    '''Dictionnary indexes of the manager connections,
+    by connection id, by (port_out full name, port_in full name)
+    and by port full name.
+
+    It is updated incrementally when a connection is added or removed,
+    and when a port is renamed or removed. Any other change of the
+    manager connections list must call `invalidate` (or `clear` if
+    there is no connection anymore), the index is then rebuilt
+    at the next lookup.'''
+
+    def __init__(self, manager: 'PatchbayManager'):
+        self.mng = manager
+        self._by_id = dict[int, 'Connection']()
+        self._by_names = dict[tuple[str, str], 'Connection']()
+        self._by_port = dict[str, set[tuple[str, str]]]()
+        'names of the connections of each port'
+        self._valid = True
+
+    def invalidate(self):
+        self._valid = False
+
+    def clear(self):
+        self._by_id.clear()
+        self._by_names.clear()
+        self._by_port.clear()
+        self._valid = True
+
+    def _add(self, pair: tuple[str, str], conn: 'Connection'):
+        self._by_id[conn.connection_id] = conn
+        self._by_names[pair] = conn
+        for port_name in pair:
+            self._by_port.setdefault(port_name, set()).add(pair)
+
+    def _remove(self, pair: tuple[str, str]) -> Optional['Connection']:
+        conn = self._by_names.pop(pair, None)
+        if conn is None:
+            return None
+
+        self._by_id.pop(conn.connection_id, None)
+        for port_name in pair:
+            pairs = self._by_port.get(port_name)
+            if pairs is not None:
+                pairs.discard(pair)
+                if not pairs:
+                    del self._by_port[port_name]
+        return conn
+
+    def _rebuild(self):
+        self.clear()
+        for conn in self.mng.connections:
+            self._add((conn.port_out.full_name, conn.port_in.full_name),
+                      conn)
+
+    def _check(self):
+        # a connection removed by the manager itself
+        # (with its port for example) changes the list length.
+        if not self._valid or len(self._by_id) != len(self.mng.connections):
+            self._rebuild()
+
+    def connection_added(self, port_out_name: str, port_in_name: str):
+        if not self._valid:
+            return
+
+        conns = self.mng.connections
+        if conns:
+            conn = conns[-1]
+            if (conn.port_out.full_name == port_out_name
+                    and conn.port_in.full_name == port_in_name):
+                self._add((port_out_name, port_in_name), conn)
+                return
+
+        self._valid = False
+
+    def connection_removed(self, port_out_name: str, port_in_name: str):
+        if self._valid:
+            self._remove((port_out_name, port_in_name))
+
+    def port_removed(self, port_name: str):
+        '''the port has been removed with its connections'''
+        if not self._valid:
+            return
+
+        for pair in list(self._by_port.get(port_name, ())):
+            self._remove(pair)
+
+    def port_renamed(self, ex_name: str, new_name: str):
+        '''the port has been renamed, its connections are the same
+        objects, indexed now with the new name.'''
+        if not self._valid or ex_name == new_name:
+            return
+
+        for pair in list(self._by_port.get(ex_name, ())):
+            conn = self._remove(pair)
+            self._add(tuple(new_name if name == ex_name else name
+                            for name in pair), conn)
+
+    def from_id(self, connection_id: int) -> Optional['Connection']:
+        self._check()
+        return self._by_id.get(connection_id)
+
+    def from_names(self, port_out_name: str,
+                   port_in_name: str) -> Optional['Connection']:
+        self._check()
+        return self._by_names.get((port_out_name, port_in_name))
+
+    def from_port(self, port_name: str) -> list['Connection']:
+        '''connections of the port'''
+        self._check()
+        return [self._by_names[pair]
+                for pair in self._by_port.get(port_name, ())]
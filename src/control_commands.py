@@ -0,0 +1,111 @@
+'''Commands of the headless mode control socket, without Qt,
+see the protocol in `headless`.'''
+
+import json
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+from auto_connect import AutoConnector, load_rules
+from layout_store import write_custom_names
+
+if TYPE_CHECKING:
+    from patch_engine import PatchEngine
+
+
+_logger = logging.getLogger(__name__)
+
+
+def read_request(line: str) -> Optional[dict[str, Any]]:
+    '''the request of one line of the protocol,
+    None if it is not a JSON object.'''
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return None
+
+    if not isinstance(request, dict):
+        return None
+    return request
+
+
+class ControlCommands:
+    def __init__(self, pe: 'PatchEngine', auto_connector: AutoConnector,
+                 config_dir: Path):
+        self.pe = pe
+        self.auto_connector = auto_connector
+        self.config_dir = config_dir
+
+    def _save_custom_names(self):
+        write_custom_names(self.config_dir, self.pe.custom_names.to_json())
+
+    def _port_dict(self, port) -> dict[str, Any]:
+        return {'name': port.name,
+                'type': getattr(port.type, 'name', str(port.type)),
+                'flags': int(port.flags),
+                'uuid': port.uuid,
+                'custom_name': self.pe.custom_names.custom_port(port.name)}
+
+    def handle_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        pe = self.pe
+        cmd = request.get('cmd')
+
+        match cmd:
+            case 'list-ports':
+                return {'ok': True,
+                        'ports': [self._port_dict(p) for p in pe.ports]}
+
+            case 'list-connections':
+                return {'ok': True,
+                        'connections': [list(c) for c in pe.connections]}
+
+            case 'connect'|'disconnect':
+                if not pe.jack_running:
+                    return {'ok': False, 'error': 'JACK is not running'}
+
+                connections = request.get('connections')
+                if connections is None and 'out' in request:
+                    connections = [[request.get('out'), request.get('in')]]
+                if not isinstance(connections, list):
+                    return {'ok': False, 'error': 'missing connections'}
+
+                failed = list[list[str]]()
+                for connection in connections:
+                    try:
+                        port_out_name, port_in_name = connection
+                        pe.connect_ports(port_out_name, port_in_name,
+                                         disconnect=cmd == 'disconnect')
+                    except Exception as e:
+                        _logger.warning(f'{cmd} {connection}: {str(e)}')
+                        failed.append(connection)
+
+                if failed:
+                    return {'ok': False, 'error': f'{cmd} failed',
+                            'failed': failed}
+                return {'ok': True}
+
+            case 'rename':
+                name = request.get('name', '')
+                if not isinstance(name, str):
+                    return {'ok': False, 'error': 'name must be a string'}
+
+                if 'port' in request:
+                    pe.custom_names.save_port(request['port'], name)
+                    if request.get('jack') and pe.jack_running:
+                        pe.write_port_pretty_name(request['port'], name)
+                elif 'group' in request:
+                    pe.custom_names.save_group(request['group'], name)
+                    if request.get('jack') and pe.jack_running:
+                        pe.write_group_pretty_name(request['group'], name)
+                else:
+                    return {'ok': False, 'error': 'missing port or group'}
+
+                self._save_custom_names()
+                return {'ok': True}
+
+            case 'reload-rules':
+                self.auto_connector.set_rules(load_rules(self.config_dir))
+                self.auto_connector.resolve_all()
+                return {'ok': True}
+
+        return {'ok': False, 'error': f'unknown command {cmd}'}
@@ -0,0 +1,275 @@
+'''History of the JACK DSP load and xruns, with constant memory.
+
+- the last hour of DSP load at 5 Hz
+- the last 24 hours of DSP load as min/max/avg per minute
+- the times of the last xruns
+
+The times JACK stopped are kept in the fine history,
+as samples with a NaN DSP load.
+
+All are ring buffers of the array module, saved in
+dsp_history.bin in the config dir and exported as CSV
+with `patchance --export-dsp-history FILE`.'''
+
+import csv
+import logging
+import math
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, TextIO
+
+
+_logger = logging.getLogger(__name__)
+
+HISTORY_FILE = 'dsp_history.bin'
+SAMPLE_INTERVAL = 0.2
+FINE_SIZE = 3600 * 5
+'one hour at 5 Hz'
+COARSE_PERIOD = 60.0
+COARSE_SIZE = 24 * 60
+'24 hours of one minute buckets'
+XRUNS_SIZE = 10000
+
+_MAGIC = b'PTDH'
+_VERSION = 1
+_HEADER = struct.Struct('<4sIIIIIIIIII')
+
+
+class _Ring:
+    '''fixed size ring buffer of parallel arrays'''
+
+    def __init__(self, size: int, typecodes: str):
+        self.size = size
+        self.arrays = [array(tc, bytes(array(tc).itemsize * size))
+                       for tc in typecodes]
+        self.index = 0
+        'next index to write'
+        self.count = 0
+
+    def append(self, *values):
+        for arr, value in zip(self.arrays, values):
+            arr[self.index] = value
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def items(self, last: Optional[int]=None) -> Iterator[tuple]:
+        '''iterate on the items from the oldest,
+        or on the `last` items only.'''
+        n = self.count if last is None else min(last, self.count)
+        start = (self.index - n) % self.size
+        for i in range(n):
+            j = (start + i) % self.size
+            yield tuple(arr[j] for arr in self.arrays)
+
+    def replace_last(self, *values):
+        last = (self.index - 1) % self.size
+        for arr, value in zip(self.arrays, values):
+            arr[last] = value
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+
+class DspHistory:
+    def __init__(self):
+        self.fine = _Ring(FINE_SIZE, 'df')
+        'time, dsp load'
+        self.coarse = _Ring(COARSE_SIZE, 'dfff')
+        'bucket start time, min, max, avg'
+        self.xruns = _Ring(XRUNS_SIZE, 'd')
+        'xrun time'
+
+        self._bucket_start = 0.0
+        self._bucket_min = 0.0
+        self._bucket_max = 0.0
+        self._bucket_sum = 0.0
+        self._bucket_count = 0
+        self._bucket_written = False
+        'the open bucket is the last one of self.coarse'
+
+    def add_dsp_load(self, dsp_load: float, now: Optional[float]=None):
+        if now is None:
+            now = time.time()
+
+        if (self._bucket_count
+                and now - self._bucket_start >= COARSE_PERIOD):
+            self._close_bucket()
+
+        if not self._bucket_count:
+            self._open_bucket(now)
+
+        if not self._bucket_count:
+            self._bucket_min = self._bucket_max = dsp_load
+        else:
+            self._bucket_min = min(self._bucket_min, dsp_load)
+            self._bucket_max = max(self._bucket_max, dsp_load)
+        self._bucket_sum += dsp_load
+        self._bucket_count += 1
+        self.fine.append(now, dsp_load)
+
+    def _open_bucket(self, now: float):
+        self._bucket_start = now - now % COARSE_PERIOD
+        self._bucket_written = False
+        if not self.coarse.count:
+            return
+
+        # continue the bucket saved in the same minute,
+        # its samples are still in the fine history.
+        (bucket_start, bucket_min, bucket_max,
+         bucket_avg) = next(self.coarse.items(1))
+        if bucket_start != self._bucket_start:
+            return
+
+        count = sum(1 for sample_time, dsp_load in self.fine.items()
+                    if sample_time >= bucket_start
+                    and not math.isnan(dsp_load))
+        if not count:
+            return
+
+        self._bucket_min = bucket_min
+        self._bucket_max = bucket_max
+        self._bucket_sum = bucket_avg * count
+        self._bucket_count = count
+        self._bucket_written = True
+
+    def _write_bucket(self):
+        values = (self._bucket_start, self._bucket_min, self._bucket_max,
+                  self._bucket_sum / self._bucket_count)
+        if self._bucket_written:
+            self.coarse.replace_last(*values)
+        else:
+            self.coarse.append(*values)
+            self._bucket_written = True
+
+    def _close_bucket(self):
+        self._write_bucket()
+        self._bucket_sum = 0.0
+        self._bucket_count = 0
+        self._bucket_written = False
+
+    def flush(self):
+        '''write the open bucket in the coarse history,
+        it stays open for the next samples of its minute.'''
+        if self._bucket_count:
+            self._write_bucket()
+
+    def add_stop(self, now: Optional[float]=None):
+        '''JACK stopped, no DSP load until the next sample'''
+        if now is None:
+            now = time.time()
+
+        if self._bucket_count:
+            self._close_bucket()
+        if self.fine.count and math.isnan(next(self.fine.items(1))[1]):
+            return
+        self.fine.append(now, math.nan)
+
+    def add_xrun(self, now: Optional[float]=None):
+        self.xruns.append(time.time() if now is None else now)
+
+    def last_dsp_loads(self, n: int) -> list[float]:
+        '''DSP loads of the last `n` samples, without the stops'''
+        return [item[1] for item in self.fine.items(n)
+                if not math.isnan(item[1])]
+
+    def xruns_since(self, since: float) -> list[float]:
+        '''xrun times from `since`, only the last xruns are read'''
+        times = self.xruns.arrays[0]
+        xruns = list[float]()
+        for i in range(1, self.xruns.count + 1):
+            xrun_time = times[(self.xruns.index - i) % self.xruns.size]
+            if xrun_time < since:
+                break
+            xruns.append(xrun_time)
+        xruns.reverse()
+        return xruns
+
+    # persistence
+
+    def save(self, path: Path):
+        self.flush()
+        tmp_path = path.with_name(f'.{path.name}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(_HEADER.pack(
+                    _MAGIC, _VERSION,
+                    self.fine.size, self.fine.index, self.fine.count,
+                    self.coarse.size, self.coarse.index, self.coarse.count,
+                    self.xruns.size, self.xruns.index, self.xruns.count))
+                for ring in (self.fine, self.coarse, self.xruns):
+                    for arr in ring.arrays:
+                        arr.tofile(f)
+            tmp_path.replace(path)
+        except OSError as e:
+            _logger.warning(f'Failed to save DSP history: {str(e)}')
+
+    def load(self, path: Path) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                header = _HEADER.unpack(f.read(_HEADER.size))
+                if header[0] != _MAGIC or header[1] != _VERSION:
+                    raise ValueError('not a DSP history file')
+                if (header[2] != FINE_SIZE or header[5] != COARSE_SIZE
+                        or header[8] != XRUNS_SIZE):
+                    raise ValueError('different history sizes')
+
+                for ring in (self.fine, self.coarse, self.xruns):
+                    for i, arr in enumerate(ring.arrays):
+                        loaded = array(arr.typecode)
+                        loaded.fromfile(f, ring.size)
+                        ring.arrays[i] = loaded
+        except FileNotFoundError:
+            return False
+        except (OSError, EOFError, ValueError, struct.error) as e:
+            _logger.warning(f'Failed to load DSP history {path}: {str(e)}')
+            return False
+
+        (self.fine.index, self.fine.count,
+         self.coarse.index, self.coarse.count) = (
+             header[3], header[4], header[6], header[7])
+        self.xruns.index, self.xruns.count = header[9], header[10]
+        self._bucket_sum = 0.0
+        self._bucket_count = 0
+        self._bucket_written = False
+        return True
+
+    # export
+
+    def write_csv(self, file: TextIO):
+        def iso(timestamp: float) -> str:
+            return datetime.fromtimestamp(timestamp).isoformat(
+                timespec='milliseconds')
+
+        writer = csv.writer(file)
+        writer.writerow(['time', 'kind', 'dsp', 'dsp_min', 'dsp_max'])
+        for bucket_time, dsp_min, dsp_max, dsp_avg in self.coarse.items():
+            writer.writerow([iso(bucket_time), 'minute',
+                             f'{dsp_avg:.2f}', f'{dsp_min:.2f}',
+                             f'{dsp_max:.2f}'])
+        for sample_time, dsp_load in self.fine.items():
+            if math.isnan(dsp_load):
+                writer.writerow([iso(sample_time), 'stop', '', '', ''])
+            else:
+                writer.writerow([iso(sample_time), 'sample',
+                                 f'{dsp_load:.2f}', '', ''])
+        for (xrun_time,) in self.xruns.items():
+            writer.writerow([iso(xrun_time), 'xrun', '', '', ''])
+
+
+def export_csv(config_dir: Path, out_path: str):
+    history = DspHistory()
+    if not history.load(config_dir / HISTORY_FILE):
+        raise FileNotFoundError(
+            f'No DSP history in {config_dir / HISTORY_FILE}')
+
+    if out_path == '-':
+        history.write_csv(sys.stdout)
+        return
+
+    with open(out_path, 'w', newline='') as f:
+        history.write_csv(f)
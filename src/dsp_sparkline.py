@@ -0,0 +1,96 @@
+import math
+import time
+from typing import Optional
+
+from qtpy.QtCore import QEvent, QPointF, QTimer
+from qtpy.QtGui import QColor, QPainter, QPaintEvent, QPen, QPolygonF
+from qtpy.QtWidgets import QApplication, QWidget
+
+from dsp_history import SAMPLE_INTERVAL, DspHistory
+
+
+_translate = QApplication.translate
+
+SPARKLINE_SECONDS = 120
+REFRESH_MS = 1000
+
+
+class DspSparkline(QWidget):
+    '''DSP load of the last minutes, with xruns as red marks.'''
+
+    def __init__(self, parent: Optional[QWidget]=None):
+        super().__init__(parent)
+        self.setFixedSize(SPARKLINE_SECONDS, 22)
+        self.history: Optional[DspHistory] = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_MS)
+        self._timer.timeout.connect(self._refresh)
+
+    def set_history(self, history: DspHistory):
+        self.history = history
+        self._refresh()
+
+    def set_displayed(self, displayed: bool):
+        if displayed:
+            self._timer.start()
+            self._refresh()
+        else:
+            self._timer.stop()
+
+    def _refresh(self):
+        if self.history is not None:
+            self.update()
+
+    def event(self, event: QEvent) -> bool:
+        # the last hour stats are computed only when shown
+        if (event.type() == QEvent.Type.ToolTip
+                and self.history is not None):
+            now = time.time()
+            hour_xruns = len(self.history.xruns_since(now - 3600))
+            hour_loads = self.history.last_dsp_loads(
+                int(3600 / SAMPLE_INTERVAL))
+            hour_max = max(hour_loads) if hour_loads else 0.0
+
+            self.setToolTip(
+                _translate('dsp_sparkline',
+                           'DSP load, last hour: max %.1f %%, %i xruns')
+                % (hour_max, hour_xruns))
+        return super().event(event)
+
+    def paintEvent(self, event: QPaintEvent):
+        if self.history is None:
+            return
+
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        n_samples = int(SPARKLINE_SECONDS / SAMPLE_INTERVAL)
+        samples = list(self.history.fine.items(n_samples))
+        if not samples:
+            return
+
+        now = time.time()
+        start = now - SPARKLINE_SECONDS
+
+        def x_for(timestamp: float) -> float:
+            return (timestamp - start) / SPARKLINE_SECONDS * width
+
+        # one line per JACK run, stops are NaN samples
+        lines = [QPolygonF()]
+        for timestamp, dsp_load in samples:
+            if math.isnan(dsp_load):
+                lines.append(QPolygonF())
+                continue
+            lines[-1].append(QPointF(
+                x_for(timestamp),
+                height - 1 - min(dsp_load, 100.0) / 100.0 * (height - 2)))
+
+        text_color = self.palette().windowText().color()
+        painter.setPen(QPen(text_color, 1.0))
+        for points in lines:
+            if points.count() > 1:
+                painter.drawPolyline(points)
+
+        painter.setPen(QPen(QColor(220, 40, 40), 1.0))
+        for xrun_time in self.history.xruns_since(start):
+            x = x_for(xrun_time)
+            painter.drawLine(QPointF(x, 0), QPointF(x, height))
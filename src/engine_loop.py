@@ -1,48 +1,347 @@
 import logging
+import time
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Callable, Optional
 
-from qtpy.QtCore import QObject
+from qtpy.QtCore import QObject, QTimer, Signal
 
 from patch_engine import PatchEngine
 
+from dsp_history import SAMPLE_INTERVAL, DspHistory
+from perf_monitor import perf
+from jack_reconnect import (
+    RECONNECT_INTERVAL, ReconnectBackoff, ServerSocketWatcher)
+
 
 _logger = logging.getLogger(__name__)
 
 
+class JackNeed(Enum):
+    ANY = auto()
+    'job runs whatever the JACK state'
+    RUNNING = auto()
+    'job runs only if JACK is running'
+    STOPPED = auto()
+    'job runs only if JACK is stopped'
+
+
+@dataclass
+class PeriodicJob:
+    name: str
+    func: Callable[[], None]
+    interval: int
+    'interval in ms when the job result is visible'
+    hidden_interval: int
+    'interval in ms when the main window is hidden or minimized'
+    idle_interval: Optional[int] = None
+    '''interval in ms when transport is stopped,
+    None if the job does not depends on transport'''
+    jack_need: JackNeed = JackNeed.RUNNING
+    enabled: bool = True
+    last_run: float = 0.0
+    next_due: float = 0.0
+
+    def current_interval(self, displayed: bool, rolling: bool) -> int:
+        if not displayed:
+            return self.hidden_interval
+        if not rolling and self.idle_interval is not None:
+            return self.idle_interval
+        return self.interval
+
+
+class TickScheduler(QObject):
+    '''Runs periodic jobs with their own intervals.
+
+    Only one single shot timer is used, armed to the next due job,
+    so there is no wakeup at all between two jobs.'''
+
+    def __init__(self, patch_engine: PatchEngine):
+        super().__init__()
+        self.pe = patch_engine
+        self.jobs = dict[str, PeriodicJob]()
+        self.displayed = True
+        self.transport_rolling = False
+        self._running = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run_due_jobs)
+
+    def add_job(self, job: PeriodicJob):
+        job.func = perf.wrap(f'job.{job.name}', job.func)
+        self.jobs[job.name] = job
+        if self._running:
+            self.reschedule()
+
+    def set_job_enabled(self, name: str, enabled: bool):
+        job = self.jobs.get(name)
+        if job is None or job.enabled is enabled:
+            return
+
+        job.enabled = enabled
+        if enabled:
+            job.last_run = 0.0
+            job.next_due = 0.0
+        if self._running:
+            self.reschedule()
+
+    def delay_job(self, name: str, delay_ms: int):
+        '''set the next run of a job in `delay_ms`,
+        whatever its interval.'''
+        job = self.jobs.get(name)
+        if job is None:
+            return
+
+        job.next_due = time.monotonic() + delay_ms / 1000
+        if self._running:
+            self._arm(time.monotonic())
+
+    def _job_active(self, job: PeriodicJob) -> bool:
+        if not job.enabled:
+            return False
+
+        match job.jack_need:
+            case JackNeed.RUNNING:
+                return self.pe.jack_running
+            case JackNeed.STOPPED:
+                return not self.pe.jack_running
+        return True
+
+    def set_displayed(self, displayed: bool):
+        if displayed is self.displayed:
+            return
+        self.displayed = displayed
+        self.reschedule(sooner_only=displayed)
+
+    def set_transport_rolling(self, rolling: bool):
+        if rolling is self.transport_rolling:
+            return
+        self.transport_rolling = rolling
+        self.reschedule(sooner_only=rolling)
+
+    def reschedule(self, sooner_only=False):
+        '''recompute next due times after an interval change.
+        if sooner_only, jobs are never delayed.'''
+        now = time.monotonic()
+        for job in self.jobs.values():
+            if not job.last_run:
+                continue
+            if (job.interval == job.hidden_interval
+                    and job.idle_interval is None):
+                # interval does not change, keep possible delay
+                continue
+            next_due = job.last_run + job.current_interval(
+                self.displayed, self.transport_rolling) / 1000
+            if sooner_only:
+                job.next_due = min(job.next_due, max(now, next_due))
+            else:
+                job.next_due = max(now, next_due)
+        self._arm(now)
+
+    def start(self):
+        self._running = True
+        self._run_due_jobs()
+
+    def stop(self):
+        self._running = False
+        self._timer.stop()
+
+    def _run_due_jobs(self):
+        if not self._running:
+            return
+
+        now = time.monotonic()
+        for job in list(self.jobs.values()):
+            if not self._job_active(job):
+                continue
+            if job.next_due > now:
+                continue
+
+            # set before running the job, job can delay itself
+            job.last_run = now
+            job.next_due = now + job.current_interval(
+                self.displayed, self.transport_rolling) / 1000
+
+            try:
+                job.func()
+            except Exception:
+                _logger.exception(f'periodic job {job.name} failed')
+
+        self._arm(time.monotonic())
+
+    def _arm(self, now: float):
+        if not self._running:
+            return
+
+        next_due: Optional[float] = None
+        for job in self.jobs.values():
+            if not self._job_active(job):
+                continue
+            if next_due is None or job.next_due < next_due:
+                next_due = job.next_due
+
+        if next_due is None:
+            # no active job, check again state later
+            delay_ms = 500
+        else:
+            delay_ms = max(0, int((next_due - now) * 1000))
+        self._timer.start(delay_ms)
+
+
+TRANSPORT_INTERVAL = 50
+TRANSPORT_INTERPOLATED_INTERVAL = 500
+
+
 class PatchTimeoutObj(QObject):
+    jack_reconnect_status = Signal(int, str)
+    '''emitted after each failed JACK reconnection attempt
+    with the attempts count and the last error,
+    and with (0, '') once JACK is reconnected.'''
+
+    patch_events_processed = Signal()
+    'emitted after each pass of patch events processing'
+
     def __init__(self, patch_engine: PatchEngine):
         super().__init__()
         self.pe = patch_engine
-        self.n = 0
-        
-    def check_patch(self):
+        self.event_driven = False
+        '''If True, patch events are processed by `process_events`
+        when the engine wakes the Qt loop, not at each tick.'''
+
+        self.scheduler = TickScheduler(patch_engine)
+        sch = self.scheduler
+        sch.add_job(PeriodicJob(
+            'process_patch_events', self.process_events, 50, 50))
+        sch.add_job(PeriodicJob(
+            'remember_dsp_load', patch_engine.remember_dsp_load,
+            200, 2000))
+        sch.add_job(PeriodicJob(
+            'send_dsp_load', self._send_dsp_load, 1000, 10000))
+        sch.add_job(PeriodicJob(
+            'check_pretty_names_export',
+            patch_engine.check_pretty_names_export, 200, 1000))
+        sch.add_job(PeriodicJob(
+            'send_transport_pos', patch_engine.send_transport_pos,
+            TRANSPORT_INTERVAL, 1000, idle_interval=250))
+        sch.add_job(PeriodicJob(
+            'reconnect_jack', self._try_reconnect,
+            RECONNECT_INTERVAL, RECONNECT_INTERVAL,
+            jack_need=JackNeed.STOPPED))
+
+        # measured apart from the polled 'job.process_patch_events',
+        # when connected to the engine wakeups.
+        self.process_events = perf.wrap(
+            'wakeup.process_events', self.process_events)
+
+        self._dsp_history: Optional[DspHistory] = None
+
+        self._backoff = ReconnectBackoff()
+        self._socket_watcher = ServerSocketWatcher()
+        self._socket_watcher.server_socket_appeared.connect(
+            self._server_socket_appeared)
+
+    def set_dsp_history(self, dsp_history: DspHistory):
+        '''record the DSP load in dsp_history at 5 Hz,
+        even when the window is hidden.
+
+        This job replaces 'remember_dsp_load', the same sample
+        is used for the history and for the DSP load display.'''
+        self._dsp_history = dsp_history
+        self.scheduler.set_job_enabled('remember_dsp_load', False)
+        interval = int(SAMPLE_INTERVAL * 1000)
+        self.scheduler.add_job(PeriodicJob(
+            'dsp_history', self._remember_dsp_load,
+            interval, interval, jack_need=JackNeed.RUNNING))
+
+    def _remember_dsp_load(self):
         pe = self.pe
-        n = self.n
+        if pe.client is None:
+            return
+
+        dsp_load = pe.client.cpu_load()
+        self._dsp_history.add_dsp_load(dsp_load)
+        pe.max_dsp_since_last_send = max(
+            pe.max_dsp_since_last_send, int(dsp_load))
+
+    def set_event_driven(self, event_driven: bool):
+        self.event_driven = event_driven
+        self.scheduler.set_job_enabled(
+            'process_patch_events', not event_driven)
+
+    def process_events(self):
+        if self.pe.jack_running:
+            self.pe.process_patch_events()
+            self.patch_events_processed.emit()
+
+    def _send_dsp_load(self):
+        if self.pe.dsp_wanted:
+            self.pe.send_dsp_load()
+
+    def _try_reconnect(self):
+        pe = self.pe
+        if pe.client is not None:
+            _logger.debug(
+                'deactivate JACK client after server shutdown')
+            pe.client.deactivate()
+            _logger.debug('close JACK client after server shutdown')
+            pe.client.close()
+            _logger.debug('close JACK client done')
+            pe.client = None
+
+        self._socket_watcher.start()
+        _logger.debug(
+            f'try to start JACK, attempt {self._backoff.attempts + 1}')
+        error = ''
+        try:
+            pe.start_jack_client()
+        except Exception as e:
+            error = str(e)
 
         if pe.jack_running:
-            if n % 4 == 0:
-                pe.remember_dsp_load()
-                if pe.dsp_wanted and n % 20 == 0:
-                    pe.send_dsp_load()
-
-            pe.process_patch_events()
-            pe.check_pretty_names_export()
-            pe.send_transport_pos()
-            
-        else:
-            if n % 10 == 0:
-                if pe.client is not None:
-                    _logger.debug(
-                        'deactivate JACK client after server shutdown')
-                    pe.client.deactivate()
-                    _logger.debug('close JACK client after server shutdown')
-                    pe.client.close()
-                    _logger.debug('close JACK client done')
-                    pe.client = None
-                _logger.debug('try to start JACK')
-                pe.start_jack_client()
-        
-        self.n += 1
-        
-        # for faster modulos
-        if n == 20:
-            n = 0
\ No newline at end of file
+            self._socket_watcher.stop()
+            if self._backoff.attempts:
+                _logger.info(
+                    f'JACK reconnected after '
+                    f'{self._backoff.attempts} failed attempts')
+                self._backoff.reset()
+                self.jack_reconnect_status.emit(0, '')
+            return
+
+        delay = self._backoff.failed(
+            error or 'JACK server is not running')
+        self.scheduler.delay_job('reconnect_jack', int(delay * 1000))
+        self.jack_reconnect_status.emit(
+            self._backoff.attempts, self._backoff.last_error)
+
+    def _server_socket_appeared(self):
+        if self.pe.jack_running:
+            return
+
+        # let the server a little time to be ready
+        self.scheduler.delay_job('reconnect_jack', 200)
+
+    def set_displayed(self, displayed: bool):
+        self.scheduler.set_displayed(displayed)
+
+    def set_transport_rolling(self, rolling: bool):
+        self.scheduler.set_transport_rolling(rolling)
+
+    def set_transport_interpolated(self, interpolated: bool):
+        '''while the clock is interpolated, the transport
+        is queried only to check drift and relocations.'''
+        job = self.scheduler.jobs['send_transport_pos']
+        job.interval = (TRANSPORT_INTERPOLATED_INTERVAL if interpolated
+                        else TRANSPORT_INTERVAL)
+        self.scheduler.reschedule(sooner_only=not interpolated)
+
+    def set_transport_displayed(self, displayed: bool):
+        '''no transport query at all when transport widgets are hidden'''
+        self.scheduler.set_job_enabled('send_transport_pos', displayed)
+
+    def start(self):
+        self.scheduler.start()
+
+    def stop(self):
+        self.scheduler.stop()
+        self._socket_watcher.stop()
@@ -0,0 +1,163 @@
+'''Record of all the calls from the patch engine to the patchbay,
+enabled with --record-events FILE, replayed with replay_events.py.
+
+The log is JSON lines. The first line is a header dict,
+each other line is a list [time_ms, method_name, *args].
+"server_restarted" is recorded with the state of the engine,
+because the patchbay reads it directly from the engine.
+"pass" marks the end of a patch events processing pass.'''
+
+import dataclasses
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from patch_engine import PatchEngine
+from patshared import TransportPosition
+
+from engine_loop import PatchTimeoutObj
+from patchance_pb_manager import PatchancePatchbayManager
+from ptc_patch_engine_outer import PtcPatchEngineOuter
+
+
+_logger = logging.getLogger(__name__)
+
+LOG_FORMAT = 'patchance-events'
+LOG_VERSION = 1
+
+
+def tpos_to_json(tpos: TransportPosition) -> dict[str, Any]:
+    if dataclasses.is_dataclass(tpos):
+        return dataclasses.asdict(tpos)
+    return dict(vars(tpos))
+
+
+def tpos_from_json(json_dict: dict[str, Any]) -> TransportPosition:
+    tpos = TransportPosition.__new__(TransportPosition)
+    for key, value in json_dict.items():
+        setattr(tpos, key, value)
+    return tpos
+
+
+def engine_state(pe: PatchEngine) -> dict[str, Any]:
+    return {'ports': [[p.name, int(p.type), int(p.flags), p.uuid]
+                      for p in pe.ports],
+            'connections': [list(c) for c in pe.connections],
+            'clients': dict(pe.client_name_uuids),
+            'metadatas': {str(uuid): dict(key_dict)
+                          for uuid, key_dict in pe.metadatas.items()},
+            'samplerate': pe.samplerate,
+            'buffer_size': pe.buffer_size}
+
+
+class EventRecorder:
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, 'w')
+        self._start = time.perf_counter()
+        self._write(
+            {'format': LOG_FORMAT, 'version': LOG_VERSION,
+             'date': time.time()})
+
+    def _write(self, obj):
+        self._file.write(json.dumps(obj, separators=(',', ':')) + '\n')
+
+    def record(self, method: str, *args):
+        if self._file is None:
+            return
+        self._write(
+            [round((time.perf_counter() - self._start) * 1000, 3),
+             method, *args])
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        _logger.info(f'events recorded in {self.path}')
+
+
+def read_event_log(path: Path) -> Iterator[tuple[float, str, list]]:
+    '''yield (time_ms, method, args) of each recorded event'''
+    with open(path, 'r') as f:
+        header = json.loads(f.readline())
+        if (not isinstance(header, dict)
+                or header.get('format') != LOG_FORMAT):
+            raise ValueError(f'{path} is not a {LOG_FORMAT} log')
+        if header.get('version', 0) > LOG_VERSION:
+            _logger.warning(
+                f'{path} has been recorded with a newer version')
+
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            yield event[0], event[1], event[2:]
+
+
+class RecordingPatchEngineOuter(PtcPatchEngineOuter):
+    '''PtcPatchEngineOuter recording each call before forwarding it'''
+
+    def __init__(self, mng: PatchancePatchbayManager,
+                 timeout_obj: Optional[PatchTimeoutObj],
+                 recorder: EventRecorder):
+        super().__init__(mng, timeout_obj)
+        self.recorder = recorder
+        if timeout_obj is not None:
+            timeout_obj.patch_events_processed.connect(self._pass_done)
+
+    def _pass_done(self):
+        self.recorder.record('pass')
+
+    def associate_client_name_and_uuid(self, client_name: str, uuid: int):
+        self.recorder.record('associate_client_name_and_uuid',
+                             client_name, uuid)
+        super().associate_client_name_and_uuid(client_name, uuid)
+    def port_added(self, pname: str, ptype: int, pflags: int, puuid: int):
+        self.recorder.record(
+            'port_added', pname, int(ptype), int(pflags), puuid)
+        super().port_added(pname, ptype, pflags, puuid)
+    def port_renamed(self, ex_name: str, new_name: str, uuid=0):
+        self.recorder.record('port_renamed', ex_name, new_name, uuid)
+        super().port_renamed(ex_name, new_name, uuid)
+    def port_removed(self, port_name: str):
+        self.recorder.record('port_removed', port_name)
+        super().port_removed(port_name)
+    def metadata_updated(self, uuid: int, key: str, value: str):
+        self.recorder.record('metadata_updated', uuid, key, value)
+        super().metadata_updated(uuid, key, value)
+    def connection_added(self, connection: tuple[str, str]):
+        self.recorder.record('connection_added', list(connection))
+        super().connection_added(connection)
+    def connection_removed(self, connection: tuple[str, str]):
+        self.recorder.record('connection_removed', list(connection))
+        super().connection_removed(connection)
+    def server_stopped(self):
+        self.recorder.record('server_stopped')
+        super().server_stopped()
+    def send_transport_position(self, tpos: TransportPosition):
+        self.recorder.record('send_transport_position', tpos_to_json(tpos))
+        super().send_transport_position(tpos)
+    def send_dsp_load(self, dsp_load: int):
+        self.recorder.record('send_dsp_load', dsp_load)
+        super().send_dsp_load(dsp_load)
+    def send_one_xrun(self):
+        self.recorder.record('send_one_xrun')
+        super().send_one_xrun()
+    def send_buffersize(self, buffer_size: int):
+        self.recorder.record('send_buffersize', buffer_size)
+        super().send_buffersize(buffer_size)
+    def send_samplerate(self, samplerate: int):
+        self.recorder.record('send_samplerate', samplerate)
+        super().send_samplerate(samplerate)
+    def send_pretty_names_locked(self, locked: bool):
+        self.recorder.record('send_pretty_names_locked', locked)
+        super().send_pretty_names_locked(locked)
+    def send_server_lose(self):
+        self.recorder.record('send_server_lose')
+        super().send_server_lose()
+    def server_restarted(self):
+        self.recorder.record('server_restarted', engine_state(self.mng.pe))
+        super().server_restarted()
@@ -0,0 +1,133 @@
+import logging
+import os
+from typing import TYPE_CHECKING, Optional
+
+from qtpy.QtCore import QObject, QSocketNotifier, QTimer, Signal
+
+if TYPE_CHECKING:
+    from patch_engine import PatchEngine
+
+
+_logger = logging.getLogger(__name__)
+
+RETAINED_EVENTS_DELAY = 300
+'''events can be retained a short time in the engine queue
+(waiting for pretty-names metadatas for example),
+they are processed once more this delay after the last wakeup.'''
+
+
+class EngineWakeup(QObject):
+    '''Wake up the Qt loop when the JACK/ALSA threads queue
+    a patch event, instead of polling the queue at fixed interval.
+
+    The class of the engine queue is replaced with a subclass,
+    whose `add` also writes the eventfd (or self-pipe where eventfd
+    is not available), from any thread. A QSocketNotifier in the
+    Qt thread then emits the `events_queued` signal.'''
+
+    events_queued = Signal()
+
+    def __init__(self, patch_engine: 'PatchEngine'):
+        super().__init__()
+        self.pe = patch_engine
+
+        if hasattr(os, 'eventfd'):
+            self._read_fd = os.eventfd(
+                0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._write_fd = self._read_fd
+            self._is_eventfd = True
+        else:
+            self._read_fd, self._write_fd = os.pipe()
+            os.set_blocking(self._read_fd, False)
+            os.set_blocking(self._write_fd, False)
+            self._is_eventfd = False
+
+        self._notifier = QSocketNotifier(
+            self._read_fd, QSocketNotifier.Type.Read, self)
+        self._notifier.activated.connect(self._fd_activated)
+
+        self._retained_timer = QTimer(self)
+        self._retained_timer.setSingleShot(True)
+        self._retained_timer.setInterval(RETAINED_EVENTS_DELAY)
+        self._retained_timer.timeout.connect(self.events_queued)
+
+        self._queue_class: Optional[type] = None
+        'class of the engine queue before install()'
+
+    @property
+    def installed(self) -> bool:
+        return self._queue_class is not None
+
+    def install(self) -> bool:
+        '''Make the engine queue wake up the Qt loop at each queued
+        event. Returns False if the engine queue can not be
+        subclassed, in this case, the caller should keep polling.'''
+        if self.installed:
+            return True
+
+        queue = getattr(self.pe, 'patch_event_queue', None)
+        if not callable(getattr(queue, 'add', None)):
+            _logger.warning(
+                'patch engine queue not found, '
+                'patch events will be polled.')
+            return False
+
+        queue_class = type(queue)
+        wake = self.wake
+
+        class WakingPatchEventQueue(queue_class):
+            def add(self, *args, **kwargs):
+                super().add(*args, **kwargs)
+                wake()
+
+        try:
+            queue.__class__ = WakingPatchEventQueue
+        except TypeError as e:
+            _logger.warning(
+                f'patch engine queue can not be subclassed, '
+                f'patch events will be polled: {str(e)}')
+            return False
+
+        self._queue_class = queue_class
+        return True
+
+    def uninstall(self):
+        if self._queue_class is None:
+            return
+
+        self.pe.patch_event_queue.__class__ = self._queue_class
+        self._queue_class = None
+
+    def wake(self):
+        '''Thread safe, can be called from JACK threads.'''
+        try:
+            if self._is_eventfd:
+                os.eventfd_write(self._write_fd, 1)
+            else:
+                os.write(self._write_fd, b'\0')
+        except BlockingIOError:
+            # the pipe is full, a wakeup is already pending
+            pass
+
+    def _drain(self):
+        try:
+            if self._is_eventfd:
+                os.eventfd_read(self._read_fd)
+            else:
+                while os.read(self._read_fd, 4096):
+                    pass
+        except BlockingIOError:
+            pass
+
+    def _fd_activated(self, *args):
+        self._drain()
+        self.events_queued.emit()
+        self._retained_timer.start()
+
+    def close(self):
+        self.uninstall()
+        self._retained_timer.stop()
+        self._notifier.setEnabled(False)
+        os.close(self._read_fd)
+        if self._write_fd != self._read_fd:
+            os.close(self._write_fd)
@@ -0,0 +1,279 @@
+import errno
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import TYPE_CHECKING, Callable, Optional, Protocol
+
+from qtpy.QtCore import QObject, Signal
+
+if TYPE_CHECKING:
+    from patch_engine import PatchEngine
+
+
+_logger = logging.getLogger(__name__)
+
+WORKER_CLIENT_NAME = 'PatchanceWorker'
+PRETTY_NAME_KEY = 'http://jackaudio.org/metadata/pretty-name'
+
+
+class EngineAct(Enum):
+    CONNECT = auto()
+    DISCONNECT = auto()
+    CONNECT_MANY = auto()
+    DISCONNECT_MANY = auto()
+    CHANGE_CONNECTIONS = auto()
+    GROUP_PRETTY_NAME = auto()
+    PORT_PRETTY_NAME = auto()
+    PRETTY_NAMES_MANY = auto()
+
+
+@dataclass
+class EngineRequest:
+    act: EngineAct
+    args: tuple
+    error: str = ''
+    failed_pairs: Optional[list[tuple[str, str]]] = None
+    '''for CONNECT_MANY, DISCONNECT_MANY and CHANGE_CONNECTIONS,
+    pairs which failed'''
+    failed_writes: Optional[list[tuple[bool, str, str]]] = None
+    'for PRETTY_NAMES_MANY, writes which failed'
+
+
+class WorkerClient(Protocol):
+    def connect_ports(self, port_out_name: str, port_in_name: str,
+                      disconnect=False): ...
+    def write_group_pretty_name(
+        self, client_name: str, pretty_name: str): ...
+    def write_port_pretty_name(
+        self, port_name: str, pretty_name: str): ...
+    def close(self): ...
+
+
+class WorkerJackClient:
+    '''JACK client used only from the worker thread.
+    It is never activated, it has no port and no callback,
+    so it does not appear in the patchbay.'''
+
+    def __init__(self):
+        import jack
+        self.client = jack.Client(WORKER_CLIENT_NAME, no_start_server=True)
+
+    def connect_ports(self, port_out_name: str, port_in_name: str,
+                      disconnect=False):
+        import jack
+        if disconnect:
+            self.client.disconnect(port_out_name, port_in_name)
+            return
+
+        try:
+            self.client.connect(port_out_name, port_in_name)
+        except jack.JackErrorCode as e:
+            if e.code != errno.EEXIST:
+                raise
+
+    def _write_pretty_name(self, uuid: int, pretty_name: str):
+        import jack
+        if pretty_name:
+            self.client.set_property(uuid, PRETTY_NAME_KEY, pretty_name)
+            return
+
+        try:
+            self.client.remove_property(uuid, PRETTY_NAME_KEY)
+        except jack.JackError:
+            # there was no pretty name
+            pass
+
+    def write_group_pretty_name(self, client_name: str, pretty_name: str):
+        self._write_pretty_name(
+            int(self.client.get_uuid_for_client_name(client_name)),
+            pretty_name)
+
+    def write_port_pretty_name(self, port_name: str, pretty_name: str):
+        self._write_pretty_name(
+            self.client.get_port_by_name(port_name).uuid, pretty_name)
+
+    def close(self):
+        self.client.close()
+
+
+class EngineWorker(QObject):
+    '''Runs the mutating (and potentially blocking) JACK operations
+    in a dedicated thread, so that the GUI thread never waits for
+    the JACK server.
+
+    The worker has its own JACK client, the client of the patch engine
+    is never used from the worker thread. It is closed after any
+    failed request and when the server restarts, and opened again
+    at the next request.
+
+    Requests are executed in order. `request_done` is emitted
+    from the worker thread, connected slots living in the GUI thread
+    receive it queued.'''
+
+    request_done = Signal(object)
+
+    def __init__(self, patch_engine: 'PatchEngine'):
+        super().__init__()
+        self.pe = patch_engine
+        self._queue = queue.Queue[Optional[EngineRequest]]()
+        self._thread: Optional[threading.Thread] = None
+
+        self.client_factory: Callable[[], WorkerClient] = WorkerJackClient
+        'opens the worker client, called from the worker thread'
+        self._client: Optional[WorkerClient] = None
+        self._server_generation = 0
+        'incremented at each server restart, from the GUI thread'
+        self._client_generation = 0
+        'server generation when the worker client has been opened'
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, name='patchance-engine-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def server_restarted(self):
+        '''the JACK server has restarted, the worker client
+        opened with the previous server must not be used anymore.'''
+        self._server_generation += 1
+
+    def _request(self, act: EngineAct, *args) -> EngineRequest:
+        if self._thread is None:
+            self.start()
+        request = EngineRequest(act, args)
+        self._queue.put(request)
+        return request
+
+    def connect_ports(self, port_out_name: str, port_in_name: str):
+        self._request(EngineAct.CONNECT, port_out_name, port_in_name)
+
+    def disconnect_ports(self, port_out_name: str, port_in_name: str):
+        self._request(EngineAct.DISCONNECT, port_out_name, port_in_name)
+
+    def connect_many(self, pairs: list[tuple[str, str]]):
+        '''connect all (port_out_name, port_in_name) pairs
+        in one request'''
+        self._request(EngineAct.CONNECT_MANY, pairs)
+
+    def disconnect_many(self, pairs: list[tuple[str, str]]):
+        '''disconnect all (port_out_name, port_in_name) pairs
+        in one request'''
+        self._request(EngineAct.DISCONNECT_MANY, pairs)
+
+    def change_connections(self, to_disconnect: list[tuple[str, str]],
+                           to_connect: list[tuple[str, str]]):
+        '''disconnect and then connect (port_out_name, port_in_name)
+        pairs in one request'''
+        self._request(EngineAct.CHANGE_CONNECTIONS, to_disconnect, to_connect)
+
+    def write_group_pretty_name(self, client_name: str, pretty_name: str):
+        self._request(EngineAct.GROUP_PRETTY_NAME, client_name, pretty_name)
+
+    def write_port_pretty_name(self, port_name: str, pretty_name: str):
+        self._request(EngineAct.PORT_PRETTY_NAME, port_name, pretty_name)
+
+    def write_pretty_names(
+            self, writes: list[tuple[bool, str, str]]) -> EngineRequest:
+        '''write all (is_group, client_or_port_name, pretty_name)
+        in one request'''
+        return self._request(EngineAct.PRETTY_NAMES_MANY, writes)
+
+    def _close_client(self):
+        if self._client is None:
+            return
+
+        try:
+            self._client.close()
+        except Exception as e:
+            _logger.debug(f'failed to close the worker client: {str(e)}')
+        self._client = None
+
+    def _change_connections(
+            self, request: EngineRequest,
+            to_disconnect: list[tuple[str, str]],
+            to_connect: list[tuple[str, str]]):
+        request.failed_pairs = []
+        for pairs, disconnect in ((to_disconnect, True), (to_connect, False)):
+            for port_out_name, port_in_name in pairs:
+                try:
+                    self._client.connect_ports(
+                        port_out_name, port_in_name, disconnect=disconnect)
+                except Exception as e:
+                    request.failed_pairs.append(
+                        (port_out_name, port_in_name))
+                    request.error = str(e)
+
+    def _execute(self, request: EngineRequest):
+        if (self._client is not None
+                and self._client_generation != self._server_generation):
+            self._close_client()
+
+        if self._client is None:
+            self._client_generation = self._server_generation
+            self._client = self.client_factory()
+        pe = self._client
+        match request.act:
+            case EngineAct.CONNECT:
+                pe.connect_ports(*request.args)
+            case EngineAct.DISCONNECT:
+                pe.connect_ports(*request.args, disconnect=True)
+            case EngineAct.CONNECT_MANY:
+                self._change_connections(request, [], request.args[0])
+            case EngineAct.DISCONNECT_MANY:
+                self._change_connections(request, request.args[0], [])
+            case EngineAct.CHANGE_CONNECTIONS:
+                self._change_connections(request, *request.args)
+            case EngineAct.GROUP_PRETTY_NAME:
+                pe.write_group_pretty_name(*request.args)
+            case EngineAct.PORT_PRETTY_NAME:
+                pe.write_port_pretty_name(*request.args)
+            case EngineAct.PRETTY_NAMES_MANY:
+                writes: list[tuple[bool, str, str]] = request.args[0]
+                request.failed_writes = []
+                for write in writes:
+                    is_group, name, pretty_name = write
+                    try:
+                        if is_group:
+                            pe.write_group_pretty_name(name, pretty_name)
+                        else:
+                            pe.write_port_pretty_name(name, pretty_name)
+                    except Exception as e:
+                        request.failed_writes.append(write)
+                        request.error = str(e)
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+
+            if not self.pe.jack_running:
+                # the server has stopped, the client is not valid anymore
+                self._close_client()
+                request.error = 'JACK is not running'
+            else:
+                try:
+                    self._execute(request)
+                except Exception as e:
+                    request.error = str(e)
+
+                if request.error:
+                    # the client may be invalid (JackError),
+                    # the next request opens a new one.
+                    self._close_client()
+
+            self.request_done.emit(request)
+
+        self._close_client()
@@ -0,0 +1,156 @@
+'''Coalescing rules of the JACK graph events of one pass
+of patch events processing, without Qt,
+applied by `event_coalescer.PatchEventCoalescer`.
+
+Events are kept in order, with:
+- a port added and removed in the same pass, and all its events, dropped
+- a connection added and removed (or removed and added) dropped,
+  unless one of its ports was removed or added in between
+- only the last value of each metadata key kept'''
+
+from typing import Any
+
+
+class _Event:
+    __slots__ = ('method', 'args', 'alive')
+
+    def __init__(self, method: str, args: tuple):
+        self.method = method
+        'name of the PatchancePatchbayManager method'
+        self.args = args
+        self.alive = True
+
+
+class EventBatch:
+    def __init__(self):
+        self._events = list[_Event]()
+        self._added_ports = dict[str, _Event]()
+        'ports added in this pass'
+        self._port_events = dict[str, list[_Event]]()
+        'connection events of ports added in this pass'
+        self._uuid_events = dict[int, list[_Event]]()
+        'metadata events of ports added in this pass'
+        self._connections = dict[tuple[str, str], _Event]()
+        'last event of each connection in this pass'
+        self._port_connections = dict[str, set[tuple[str, str]]]()
+        'connections of each port in self._connections'
+        self._metadatas = dict[tuple[int, str], _Event]()
+        'last update of each metadata key in this pass'
+        self._added_uuids = dict[str, int]()
+        'uuid of each port added in this pass'
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def _append(self, method: str, *args) -> _Event:
+        event = _Event(method, args)
+        self._events.append(event)
+        return event
+
+    def _forget_connections(self, port_name: str):
+        '''a connection event before this port was added or removed
+        can not cancel a connection event after.'''
+        for pair in self._port_connections.pop(port_name, ()):
+            self._connections.pop(pair, None)
+            for other_name in pair:
+                if other_name == port_name:
+                    continue
+                pairs = self._port_connections.get(other_name)
+                if pairs is not None:
+                    pairs.discard(pair)
+                    if not pairs:
+                        del self._port_connections[other_name]
+
+    def port_added(self, name: str, port_type: Any, flags: int, uuid: int):
+        self._forget_connections(name)
+        self._added_ports[name] = self._append(
+            'add_port', name, port_type, flags, uuid)
+        if uuid:
+            self._added_uuids[name] = uuid
+            self._uuid_events[uuid] = []
+
+    def port_removed(self, name: str):
+        self._forget_connections(name)
+        added = self._added_ports.pop(name, None)
+        if added is None:
+            self._append('remove_port', name)
+            return
+
+        # the manager never saw this port
+        added.alive = False
+        for event in self._port_events.pop(name, []):
+            event.alive = False
+        for event in self._uuid_events.pop(
+                self._added_uuids.pop(name, 0), []):
+            event.alive = False
+
+    def port_renamed(self, ex_name: str, new_name: str, uuid: int):
+        # events of a renamed port are not cancelled anymore
+        self._forget_connections(ex_name)
+        self._forget_connections(new_name)
+        self._added_ports.pop(ex_name, None)
+        self._port_events.pop(ex_name, None)
+        self._uuid_events.pop(self._added_uuids.pop(ex_name, 0), None)
+        self._append('rename_port', ex_name, new_name, uuid)
+
+    def _connection_event(self, method: str, port_out_name: str,
+                          port_in_name: str):
+        pair = (port_out_name, port_in_name)
+        last = self._connections.get(pair)
+        if last is not None and last.alive and last.method != method:
+            # added and removed (or the contrary) in the same pass
+            last.alive = False
+            self._forget_connection(pair)
+            return
+
+        event = self._append(method, port_out_name, port_in_name)
+        self._connections[pair] = event
+        for port_name in pair:
+            self._port_connections.setdefault(port_name, set()).add(pair)
+            if port_name in self._added_ports:
+                self._port_events.setdefault(port_name, []).append(event)
+
+    def _forget_connection(self, pair: tuple[str, str]):
+        del self._connections[pair]
+        for port_name in pair:
+            pairs = self._port_connections.get(port_name)
+            if pairs is not None:
+                pairs.discard(pair)
+                if not pairs:
+                    del self._port_connections[port_name]
+
+    def connection_added(self, port_out_name: str, port_in_name: str):
+        self._connection_event('add_connection', port_out_name, port_in_name)
+
+    def connection_removed(self, port_out_name: str, port_in_name: str):
+        self._connection_event(
+            'remove_connection', port_out_name, port_in_name)
+
+    def metadata_updated(self, uuid: int, key: str, value: str):
+        last = self._metadatas.get((uuid, key))
+        if last is not None:
+            last.alive = False
+
+        event = self._append('metadata_update', uuid, key, value)
+        self._metadatas[(uuid, key)] = event
+        uuid_events = self._uuid_events.get(uuid)
+        if uuid_events is not None:
+            uuid_events.append(event)
+
+    def client_uuid_associated(self, client_name: str, uuid: int):
+        self._append('set_group_uuid_from_name', client_name, uuid)
+
+    def take(self) -> list[tuple[str, tuple]]:
+        '''return the (method, args) of the remaining events,
+        in order, and start a new pass.'''
+        events = [(e.method, e.args) for e in self._events if e.alive]
+
+        self._events.clear()
+        self._added_ports.clear()
+        self._port_events.clear()
+        self._uuid_events.clear()
+        self._connections.clear()
+        self._port_connections.clear()
+        self._metadatas.clear()
+        self._added_uuids.clear()
+        return events
@@ -0,0 +1,93 @@
+'''Coalescing of the JACK graph events received during one pass
+of patch events processing.
+
+When a big client starts or quits, hundreds of events come at once.
+They are coalesced with the rules of `event_batch`, and the remaining
+events are applied to the patchbay manager in one CanvasOptimizeIt block, followed by one redraw.'''
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+from qtpy.QtCore import QObject, QTimer
+
+from patchbay.bases.elements import CanvasOptimizeIt
+
+from event_batch import EventBatch
+
+if TYPE_CHECKING:
+    from patchance_pb_manager import PatchancePatchbayManager
+
+
+_logger = logging.getLogger(__name__)
+
+WINDOW_MS = 20
+'''max time in ms an event waits before to be applied
+if no pass end comes (events received out of a pass)'''
+
+
+class PatchEventCoalescer(QObject):
+    def __init__(self, mng: 'PatchancePatchbayManager'):
+        super().__init__()
+        self.mng = mng
+        self._batch = EventBatch()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(WINDOW_MS)
+        self._timer.timeout.connect(self.flush)
+
+    def _received(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def port_added(self, name: str, port_type: Any, flags: int, uuid: int):
+        self._batch.port_added(name, port_type, flags, uuid)
+        self._received()
+
+    def port_removed(self, name: str):
+        self._batch.port_removed(name)
+        self._received()
+
+    def port_renamed(self, ex_name: str, new_name: str, uuid: int):
+        self._batch.port_renamed(ex_name, new_name, uuid)
+        self._received()
+
+    def connection_added(self, port_out_name: str, port_in_name: str):
+        self._batch.connection_added(port_out_name, port_in_name)
+        self._received()
+
+    def connection_removed(self, port_out_name: str, port_in_name: str):
+        self._batch.connection_removed(port_out_name, port_in_name)
+        self._received()
+
+    def metadata_updated(self, uuid: int, key: str, value: str):
+        self._batch.metadata_updated(uuid, key, value)
+        self._received()
+
+    def client_uuid_associated(self, client_name: str, uuid: int):
+        self._batch.client_uuid_associated(client_name, uuid)
+        self._received()
+
+    def flush(self):
+        '''apply to the manager the remaining events'''
+        self._timer.stop()
+        n_received = len(self._batch)
+        events = self._batch.take()
+
+        if not events:
+            return
+
+        if n_received > len(events):
+            _logger.debug(
+                f'{n_received} patch events coalesced to {len(events)}')
+
+        mng = self.mng
+        if len(events) == 1:
+            method, args = events[0]
+            getattr(mng, method)(*args)
+            return
+
+        with CanvasOptimizeIt(mng):
+            for method, args in events:
+                getattr(mng, method)(*args)
+        mng.apply_delayed_changes_now()
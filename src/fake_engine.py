@@ -0,0 +1,190 @@
+'''Stand-in for PatchEngine, without any JACK server.
+
+It only keeps the graph state read by the patchbay manager,
+its state is set by the caller (replay, benchmarks).
+Requests (connect, pretty-names...) are only counted in `requests`.'''
+
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+from patshared import PortType
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FakePort:
+    name: str
+    type: PortType
+    flags: int
+    uuid: int
+
+
+class FakePatchEngine:
+    def __init__(self):
+        self.jack_running = True
+        self.client = None
+        self.dsp_wanted = False
+        self.samplerate = 48000
+        self.buffer_size = 1024
+        self._ports = dict[str, FakePort]()
+        self.connections = list[tuple[str, str]]()
+        self.client_name_uuids = dict[str, int]()
+        self.metadatas = dict[int, dict[str, str]]()
+        self.custom_names = None
+        'set by the caller, as the patchbay manager custom names'
+        self.requests = dict[str, int]()
+        'number of calls for each request method'
+        self._outer = None
+        self._queue = list[tuple[str, tuple]]()
+        'outer calls waiting for process_patch_events'
+
+    def _request(self, method: str):
+        self.requests[method] = self.requests.get(method, 0) + 1
+
+    # graph state
+
+    @property
+    def ports(self) -> list[FakePort]:
+        return list(self._ports.values())
+
+    def add_port(self, name: str, ptype: int, flags: int, uuid: int):
+        self._ports[name] = FakePort(name, PortType(ptype), flags, uuid)
+
+    def remove_port(self, name: str):
+        self._ports.pop(name, None)
+
+    def rename_port(self, ex_name: str, new_name: str, uuid=0):
+        port = self._ports.pop(ex_name, None)
+        if port is not None:
+            self._ports[new_name] = FakePort(
+                new_name, port.type, port.flags, uuid if uuid else port.uuid)
+
+    def update_metadata(self, uuid: int, key: str, value: str):
+        if value:
+            self.metadatas.setdefault(uuid, {})[key] = value
+        elif uuid in self.metadatas:
+            self.metadatas[uuid].pop(key, None)
+
+    def clear(self):
+        self._ports.clear()
+        self.connections.clear()
+        self.client_name_uuids.clear()
+        self.metadatas.clear()
+
+    def set_state(self, state: dict[str, Any]):
+        '''set all the graph state, as recorded by engine_recorder'''
+        self.clear()
+        for port in state.get('ports', []):
+            self.add_port(*port)
+        self.connections.extend(
+            tuple(c) for c in state.get('connections', []))
+        self.client_name_uuids.update(state.get('clients', {}))
+        for uuid, key_dict in state.get('metadatas', {}).items():
+            self.metadatas[int(uuid)] = dict(key_dict)
+        self.samplerate = state.get('samplerate', self.samplerate)
+        self.buffer_size = state.get('buffer_size', self.buffer_size)
+        self.jack_running = True
+
+    def apply_event(self, method: str, args: list):
+        '''update the graph state before an outer call is replayed'''
+        match method:
+            case 'associate_client_name_and_uuid':
+                self.client_name_uuids[args[0]] = args[1]
+            case 'port_added':
+                self.add_port(*args)
+            case 'port_renamed':
+                self.rename_port(*args)
+            case 'port_removed':
+                self.remove_port(args[0])
+            case 'metadata_updated':
+                self.update_metadata(*args)
+            case 'connection_added':
+                self.connections.append(tuple(args[0]))
+            case 'connection_removed':
+                if tuple(args[0]) in self.connections:
+                    self.connections.remove(tuple(args[0]))
+            case 'send_buffersize':
+                self.buffer_size = args[0]
+            case 'send_samplerate':
+                self.samplerate = args[0]
+            case 'server_stopped'|'send_server_lose':
+                self.clear()
+                self.jack_running = False
+            case 'server_restarted':
+                self.set_state(args[0])
+
+    # PatchEngine methods used by the patchbay
+
+    def start(self, outer):
+        '''as PatchEngine.start, queue the events of the current
+        graph state for `outer`, until process_patch_events.'''
+        self._outer = outer
+        for client_name, uuid in self.client_name_uuids.items():
+            self._queue.append(
+                ('associate_client_name_and_uuid', (client_name, uuid)))
+        for port in self._ports.values():
+            self._queue.append(
+                ('port_added', (port.name, port.type, port.flags, port.uuid)))
+        for connection in self.connections:
+            self._queue.append(('connection_added', (connection,)))
+        for uuid, key_dict in self.metadatas.items():
+            for key, value in key_dict.items():
+                self._queue.append(('metadata_updated', (uuid, key, value)))
+
+    def start_jack_client(self):
+        self._request('start_jack_client')
+
+    def process_patch_events(self):
+        queue = self._queue
+        self._queue = []
+        for method, args in queue:
+            getattr(self._outer, method)(*args)
+
+    def refresh(self):
+        self._request('refresh')
+
+    def send_dsp_load(self):
+        ...
+
+    def connect_ports(self, port_out_name: str, port_in_name: str,
+                      disconnect=False):
+        self._request('disconnect_ports' if disconnect else 'connect_ports')
+
+    def set_buffer_size(self, buffer_size: int):
+        self._request('set_buffer_size')
+
+    def set_pretty_names_auto_export(self, active: bool):
+        self._request('set_pretty_names_auto_export')
+
+    def write_group_pretty_name(self, client_name: str, pretty_name: str):
+        self._request('write_group_pretty_name')
+
+    def write_port_pretty_name(self, port_name: str, pretty_name: str):
+        self._request('write_port_pretty_name')
+
+    def export_all_custom_names_to_jack_now(self):
+        self._request('export_all_custom_names_to_jack_now')
+
+    def import_all_pretty_names_from_jack(self) \
+            -> tuple[dict[str, str], dict[str, str]]:
+        self._request('import_all_pretty_names_from_jack')
+        return {}, {}
+
+    def transport_play(self, play: bool):
+        self._request('transport_play')
+
+    def transport_stop(self):
+        self._request('transport_stop')
+
+    def transport_relocate(self, frame: int):
+        self._request('transport_relocate')
+
+    def close(self):
+        '''the fake engine is also the engine worker client'''
+        ...
+
+    def exit(self):
+        ...
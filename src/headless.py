@@ -0,0 +1,274 @@
+'''Headless mode: runs the patch engine without any Qt widget,
+controlled with a local socket.
+
+The protocol is line-delimited JSON. Each request is a JSON object
+with a "cmd" key, and gets one JSON object response with
+"ok": true or "ok": false and an "error" message. If the request
+contains an "id", it is copied in the response.
+
+Commands:
+    {"cmd": "list-ports"}
+    {"cmd": "list-connections"}
+    {"cmd": "connect", "connections": [["out", "in"], ...]}
+    {"cmd": "disconnect", "connections": [["out", "in"], ...]}
+    {"cmd": "rename", "port": "client:port", "name": "custom name"}
+    {"cmd": "rename", "group": "client", "name": "custom name"}
+        with optional "jack": true to also write the JACK pretty-name
+    {"cmd": "reload-rules"}
+        read again the auto-connect rules and apply them
+    {"cmd": "subscribe"}
+        then change events are sent on this connection, as
+        {"event": "port_added", ...}'''
+
+import json
+import logging
+import signal
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+from qtpy.QtCore import QCoreApplication, QSettings, QTimer
+from qtpy.QtNetwork import QLocalServer, QLocalSocket
+
+from patch_engine import PatchEngine, PatchEngineOuter
+from patshared import Naming, TransportPosition
+
+import xdg
+from auto_connect import AutoConnector, load_rules
+from control_commands import ControlCommands, read_request
+from engine_loop import PatchTimeoutObj
+from engine_wakeup import EngineWakeup
+from layout_store import read_memory
+
+
+_logger = logging.getLogger(__name__)
+
+SOCKET_NAME = 'control.sock'
+
+
+def default_socket_path(app_title: str) -> Path:
+    runtime_dir = xdg.xdg_runtime_dir()
+    if runtime_dir is None:
+        runtime_dir = Path('/tmp')
+    return runtime_dir / app_title.lower() / SOCKET_NAME
+
+
+class ControlServer:
+    def __init__(self, daemon: 'HeadlessDaemon', socket_path: Path):
+        self.daemon = daemon
+        self.socket_path = socket_path
+        self._server = QLocalServer()
+        self._server.setSocketOptions(
+            QLocalServer.SocketOption.UserAccessOption)
+        self._server.newConnection.connect(self._new_connection)
+        self._clients = list[QLocalSocket]()
+        self._subscribers = list[QLocalSocket]()
+
+    def listen(self) -> bool:
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        QLocalServer.removeServer(str(self.socket_path))
+        if not self._server.listen(str(self.socket_path)):
+            _logger.error(
+                f'Impossible to listen on {self.socket_path}: '
+                f'{self._server.errorString()}')
+            return False
+
+        _logger.info(f'listening on {self.socket_path}')
+        return True
+
+    def close(self):
+        for client in self._clients:
+            client.disconnectFromServer()
+        self._server.close()
+
+    def _new_connection(self):
+        while self._server.hasPendingConnections():
+            client = self._server.nextPendingConnection()
+            self._clients.append(client)
+            client.readyRead.connect(
+                lambda client=client: self._read_client(client))
+            client.disconnected.connect(
+                lambda client=client: self._client_disconnected(client))
+
+    def _client_disconnected(self, client: QLocalSocket):
+        if client in self._clients:
+            self._clients.remove(client)
+        if client in self._subscribers:
+            self._subscribers.remove(client)
+        client.deleteLater()
+
+    def _send(self, client: QLocalSocket, message: dict[str, Any]):
+        client.write((json.dumps(message) + '\n').encode())
+
+    def _read_client(self, client: QLocalSocket):
+        while client.canReadLine():
+            line = bytes(client.readLine()).decode(errors='replace').strip()
+            if not line:
+                continue
+
+            request = read_request(line)
+            if request is None:
+                self._send(client, {'ok': False, 'error': 'invalid JSON'})
+                continue
+
+            if request.get('cmd') == 'subscribe':
+                if client not in self._subscribers:
+                    self._subscribers.append(client)
+                response = {'ok': True}
+            else:
+                response = self.daemon.handle_request(request)
+
+            if 'id' in request:
+                response['id'] = request['id']
+            self._send(client, response)
+
+    def broadcast(self, event: dict[str, Any]):
+        if not self._subscribers:
+            return
+
+        data = (json.dumps(event) + '\n').encode()
+        for client in self._subscribers:
+            client.write(data)
+
+
+class HeadlessPatchEngineOuter(PatchEngineOuter):
+    def __init__(self, server: ControlServer, auto_connector: AutoConnector):
+        super().__init__()
+        self.server = server
+        self.auto_connector = auto_connector
+
+    def port_added(self, pname: str, ptype: int, pflags: int, puuid: int):
+        self.auto_connector.port_added(pname, ptype, pflags)
+        self.server.broadcast(
+            {'event': 'port_added', 'name': pname,
+             'type': int(ptype), 'flags': int(pflags), 'uuid': puuid})
+    def port_renamed(self, ex_name: str, new_name: str, uuid=0):
+        self.auto_connector.port_renamed(ex_name, new_name)
+        self.server.broadcast(
+            {'event': 'port_renamed', 'ex_name': ex_name,
+             'name': new_name, 'uuid': uuid})
+    def port_removed(self, port_name: str):
+        self.auto_connector.port_removed(port_name)
+        self.server.broadcast({'event': 'port_removed', 'name': port_name})
+    def metadata_updated(self, uuid: int, key: str, value: str):
+        self.server.broadcast(
+            {'event': 'metadata_updated', 'uuid': uuid,
+             'key': key, 'value': value})
+    def connection_added(self, connection: tuple[str, str]):
+        self.server.broadcast(
+            {'event': 'connection_added', 'connection': list(connection)})
+    def connection_removed(self, connection: tuple[str, str]):
+        self.server.broadcast(
+            {'event': 'connection_removed', 'connection': list(connection)})
+    def server_stopped(self):
+        self.auto_connector.clear()
+        self.server.broadcast({'event': 'server_stopped'})
+    def send_transport_position(self, tpos: TransportPosition):
+        ...
+    def send_dsp_load(self, dsp_load: int):
+        ...
+    def send_one_xrun(self):
+        self.server.broadcast({'event': 'xrun'})
+    def send_buffersize(self, buffer_size: int):
+        self.server.broadcast(
+            {'event': 'buffer_size', 'value': buffer_size})
+    def send_samplerate(self, samplerate: int):
+        self.server.broadcast(
+            {'event': 'sample_rate', 'value': samplerate})
+    def send_server_lose(self):
+        self.auto_connector.clear()
+        self.server.broadcast({'event': 'server_lose'})
+    def server_restarted(self):
+        self.server.broadcast({'event': 'server_restarted'})
+
+
+class HeadlessDaemon:
+    def __init__(self, app_title: str, config_dir: Path,
+                 socket_path: Optional[Path]=None):
+        self.config_dir = config_dir
+        settings = QSettings(
+            str(config_dir / f'{app_title}.conf'),
+            QSettings.Format.IniFormat)
+        export_naming = Naming.from_config_str(
+            settings.value(
+                'Canvas/jack_export_naming', 'TRUE_NAME', type=str))
+
+        self.pe = PatchEngine(
+            app_title, Path(f'/tmp/{app_title}/pretty_names.json'),
+            Naming.CUSTOM in export_naming)
+
+        try:
+            memory = read_memory(config_dir)
+        except Exception as e:
+            _logger.warning(f'Failed to read canvas memory: {str(e)}')
+            memory = None
+        self._memory = memory if memory is not None else {}
+        self.pe.custom_names.eat_json(self._memory.get('custom_names'))
+
+        if socket_path is None:
+            socket_path = default_socket_path(app_title)
+        self.server = ControlServer(self, socket_path)
+
+        self.auto_connector = AutoConnector(
+            load_rules(config_dir), self._connect_many)
+        self.auto_connector.connections = lambda: self.pe.connections
+        self.commands = ControlCommands(
+            self.pe, self.auto_connector, config_dir)
+
+        self.timeout_obj = PatchTimeoutObj(self.pe)
+        # transport is never displayed in headless mode
+        self.timeout_obj.set_transport_displayed(False)
+        self.timeout_obj.patch_events_processed.connect(
+            self.auto_connector.resolve)
+        self.wakeup = EngineWakeup(self.pe)
+        if self.wakeup.install():
+            self.timeout_obj.set_event_driven(True)
+            self.wakeup.events_queued.connect(self.timeout_obj.process_events)
+
+    def start(self) -> bool:
+        if not self.server.listen():
+            return False
+
+        self.pe.start(
+            HeadlessPatchEngineOuter(self.server, self.auto_connector))
+        self.pe.apply_pretty_names_export()
+        self.timeout_obj.start()
+        return True
+
+    def stop(self):
+        self.timeout_obj.stop()
+        self.server.close()
+        self.wakeup.close()
+        self.pe.exit()
+
+    def _connect_many(self, pairs: list[tuple[str, str]]):
+        for port_out_name, port_in_name in pairs:
+            try:
+                self.pe.connect_ports(port_out_name, port_in_name)
+            except Exception as e:
+                _logger.warning(
+                    f'auto-connect {port_out_name} {port_in_name}: {str(e)}')
+
+    def handle_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        return self.commands.handle_request(request)
+
+
+def run(app_title: str, config_dir: Path, socket_path: Optional[Path]=None):
+    app = QCoreApplication(sys.argv)
+    app.setApplicationName(app_title)
+    app.setOrganizationName(app_title)
+
+    signal.signal(signal.SIGINT, lambda *args: QCoreApplication.quit())
+    signal.signal(signal.SIGTERM, lambda *args: QCoreApplication.quit())
+
+    #needed for signals SIGINT, SIGTERM
+    timer = QTimer()
+    timer.start(200)
+    timer.timeout.connect(lambda: None)
+
+    daemon = HeadlessDaemon(app_title, config_dir, socket_path)
+    if not daemon.start():
+        sys.exit(1)
+
+    app.exec()
+    daemon.stop()
@@ -8,6 +8,51 @@ Usage: patchance [--help] [--version]
             import JACK pretty-names to custom names, save config and exit
   --clear-pretty-names
             delete all JACK pretty-name metadatas and exit
+  --save-snapshot NAME
+            save current connections and custom names as snapshot NAME
+            and exit
+  --restore-snapshot NAME
+            restore connections of snapshot NAME (or snapshot file)
+            with minimal changes and exit
+  --auto-connect
+            apply the auto-connect rules of auto_connect.json
+            to the current JACK graph and exit
+  --cli COMMAND [ARGS] [--and COMMAND [ARGS]]...
+            run fast JACK commands without starting the patch engine:
+            connect, disconnect, list-ports, list-connections,
+            export-names, import-names, apply-snapshot.
+            '--cli -' reads one command per line on stdin,
+            '--cli --help' shows the commands usage.
+            Must be the last patchance option
+  --export-memory FILE
+            export the canvas memory (views, portgroups, custom names)
+            to FILE in the canvas.json format and exit
+  --import-memory FILE
+            import FILE (canvas.json format) into the SQLite
+            canvas memory and exit
+  --export-dsp-history FILE
+            export the DSP load and xruns history as CSV to FILE
+            ('-' for stdout) and exit
+  --render FILE
+            render the canvas with the live JACK graph to FILE
+            (.svg or .png) without showing any window and exit
+  --view N  with --render, render the view number N
+            instead of the last used view
+  --headless
+            run the patch engine without GUI, controlled with
+            line-delimited JSON on a local socket
+  --socket SOCKET_PATH
+            socket path for --headless mode,
+            default is $XDG_RUNTIME_DIR/patchance/control.sock
+  --record-events FILE
+            record all the JACK graph events received by the patchbay
+            in FILE, to replay them with src/replay_events.py
+  --profile-startup
+            print the duration of each startup phase
+  --perf
+            measure the latency of the hot paths (periodic jobs,
+            JACK callbacks, canvas updates, memory save and load),
+            shown in a Performance dock and printed at exit
   --dbg, -dbg
             log debug for modules splitted with a ':',
             for example: --dbg patch_engine:patchbay.patchcanvas
@@ -0,0 +1,305 @@
+'''Fast one-shot JACK commands for scripts.
+
+    patchance --cli COMMAND [ARGS] [--and COMMAND [ARGS]]...
+    patchance --cli -          (one command per line on stdin)
+
+Unlike the other one-shot actions, no PatchEngine is started.
+A JACK client is opened without being activated, and each command
+queries only what it needs from the server.
+All the commands of one invocation share the same JACK client,
+opened only once all the commands are known.
+
+This module must never import Qt, and imports JACK only when needed.'''
+
+import fnmatch
+import json
+import logging
+import shlex
+import sys
+from pathlib import Path
+from typing import Any
+
+
+_logger = logging.getLogger(__name__)
+
+CLIENT_NAME = 'PatchanceCli'
+PRETTY_NAME_KEY = 'http://jackaudio.org/metadata/pretty-name'
+SEPARATOR = '--and'
+
+USAGE = """Usage: patchance --cli COMMAND [ARGS] [--and COMMAND [ARGS]]...
+       patchance --cli -   (read commands from stdin, one per line)
+Commands:
+  connect PORT_OUT PORT_IN
+  disconnect PORT_OUT PORT_IN
+  list-ports [--json] [PATTERN]
+  list-connections [--json] [PATTERN]
+  export-names          write custom names as JACK pretty-names
+  import-names          save JACK pretty-names as custom names
+  apply-snapshot SNAPSHOT
+            SNAPSHOT is a snapshot name or a snapshot file
+"""
+
+
+COMMANDS = {'connect': 'connect',
+            'disconnect': 'disconnect',
+            'list-ports': 'list_ports',
+            'list-connections': 'list_connections',
+            'export-names': 'export_names',
+            'import-names': 'import_names',
+            'apply-snapshot': 'apply_snapshot'}
+'JackCli method of each command'
+
+
+class CliError(Exception):
+    pass
+
+
+def _decode(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode(errors='replace')
+    return str(value)
+
+
+class JackCli:
+    def __init__(self, config_dir: Path):
+        import jack
+
+        self.config_dir = config_dir
+        self.client = jack.Client(CLIENT_NAME, no_start_server=True)
+
+    def close(self):
+        self.client.close()
+
+    def run(self, command: list[str]) -> bool:
+        import jack
+
+        name, args = command[0], command[1:]
+        try:
+            getattr(self, COMMANDS[name])(args)
+        except (CliError, jack.JackError, OSError, ValueError) as e:
+            sys.stderr.write(f'{name}: {str(e)}\n')
+            return False
+        return True
+
+    # queries
+
+    def _pretty_name(self, uuid: int) -> str:
+        import jack
+
+        prop = jack.get_property(uuid, PRETTY_NAME_KEY)
+        if prop is None:
+            return ''
+        return _decode(prop[0])
+
+    def _client_uuid(self, client_name: str) -> int:
+        return int(self.client.get_uuid_for_client_name(client_name))
+
+    def _connections(self, pattern: str='') -> list[tuple[str, str]]:
+        connections = list[tuple[str, str]]()
+        for port in self.client.get_ports(is_output=True):
+            for port_in in self.client.get_all_connections(port):
+                if (pattern
+                        and not fnmatch.fnmatchcase(port.name, pattern)
+                        and not fnmatch.fnmatchcase(port_in.name, pattern)):
+                    continue
+                connections.append((port.name, port_in.name))
+        return connections
+
+    def _read_custom_names(self):
+        from patshared import CustomNames
+        from layout_store import read_custom_names
+
+        custom_names = CustomNames()
+        custom_names.eat_json(read_custom_names(self.config_dir))
+        return custom_names
+
+    # commands
+
+    def _check_args(self, args: list[str], n: int, usage: str):
+        if len(args) != n:
+            raise CliError(f'usage: {usage}')
+
+    def connect(self, args: list[str]):
+        self._check_args(args, 2, 'connect PORT_OUT PORT_IN')
+        if args[1] in [p.name for p in self.client.get_all_connections(
+                args[0])]:
+            return
+        self.client.connect(*args)
+
+    def disconnect(self, args: list[str]):
+        self._check_args(args, 2, 'disconnect PORT_OUT PORT_IN')
+        if args[1] not in [p.name for p in self.client.get_all_connections(
+                args[0])]:
+            return
+        self.client.disconnect(*args)
+
+    def _parse_list_args(self, args: list[str], usage: str) \
+            -> tuple[bool, str]:
+        as_json = '--json' in args
+        others = [a for a in args if a != '--json']
+        if len(others) > 1:
+            raise CliError(f'usage: {usage}')
+        return as_json, others[0] if others else ''
+
+    def list_ports(self, args: list[str]):
+        as_json, pattern = self._parse_list_args(
+            args, 'list-ports [--json] [PATTERN]')
+        ports = self.client.get_ports()
+        if pattern:
+            ports = [p for p in ports if fnmatch.fnmatchcase(p.name, pattern)]
+
+        if not as_json:
+            for port in ports:
+                sys.stdout.write(f'{port.name}\n')
+            return
+
+        ports_list = list[dict[str, Any]]()
+        for port in ports:
+            if port.is_audio:
+                port_type = 'audio'
+            elif port.is_midi:
+                port_type = 'midi'
+            else:
+                port_type = 'other'
+
+            ports_list.append(
+                {'name': port.name,
+                 'type': port_type,
+                 'mode': 'input' if port.is_input else 'output',
+                 'physical': port.is_physical,
+                 'uuid': port.uuid,
+                 'pretty_name': self._pretty_name(port.uuid),
+                 'aliases': list(port.aliases)})
+        json.dump(ports_list, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+    def list_connections(self, args: list[str]):
+        as_json, pattern = self._parse_list_args(
+            args, 'list-connections [--json] [PATTERN]')
+        connections = self._connections(pattern)
+
+        if as_json:
+            json.dump([list(c) for c in connections], sys.stdout, indent=2)
+            sys.stdout.write('\n')
+            return
+
+        for port_out_name, port_in_name in connections:
+            sys.stdout.write(f'{port_out_name} {port_in_name}\n')
+
+    def export_names(self, args: list[str]):
+        self._check_args(args, 0, 'export-names')
+        custom_names = self._read_custom_names()
+
+        client_names = set[str]()
+        n_written = 0
+        for port in self.client.get_ports():
+            client_names.add(port.name.partition(':')[0])
+            custom_name = custom_names.custom_port(port.name)
+            if custom_name and custom_name != self._pretty_name(port.uuid):
+                self.client.set_property(
+                    port.uuid, PRETTY_NAME_KEY, custom_name)
+                n_written += 1
+
+        for client_name in client_names:
+            custom_name = custom_names.custom_group(client_name)
+            if not custom_name:
+                continue
+            uuid = self._client_uuid(client_name)
+            if custom_name != self._pretty_name(uuid):
+                self.client.set_property(uuid, PRETTY_NAME_KEY, custom_name)
+                n_written += 1
+
+        _logger.info(f'{n_written} pretty names written')
+
+    def import_names(self, args: list[str]):
+        self._check_args(args, 0, 'import-names')
+        custom_names = self._read_custom_names()
+        changed = False
+
+        client_names = set[str]()
+        for port in self.client.get_ports():
+            client_names.add(port.name.partition(':')[0])
+            pretty_name = self._pretty_name(port.uuid)
+            if pretty_name and pretty_name != custom_names.custom_port(
+                    port.name):
+                custom_names.save_port(port.name, pretty_name)
+                changed = True
+
+        for client_name in client_names:
+            pretty_name = self._pretty_name(self._client_uuid(client_name))
+            if pretty_name and pretty_name != custom_names.custom_group(
+                    client_name):
+                custom_names.save_group(client_name, pretty_name)
+                changed = True
+
+        if changed:
+            self._write_custom_names(custom_names.to_json())
+
+    def _write_custom_names(self, custom_names_dict: dict[str, Any]):
+        from layout_store import write_custom_names
+        write_custom_names(self.config_dir, custom_names_dict)
+
+    def apply_snapshot(self, args: list[str]):
+        self._check_args(args, 1, 'apply-snapshot SNAPSHOT')
+        from patch_snapshots import (
+            load_snapshot, restore_custom_names, snapshot_diff)
+
+        snapshot = load_snapshot(self.config_dir, args[0])
+        to_disconnect, to_connect = snapshot_diff(
+            self._connections(), snapshot.connections,
+            {p.name for p in self.client.get_ports()})
+        for connection in to_disconnect:
+            self.client.disconnect(*connection)
+        for connection in to_connect:
+            self.client.connect(*connection)
+        if restore_custom_names(self.config_dir, snapshot):
+            _logger.info('custom names of the snapshot restored')
+
+
+def parse_commands(args: list[str]) -> list[list[str]]:
+    '''split the arguments in commands separated with --and,
+    or read them from stdin if the only argument is "-".'''
+    if args == ['-']:
+        commands = list[list[str]]()
+        for line in sys.stdin:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                commands.append(shlex.split(line))
+        return commands
+
+    commands = [list[str]()]
+    for arg in args:
+        if arg == SEPARATOR:
+            commands.append([])
+        else:
+            commands[-1].append(arg)
+    return [c for c in commands if c]
+
+
+def run(args: list[str], config_dir: Path) -> int:
+    commands = parse_commands(args)
+    if not commands or commands[0][0] in ('-h', '--help', 'help'):
+        sys.stdout.write(USAGE)
+        return 0 if commands else 1
+
+    unknown = [c[0] for c in commands if c[0] not in COMMANDS]
+    if unknown:
+        for name in unknown:
+            sys.stderr.write(f'Unknown command {name}\n')
+        return 1
+
+    import jack
+
+    try:
+        cli = JackCli(config_dir)
+    except jack.JackOpenError:
+        sys.stderr.write('JACK is not running\n')
+        return 1
+
+    success = True
+    for command in commands:
+        if not cli.run(command):
+            success = False
+
+    cli.close()
+    return 0 if success else 1
@@ -0,0 +1,109 @@
+import logging
+import os
+import random
+from pathlib import Path
+
+from qtpy.QtCore import QObject, QFileSystemWatcher, Signal
+
+import xdg
+
+
+_logger = logging.getLogger(__name__)
+
+# jackd puts its sockets in /dev/shm, pipewire in $XDG_RUNTIME_DIR
+JACK_SHM_DIR = Path('/dev/shm')
+SERVER_SOCKET_PREFIXES = ('jack', 'pipewire-')
+
+RECONNECT_INTERVAL = 500
+'ms between the JACK server stop and the first reconnection attempt'
+
+
+class ReconnectBackoff:
+    '''Exponential backoff with jitter for JACK reconnection attempts.'''
+
+    def __init__(self, first_delay=0.5, factor=2.0,
+                 max_delay=30.0, jitter=0.2):
+        self.first_delay = first_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.attempts = 0
+        self.last_error = ''
+
+    def reset(self):
+        self.attempts = 0
+        self.last_error = ''
+
+    def failed(self, error: str) -> float:
+        '''count a failed attempt and return the delay in seconds
+        before the next one.'''
+        self.attempts += 1
+        self.last_error = error
+        delay = self.first_delay * self.factor ** (self.attempts - 1)
+        delay *= random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+        return min(self.max_delay, delay)
+
+    def max_elapsed(self, attempts: int) -> float:
+        '''longest time in seconds from the first attempt
+        to the attempt number `attempts`, jitter included.'''
+        elapsed = 0.0
+        for n in range(1, attempts):
+            elapsed += min(self.max_delay,
+                           self.first_delay * self.factor ** (n - 1)
+                           * (1.0 + self.jitter))
+        return elapsed
+
+
+class ServerSocketWatcher(QObject):
+    '''Watch the directories where JACK or PipeWire create their sockets,
+    and emit `server_socket_appeared` when a new server socket appears.'''
+
+    server_socket_appeared = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self._dirs = list[Path]()
+        runtime_dir = xdg.xdg_runtime_dir()
+        if runtime_dir is not None:
+            self._dirs.append(runtime_dir)
+        if JACK_SHM_DIR.is_dir():
+            self._dirs.append(JACK_SHM_DIR)
+
+        self._known = dict[str, set[str]]()
+        for dir in self._dirs:
+            self._known[str(dir)] = self._server_entries(dir)
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._dir_changed)
+        self._watching = False
+
+    def _server_entries(self, dir: Path) -> set[str]:
+        try:
+            return {name for name in os.listdir(dir)
+                    if name.startswith(SERVER_SOCKET_PREFIXES)}
+        except OSError:
+            return set()
+
+    def start(self):
+        if self._watching or not self._dirs:
+            return
+
+        for dir in self._dirs:
+            self._known[str(dir)] = self._server_entries(Path(dir))
+        self._watcher.addPaths([str(d) for d in self._dirs])
+        self._watching = True
+
+    def stop(self):
+        if not self._watching:
+            return
+
+        self._watcher.removePaths(self._watcher.directories())
+        self._watching = False
+
+    def _dir_changed(self, path: str):
+        entries = self._server_entries(Path(path))
+        new_entries = entries - self._known.get(path, set())
+        self._known[path] = entries
+        if new_entries:
+            _logger.debug(f'server socket appeared: {new_entries}')
+            self.server_socket_appeared.emit()
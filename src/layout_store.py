@@ -0,0 +1,359 @@
+'''SQLite storage for the canvas memory (views, portgroups, custom names).
+
+With a very large memory, only the active view is fully loaded
+at startup, other views are loaded when they are first shown.
+The contents are the same as in the canvas.json file,
+which can be imported and exported.'''
+
+import configparser
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from canvas_memory import MemoryFileWriter
+
+
+_logger = logging.getLogger(__name__)
+
+STORE_FILE = 'canvas.sqlite'
+JSON_FILE = 'canvas.json'
+SETTINGS_FILE = 'Patchance.conf'
+
+
+def _split_view(view_dict: dict[str, Any]) -> tuple[dict, dict]:
+    '''split a view dict in its header (index, name, options...)
+    and its body (containers, the group positions).'''
+    header = dict[str, Any]()
+    body = dict[str, Any]()
+    for key, value in view_dict.items():
+        if isinstance(value, (dict, list)):
+            body[key] = value
+        else:
+            header[key] = value
+    return header, body
+
+
+def _port_mode_dicts(body: dict[str, Any]) -> list[dict[str, Any]]:
+    '''the {group_name: group position} dicts of a view body,
+    which is {port_types_view: {port_mode: {group_name: position}}}'''
+    gpos_dicts = list[dict[str, Any]]()
+    for ptv_dict in body.values():
+        if not isinstance(ptv_dict, dict):
+            continue
+        for gpos_dict in ptv_dict.values():
+            if isinstance(gpos_dict, dict):
+                gpos_dicts.append(gpos_dict)
+    return gpos_dicts
+
+
+def _group_names(body: dict[str, Any]) -> set[str]:
+    group_names = set[str]()
+    for gpos_dict in _port_mode_dicts(body):
+        group_names.update(k for k in gpos_dict if isinstance(k, str))
+    return group_names
+
+
+def _prune_body(body: dict[str, Any], stale_groups: set[str]) -> bool:
+    '''remove the positions of stale groups from a view body.
+    Return True if the body has changed.'''
+    changed = False
+    for gpos_dict in _port_mode_dicts(body):
+        for group_name in stale_groups.intersection(gpos_dict):
+            del gpos_dict[group_name]
+            changed = True
+    return changed
+
+
+class LayoutStore:
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn = sqlite3.connect(str(path))
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS meta '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS views '
+            '(num INTEGER PRIMARY KEY, header TEXT NOT NULL, '
+            'body TEXT NOT NULL, digest BLOB);'
+            'CREATE TABLE IF NOT EXISTS groups_seen '
+            '(name TEXT PRIMARY KEY, last_seen REAL NOT NULL);')
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def is_empty(self) -> bool:
+        return self._conn.execute(
+            'SELECT COUNT(*) FROM views').fetchone()[0] == 0
+
+    def _get_meta(self, key: str) -> Any:
+        row = self._conn.execute(
+            'SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def _set_meta(self, key: str, value: Any):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            (key, json.dumps(value)))
+
+    def view_headers(self) -> dict[int, dict[str, Any]]:
+        return {num: json.loads(header) for num, header in
+                self._conn.execute('SELECT num, header FROM views')}
+
+    def load_view(self, num: int) -> Optional[dict[str, Any]]:
+        row = self._conn.execute(
+            'SELECT header, body FROM views WHERE num=?', (num,)).fetchone()
+        if row is None:
+            return None
+
+        view_dict = json.loads(row[0])
+        view_dict.update(json.loads(row[1]))
+        return view_dict
+
+    def load_memory(self, eager_view: Optional[int]=None) \
+            -> tuple[dict[str, Any], set[int]]:
+        '''return the memory dict in the canvas.json format, with only
+        `eager_view` (or the first view) fully loaded, and the set
+        of the view numbers loaded with their header only.'''
+        headers = self.view_headers()
+        if eager_view not in headers:
+            eager_view = min(headers) if headers else None
+
+        views = list[dict[str, Any]]()
+        lazy_views = set[int]()
+        for num, header in sorted(headers.items()):
+            if num == eager_view:
+                view_dict = self.load_view(num)
+                if view_dict is not None:
+                    views.append(view_dict)
+                    continue
+            views.append(header)
+            lazy_views.add(num)
+
+        return ({'views': views,
+                 'portgroups': self._get_meta('portgroups'),
+                 'custom_names': self._get_meta('custom_names')},
+                lazy_views)
+
+    def save_memory(self, memory: dict[str, Any], lazy_views: set[int]):
+        '''save the memory dict in the canvas.json format.
+        Views in `lazy_views` have not been loaded, only their
+        header is updated. Unchanged views are not rewritten.'''
+        digests = {num: digest for num, digest in
+                   self._conn.execute('SELECT num, digest FROM views')}
+        saved_nums = set[int]()
+
+        for i, view_dict in enumerate(memory.get('views', [])):
+            num = view_dict.get('index', i + 1)
+            if not isinstance(num, int):
+                continue
+            saved_nums.add(num)
+            header, body = _split_view(view_dict)
+            header_str = json.dumps(header)
+
+            if num in lazy_views:
+                self._conn.execute(
+                    'UPDATE views SET header=? WHERE num=?',
+                    (header_str, num))
+                continue
+
+            body_str = json.dumps(body)
+            digest = hashlib.blake2b(
+                (header_str + body_str).encode()).digest()
+            if digests.get(num) == digest:
+                continue
+
+            self._conn.execute(
+                'INSERT OR REPLACE INTO views (num, header, body, digest) '
+                'VALUES (?, ?, ?, ?)',
+                (num, header_str, body_str, digest))
+
+        for num in set(digests) - saved_nums:
+            self._conn.execute('DELETE FROM views WHERE num=?', (num,))
+
+        self._set_meta('portgroups', memory.get('portgroups'))
+        self._set_meta('custom_names', memory.get('custom_names'))
+        self._conn.commit()
+
+    def load_custom_names(self) -> Optional[dict[str, Any]]:
+        return self._get_meta('custom_names')
+
+    def save_custom_names(self, custom_names: dict[str, Any]):
+        self._set_meta('custom_names', custom_names)
+        self._conn.commit()
+
+    def touch_groups(self, group_names: set[str]):
+        '''remember these groups have been seen now'''
+        now = time.time()
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO groups_seen (name, last_seen) '
+            'VALUES (?, ?)', [(name, now) for name in group_names])
+        self._conn.commit()
+
+    def prune(self, days: float) -> int:
+        '''remove from all views the positions of groups not seen
+        since `days` days. Return the number of pruned groups.'''
+        limit = time.time() - days * 86400
+        stale_groups = {row[0] for row in self._conn.execute(
+            'SELECT name FROM groups_seen WHERE last_seen < ?', (limit,))}
+        if not stale_groups:
+            return 0
+
+        for num, body_str in list(self._conn.execute(
+                'SELECT num, body FROM views')):
+            body = json.loads(body_str)
+            if not _prune_body(body, stale_groups):
+                continue
+            self._conn.execute(
+                'UPDATE views SET body=?, digest=NULL WHERE num=?',
+                (json.dumps(body), num))
+
+        self._conn.executemany(
+            'DELETE FROM groups_seen WHERE name=?',
+            [(name,) for name in stale_groups])
+        self._conn.commit()
+        _logger.info(f'{len(stale_groups)} old groups pruned from memory')
+        return len(stale_groups)
+
+    def import_json(self, memory: dict[str, Any]):
+        '''replace all the store contents with a canvas.json dict'''
+        self._conn.execute('DELETE FROM views')
+        self.save_memory(memory, set())
+
+        # groups known at import are considered as seen now
+        group_names = set[str]()
+        for view_dict in memory.get('views', []):
+            group_names |= _group_names(_split_view(view_dict)[1])
+        self.touch_groups(group_names)
+
+    def export_json(self) -> dict[str, Any]:
+        '''return all the store contents as a canvas.json dict'''
+        views = list[dict[str, Any]]()
+        for num in sorted(self.view_headers()):
+            view_dict = self.load_view(num)
+            if view_dict is not None:
+                views.append(view_dict)
+
+        return {'views': views,
+                'portgroups': self._get_meta('portgroups'),
+                'custom_names': self._get_meta('custom_names')}
+
+
+def open_store(config_dir: Path) -> LayoutStore:
+    '''open the store of this config dir, importing canvas.json
+    if the store is new.'''
+    store = LayoutStore(config_dir / STORE_FILE)
+    json_path = config_dir / JSON_FILE
+    if store.is_empty() and json_path.is_file():
+        try:
+            with open(json_path, 'r') as f:
+                memory = json.load(f)
+            assert isinstance(memory, dict)
+            store.import_json(memory)
+            _logger.info(f'{json_path} imported in {store.path}')
+        except Exception as e:
+            _logger.warning(f'Failed to import {json_path}: {str(e)}')
+    return store
+
+
+def memory_backend(config_dir: Path) -> str:
+    '''return 'sqlite' or 'json', the canvas memory backend set
+    with 'Canvas/memory_backend' in the settings of this config dir.
+
+    The settings file is read without Qt, so it can be used
+    by the command line tools.'''
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    try:
+        parser.read(config_dir / SETTINGS_FILE)
+        backend = parser.get('Canvas', 'memory_backend', fallback='json')
+    except configparser.Error as e:
+        _logger.warning(f'Failed to read {SETTINGS_FILE}: {str(e)}')
+        return 'json'
+
+    return 'sqlite' if backend.strip('"') == 'sqlite' else 'json'
+
+
+def _use_store(config_dir: Path) -> bool:
+    return (memory_backend(config_dir) == 'sqlite'
+            and (config_dir / STORE_FILE).is_file())
+
+
+def read_memory(config_dir: Path) -> Optional[dict[str, Any]]:
+    '''return the canvas memory dict of this config dir,
+    from the store with the sqlite backend, else from canvas.json.'''
+    if _use_store(config_dir):
+        store = LayoutStore(config_dir / STORE_FILE)
+        memory = store.export_json()
+        store.close()
+        return memory
+
+    json_path = config_dir / JSON_FILE
+    if not json_path.is_file():
+        return None
+
+    with open(json_path, 'r') as f:
+        memory = json.load(f)
+    if not isinstance(memory, dict):
+        raise TypeError(f'{json_path} does not contain a dict')
+    return memory
+
+
+def read_custom_names(config_dir: Path) -> Optional[dict[str, Any]]:
+    '''return only the custom names of the canvas memory,
+    without loading the views from the store.'''
+    if _use_store(config_dir):
+        store = LayoutStore(config_dir / STORE_FILE)
+        custom_names = store.load_custom_names()
+        store.close()
+        return custom_names
+
+    memory = read_memory(config_dir)
+    if memory is None:
+        return None
+    return memory.get('custom_names')
+
+
+def write_custom_names(config_dir: Path, custom_names: dict[str, Any]):
+    '''replace the custom names of the canvas memory
+    in the backend used by this config dir.'''
+    if memory_backend(config_dir) == 'sqlite':
+        store = open_store(config_dir)
+        store.save_custom_names(custom_names)
+        store.close()
+        return
+
+    from patshared import from_json_to_str
+
+    json_path = config_dir / JSON_FILE
+    memory = dict[str, Any]()
+    if json_path.is_file():
+        with open(json_path, 'r') as f:
+            memory = json.load(f)
+    memory['custom_names'] = custom_names
+    config_dir.mkdir(parents=True, exist_ok=True)
+    MemoryFileWriter(json_path).write(from_json_to_str(memory))
+
+
+def import_json_file(config_dir: Path, json_path: Path):
+    with open(json_path, 'r') as f:
+        memory = json.load(f)
+    if not isinstance(memory, dict):
+        raise TypeError(f'{json_path} does not contain a dict')
+
+    store = LayoutStore(config_dir / STORE_FILE)
+    store.import_json(memory)
+    store.close()
+
+
+def export_json_file(config_dir: Path, json_path: Path):
+    memory = read_memory(config_dir)
+    if memory is None:
+        raise FileNotFoundError(f'No canvas memory in {config_dir}')
+
+    with open(json_path, 'w') as f:
+        json.dump(memory, f, indent=2)
@@ -1,24 +1,45 @@
 
 from typing import TYPE_CHECKING
 
-from qtpy.QtCore import Qt, Slot
-from qtpy.QtGui import QResizeEvent, QKeyEvent
+from qtpy.QtCore import Qt, Slot, Signal, QEvent
+from qtpy.QtGui import QResizeEvent, QKeyEvent, QShowEvent, QHideEvent
 from qtpy.QtWidgets import (
     QMainWindow, QShortcut, QMenu, QApplication, QToolButton)
 
 from patchbay.tools_widgets import PatchbayToolsWidget, TextWithIcons
 from patchbay.bases.elements import ToolDisplayed
 
-from about_dialog import AboutDialog
-from donate_dialog import DonationsDialog
-
 from ui.main_win import Ui_MainWindow
+from meters_dock import MetersDock
+from dsp_sparkline import DspSparkline
+from perf_monitor import perf
 
 if TYPE_CHECKING:
     from patchance import Main
 
 
+TRANSPORT_TOOLS = (ToolDisplayed.TRANSPORT_CLOCK
+                   | ToolDisplayed.TRANSPORT_PLAY_STOP)
+
+
+class PatchanceToolsWidget(PatchbayToolsWidget):
+    def __init__(self, main_win: 'MainWindow'):
+        super().__init__()
+        self._main_win = main_win
+
+    def change_tools_displayed(self, tools_displayed: ToolDisplayed):
+        super().change_tools_displayed(tools_displayed)
+        self._main_win.set_transport_displayed(
+            bool(tools_displayed & TRANSPORT_TOOLS))
+
+
 class MainWindow(QMainWindow):
+    displayed_changed = Signal(bool)
+    'emitted when the window is shown, hidden, minimized or restored'
+
+    transport_displayed_changed = Signal(bool)
+    'emitted when transport widgets are shown or hidden in the tool bar'
+
     def __init__(self):
         super().__init__()
         self.ui = Ui_MainWindow()
@@ -66,20 +87,44 @@ class MainWindow(QMainWindow):
         
         self._normal_screen_maximized = False
         self._normal_screen_had_menu = False
+        self._displayed = False
+        self.transport_displayed = True
         
-        self.patchbay_tools = PatchbayToolsWidget()
+        self.patchbay_tools = PatchanceToolsWidget(self)
         self.patchbay_tools._text_with_icons = TextWithIcons.NO
         self.patchbay_tools.no_text_with_icons_act = True
         self.patchbay_tools.set_tool_bars(
             self.ui.toolBar, self.ui.toolBarTransport,
             self.ui.toolBarJack, self.ui.toolBarCanvas)
 
+        self.dsp_sparkline = DspSparkline(self)
+        self.ui.toolBarJack.addWidget(self.dsp_sparkline)
+        self.displayed_changed.connect(self.dsp_sparkline.set_displayed)
+
+        self.meters_dock = MetersDock(self)
+        self.addDockWidget(
+            Qt.DockWidgetArea.BottomDockWidgetArea, self.meters_dock)
+        self.meters_dock.setVisible(False)
+        self.main_menu.insertAction(
+            self.last_separator, self.meters_dock.toggleViewAction())
+
+        if perf.enabled:
+            from perf_dock import PerfDock
+            self.perf_dock = PerfDock(perf, self)
+            self.addDockWidget(
+                Qt.DockWidgetArea.RightDockWidgetArea, self.perf_dock)
+            self.main_menu.insertAction(
+                self.last_separator, self.perf_dock.toggleViewAction())
+
         self.ui.graphicsView.setFocus()
         
     def finish_init(self, main: 'Main'):
         self.patchbay_manager = main.patchbay_manager
         self.settings = main.settings
         self.ui.filterFrame.set_patchbay_manager(main.patchbay_manager)
+        self.meters_dock.set_patchbay_manager(
+            main.patchbay_manager, main.settings)
+        self.dsp_sparkline.set_history(main.patchbay_manager.dsp_history)
         main.patchbay_manager.sg.filters_bar_toggle_wanted.connect(
             self.toggle_filter_frame_visibility)
         main.patchbay_manager.sg.full_screen_toggle_wanted.connect(
@@ -121,10 +166,12 @@ class MainWindow(QMainWindow):
         self.ui.menubar.setVisible(bool(state))
     
     def _show_about_dialog(self):
+        from about_dialog import AboutDialog
         dialog = AboutDialog(self)
         dialog.exec()
     
     def _show_donations_dialog(self):
+        from donate_dialog import DonationsDialog
         dialog = DonationsDialog(self)
         dialog.exec()
     
@@ -160,12 +207,25 @@ class MainWindow(QMainWindow):
             self.ui.verticalLayout.setContentsMargins(0, 0, 0, 0)
             self.showFullScreen()
 
+    def show_jack_reconnect_status(self, attempts: int, error: str):
+        if not attempts:
+            self.statusBar().clearMessage()
+            self.statusBar().setVisible(False)
+            return
+
+        _translate = QApplication.translate
+        self.statusBar().setVisible(True)
+        self.statusBar().showMessage(
+            _translate('main_win', 'JACK reconnection attempt %i failed: %s')
+            % (attempts, error))
+
     def toggle_filter_frame_visibility(self):
         self.ui.filterFrame.setVisible(
             not self.ui.filterFrame.isVisible())
     
     def save_settings(self):
         self.settings.setValue('MainWindow/geometry', self.saveGeometry())
+        self.meters_dock.close_meters()
         self.settings.setValue(
             'tool_bar/elements',
             self.patchbay_tools._tools_displayed.to_save_string())
@@ -180,6 +240,30 @@ class MainWindow(QMainWindow):
         self.save_settings()
         super().closeEvent(event)
         
+    def set_transport_displayed(self, displayed: bool):
+        if displayed is not self.transport_displayed:
+            self.transport_displayed = displayed
+            self.transport_displayed_changed.emit(displayed)
+
+    def _check_displayed(self):
+        displayed = self.isVisible() and not self.isMinimized()
+        if displayed is not self._displayed:
+            self._displayed = displayed
+            self.displayed_changed.emit(displayed)
+
+    def showEvent(self, event: QShowEvent):
+        super().showEvent(event)
+        self._check_displayed()
+    
+    def hideEvent(self, event: QHideEvent):
+        super().hideEvent(event)
+        self._check_displayed()
+    
+    def changeEvent(self, event: QEvent):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange:
+            self._check_displayed()
+
     def resizeEvent(self, event: QResizeEvent):
         super().resizeEvent(event)
         self.patchbay_tools.main_win_resize(self)
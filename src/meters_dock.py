@@ -0,0 +1,247 @@
+import math
+from typing import TYPE_CHECKING, Optional
+
+from qtpy.QtCore import QSettings, Qt, QTimer, QRectF
+from qtpy.QtGui import QColor, QIcon, QPainter, QPaintEvent
+from qtpy.QtWidgets import (
+    QApplication, QComboBox, QDockWidget, QHBoxLayout, QLabel,
+    QPushButton, QScrollArea, QVBoxLayout, QWidget)
+
+from patshared import PortType
+
+from process_callback import PeakMeters
+
+if TYPE_CHECKING:
+    from patchance_pb_manager import PatchancePatchbayManager
+
+
+_translate = QApplication.translate
+
+METERS_CLIENT_NAME = 'Patchance meters'
+REFRESH_MS = 33
+RETRY_REFRESHES = 30
+'refreshes between two attempts to monitor a missing port'
+MIN_DB = -60.0
+PEAK_DECAY_DB = 1.5
+'decay of the displayed peak at each refresh, in dB'
+
+JACK_PORT_IS_OUTPUT = 0x2
+
+
+def _to_db(value: float) -> float:
+    if value <= 0.0:
+        return MIN_DB
+    return max(MIN_DB, 20.0 * math.log10(value))
+
+
+class LevelMeter(QWidget):
+    def __init__(self, parent: QWidget):
+        super().__init__(parent)
+        self.setMinimumSize(120, 10)
+        self.peak_db = MIN_DB
+        self.rms_db = MIN_DB
+
+    def set_values(self, peak: float, rms: float):
+        self.peak_db = max(_to_db(peak), self.peak_db - PEAK_DECAY_DB)
+        self.rms_db = _to_db(rms)
+        self.update()
+
+    def decay(self):
+        if self.peak_db <= MIN_DB:
+            return
+        self.peak_db = max(MIN_DB, self.peak_db - PEAK_DECAY_DB)
+        self.rms_db = max(MIN_DB, self.rms_db - PEAK_DECAY_DB)
+        self.update()
+
+    def paintEvent(self, event: QPaintEvent):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        painter.fillRect(0, 0, width, height, QColor(30, 30, 30))
+
+        peak_ratio = (self.peak_db - MIN_DB) / -MIN_DB
+        rms_ratio = (self.rms_db - MIN_DB) / -MIN_DB
+
+        if self.peak_db >= -0.1:
+            color = QColor(220, 40, 40)
+        elif self.peak_db >= -6.0:
+            color = QColor(220, 180, 40)
+        else:
+            color = QColor(60, 180, 60)
+
+        painter.fillRect(
+            QRectF(0, 0, width * peak_ratio, height), color.darker(150))
+        painter.fillRect(QRectF(0, 0, width * rms_ratio, height), color)
+
+
+class MeterRow(QWidget):
+    def __init__(self, port_name: str, dock: 'MetersDock'):
+        super().__init__(dock)
+        self.port_name = port_name
+        self.meter = LevelMeter(self)
+
+        label = QLabel(port_name, self)
+        label.setMinimumWidth(160)
+        remove_button = QPushButton(self)
+        remove_button.setIcon(QIcon.fromTheme('list-remove'))
+        remove_button.setFlat(True)
+        remove_button.clicked.connect(
+            lambda: dock.remove_port(self.port_name))
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(2, 0, 2, 0)
+        layout.addWidget(label)
+        layout.addWidget(self.meter, 1)
+        layout.addWidget(remove_button)
+
+
+class MetersDock(QDockWidget):
+    '''Peak/RMS meters of the JACK audio output ports
+    chosen by the user, computed in C by process_cb.so.'''
+
+    def __init__(self, parent: QWidget):
+        super().__init__(
+            _translate('meters', 'Meters'), parent)
+        self.setObjectName('MetersDock')
+        self.mng: Optional['PatchancePatchbayManager'] = None
+        self._settings: Optional[QSettings] = None
+        self.meters = PeakMeters()
+        self._rows = dict[str, MeterRow]()
+        self._n_refreshes = 0
+
+        widget = QWidget(self)
+        layout = QVBoxLayout(widget)
+
+        add_layout = QHBoxLayout()
+        self._port_combo = QComboBox(widget)
+        self._port_combo.setEditable(True)
+        self._port_combo.setSizeAdjustPolicy(
+            QComboBox.SizeAdjustPolicy.AdjustToMinimumContentsLengthWithIcon)
+        self._add_button = QPushButton(
+            QIcon.fromTheme('list-add'), _translate('meters', 'Monitor'),
+            widget)
+        self._add_button.clicked.connect(self._add_current_port)
+        add_layout.addWidget(self._port_combo, 1)
+        add_layout.addWidget(self._add_button)
+        layout.addLayout(add_layout)
+
+        self._rows_widget = QWidget()
+        self._rows_layout = QVBoxLayout(self._rows_widget)
+        self._rows_layout.setContentsMargins(0, 0, 0, 0)
+        self._rows_layout.addStretch()
+        scroll_area = QScrollArea(widget)
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(self._rows_widget)
+        layout.addWidget(scroll_area, 1)
+
+        if not self.meters.available:
+            self._port_combo.setEnabled(False)
+            self._add_button.setEnabled(False)
+            layout.insertWidget(0, QLabel(
+                _translate(
+                    'meters',
+                    'Meters are not built, run "make meters".'), widget))
+
+        self.setWidget(widget)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_MS)
+        self._timer.timeout.connect(self._refresh)
+        self.visibilityChanged.connect(self._visibility_changed)
+
+    def set_patchbay_manager(self, mng: 'PatchancePatchbayManager',
+                             settings: Optional[QSettings]):
+        self.mng = mng
+        self._settings = settings
+        if settings is None:
+            return
+
+        port_names = settings.value('Meters/ports', [], type=list)
+        for port_name in port_names:
+            self._add_row(str(port_name))
+
+    def _audio_out_ports(self) -> list[str]:
+        if self.mng is None:
+            return []
+
+        return [port.full_name for group in self.mng.groups
+                for port in group.ports
+                if port.type is PortType.AUDIO_JACK
+                and port.flags & JACK_PORT_IS_OUTPUT]
+
+    def _fill_port_combo(self):
+        current = self._port_combo.currentText()
+        self._port_combo.clear()
+        self._port_combo.addItems(
+            [p for p in self._audio_out_ports() if p not in self._rows])
+        self._port_combo.setEditText(current)
+
+    def _add_row(self, port_name: str):
+        if port_name in self._rows:
+            return
+
+        row = MeterRow(port_name, self)
+        self._rows[port_name] = row
+        self._rows_layout.insertWidget(self._rows_layout.count() - 1, row)
+        if self._timer.isActive():
+            self.meters.add_port(port_name)
+
+    def _add_current_port(self):
+        port_name = self._port_combo.currentText()
+        if not port_name:
+            return
+
+        self._add_row(port_name)
+        self._fill_port_combo()
+        self._save_ports()
+
+    def remove_port(self, port_name: str):
+        row = self._rows.pop(port_name, None)
+        if row is None:
+            return
+
+        self.meters.remove_port(port_name)
+        row.deleteLater()
+        self._fill_port_combo()
+        self._save_ports()
+
+    def _save_ports(self):
+        if self._settings is not None:
+            self._settings.setValue('Meters/ports', list(self._rows))
+
+    def _visibility_changed(self, visible: bool):
+        if visible:
+            self._fill_port_combo()
+            if self.meters.start(METERS_CLIENT_NAME):
+                for port_name in self._rows:
+                    self.meters.add_port(port_name)
+                self._timer.start()
+        else:
+            # no JACK meter client while the meters are not visible
+            self._timer.stop()
+            self.meters.stop()
+
+    def _refresh(self):
+        self._n_refreshes += 1
+        retry = self._n_refreshes % RETRY_REFRESHES == 0
+
+        if retry and self.mng is not None:
+            for port_name in self._rows:
+                if port_name in self.meters.slots:
+                    continue
+
+                # the port may appear later, the meters client
+                # registers a JACK port only when the port exists.
+                if self.mng.get_port_from_name(port_name) is not None:
+                    self.meters.add_port(port_name)
+
+        all_values = self.meters.read_all()
+        for port_name, row in self._rows.items():
+            values = all_values.get(port_name)
+            if values is None:
+                row.meter.decay()
+            else:
+                row.meter.set_values(*values)
+
+    def close_meters(self):
+        self._timer.stop()
+        self.meters.stop()
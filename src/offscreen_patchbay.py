@@ -0,0 +1,99 @@
+'''Build the patchance main window and patchbay manager without
+showing anything, for the replay and benchmark tools (without JACK)
+and for the canvas render.
+
+`prepare()` must be called before any Qt import.'''
+
+import os
+import shutil
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+
+if TYPE_CHECKING:
+    from qtpy.QtCore import QSettings
+    from qtpy.QtWidgets import QApplication
+    from main_win import MainWindow
+    from patchance_pb_manager import PatchancePatchbayManager
+    from patch_engine import PatchEngine
+    from fake_engine import FakePatchEngine
+
+
+APP_TITLE = 'Patchance'
+CONFIG_FILES = ('Patchance.conf', 'canvas.json', 'canvas.sqlite')
+
+
+def prepare():
+    '''choose the offscreen platform, the Qt API,
+    and add HoustonPatchbay as lib'''
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(
+        1, str(Path(__file__).parents[1] / 'HoustonPatchbay/source'))
+
+    from qt_api import QT_API
+    os.environ['QT_API'] = QT_API
+
+
+@dataclass
+class OffscreenMain:
+    app: 'QApplication'
+    main_win: 'MainWindow'
+    patchbay_manager: 'PatchancePatchbayManager'
+    settings: 'QSettings'
+    config_dir: Path
+
+    def close(self):
+        self.patchbay_manager.engine_worker.stop()
+        self.main_win.close()
+        self.app.processEvents()
+
+
+def copy_config_dir(src_dir: Optional[Path]) -> Path:
+    '''return a new temporary config dir, with the layout files
+    of src_dir, so that user files are never modified.'''
+    config_dir = Path(tempfile.mkdtemp(prefix='patchance-offscreen-'))
+    if src_dir is not None:
+        for file_name in CONFIG_FILES:
+            if (src_dir / file_name).is_file():
+                shutil.copy2(src_dir / file_name, config_dir / file_name)
+    return config_dir
+
+
+def build(engine: Union['FakePatchEngine', 'PatchEngine'], config_dir: Path,
+          show=True) -> OffscreenMain:
+    from qtpy.QtCore import QSettings
+    from qtpy.QtWidgets import QApplication
+
+    import resources_rc
+    from main_win import MainWindow
+    from patchance_pb_manager import PatchancePatchbayManager
+
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication([sys.argv[0]])
+        app.setApplicationName(APP_TITLE)
+        app.setOrganizationName(APP_TITLE)
+
+    settings = QSettings(
+        str(config_dir / f'{APP_TITLE}.conf'), QSettings.Format.IniFormat)
+
+    from fake_engine import FakePatchEngine
+
+    main_win = MainWindow()
+    pb_manager = PatchancePatchbayManager(engine, settings)
+    engine.custom_names = pb_manager.custom_names
+    if isinstance(engine, FakePatchEngine):
+        # no JACK client at all
+        pb_manager.engine_worker.client_factory = lambda: engine
+
+    main = OffscreenMain(app, main_win, pb_manager, settings, config_dir)
+    pb_manager.finish_init(main)
+    main_win.finish_init(main)
+    pb_manager.engine_worker.start()
+
+    if show:
+        main_win.show()
+    app.processEvents()
+    return main
@@ -1,20 +1,23 @@
-import json
 from pathlib import Path
 import sys
 
 from patch_engine import PatchEngine, PatchEngineOuter
 
+from auto_connect import AutoConnector, load_rules
+from layout_store import read_memory, write_custom_names
+from patch_snapshots import (
+    PatchSnapshot, load_snapshot, restore_custom_names, save_snapshot,
+    snapshot_diff)
+
 
 def make_one_shot_act(arg: str, config_dir: Path):
-    canvas_path = config_dir / 'canvas.json'
-    if canvas_path.is_file():
-        try:
-            with open(canvas_path) as f:
-                json_patch = json.load(f)
-        except:
-            sys.exit(1)
-    else:
-        sys.exit(0)    
+    try:
+        json_patch = read_memory(config_dir)
+    except:
+        sys.exit(1)
+
+    if json_patch is None:
+        sys.exit(0)
     
     patch_engine = PatchEngine('PatchanceExport')
     patch_engine.custom_names.eat_json(json_patch['custom_names'])
@@ -33,15 +36,84 @@ def make_one_shot_act(arg: str, config_dir: Path):
             for port_name, pretty_name in ports_dict.items():
                 custom_names.save_port(port_name, pretty_name)
 
-            json_patch['custom_names'] = custom_names.to_json()
-            try:
-                with open(canvas_path, 'w') as f:
-                    json.dump(json_patch, f)
-            except:
-                sys.stderr.write(f'Failed to save {canvas_path} file')
+            write_custom_names(config_dir, custom_names.to_json())
         
         case '--clear-pretty-names':
             patch_engine.clear_all_pretty_names_from_jack()
     
     patch_engine.exit()
-    sys.exit(0)
\ No newline at end of file
+    sys.exit(0)
+
+def make_snapshot_act(arg: str, snapshot_name: str, config_dir: Path):
+    patch_engine = PatchEngine('PatchanceSnapshot')
+    patch_engine.start(PatchEngineOuter())
+    if not patch_engine.jack_running:
+        sys.stderr.write('JACK is not running\n')
+        patch_engine.exit()
+        sys.exit(1)
+
+    match arg:
+        case '--save-snapshot':
+            try:
+                json_patch = read_memory(config_dir)
+            except:
+                json_patch = None
+            custom_names = None
+            if json_patch is not None:
+                custom_names = json_patch.get('custom_names')
+
+            try:
+                save_snapshot(config_dir, PatchSnapshot(
+                    snapshot_name,
+                    [tuple(c) for c in patch_engine.connections],
+                    custom_names))
+            except Exception as e:
+                sys.stderr.write(f'Failed to save snapshot: {str(e)}\n')
+                patch_engine.exit()
+                sys.exit(1)
+
+        case '--restore-snapshot':
+            try:
+                snapshot = load_snapshot(config_dir, snapshot_name)
+            except Exception as e:
+                sys.stderr.write(f'Failed to load snapshot: {str(e)}\n')
+                patch_engine.exit()
+                sys.exit(1)
+
+            to_disconnect, to_connect = snapshot_diff(
+                patch_engine.connections, snapshot.connections,
+                {p.name for p in patch_engine.ports})
+            for connection in to_disconnect:
+                patch_engine.connect_ports(*connection, disconnect=True)
+            for connection in to_connect:
+                patch_engine.connect_ports(*connection)
+            restore_custom_names(config_dir, snapshot)
+
+    patch_engine.exit()
+    sys.exit(0)
+
+def make_auto_connect_act(config_dir: Path):
+    rules = load_rules(config_dir)
+    if not rules:
+        sys.stderr.write('No auto-connect rule\n')
+        sys.exit(0)
+
+    patch_engine = PatchEngine('PatchanceAutoConnect')
+    patch_engine.start(PatchEngineOuter())
+    if not patch_engine.jack_running:
+        sys.stderr.write('JACK is not running\n')
+        patch_engine.exit()
+        sys.exit(1)
+
+    def connect_many(pairs: list[tuple[str, str]]):
+        for connection in pairs:
+            patch_engine.connect_ports(*connection)
+
+    auto_connector = AutoConnector(rules, connect_many)
+    auto_connector.connections = lambda: patch_engine.connections
+    for port in patch_engine.ports:
+        auto_connector.port_added(port.name, port.type, port.flags)
+    auto_connector.resolve_all()
+
+    patch_engine.exit()
+    sys.exit(0)
@@ -0,0 +1,141 @@
+'''Named snapshots of the connections and custom names.
+
+A snapshot is restored with the minimal set of disconnections and
+connections against the current graph, so ports already correctly
+connected are never disconnected.'''
+
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Optional
+from urllib.parse import quote
+
+from canvas_memory import MemoryFileWriter
+
+
+_logger = logging.getLogger(__name__)
+
+SNAPSHOTS_DIR = 'snapshots'
+
+
+@dataclass
+class PatchSnapshot:
+    name: str
+    connections: list[tuple[str, str]] = field(default_factory=list)
+    custom_names: Optional[dict[str, Any]] = None
+    date: float = 0.0
+
+    def to_json(self) -> dict[str, Any]:
+        return {'name': self.name,
+                'date': self.date,
+                'connections': [list(c) for c in self.connections],
+                'custom_names': self.custom_names}
+
+    @staticmethod
+    def from_json(json_dict: dict[str, Any]) -> 'PatchSnapshot':
+        return PatchSnapshot(
+            str(json_dict.get('name', '')),
+            [(str(c[0]), str(c[1]))
+             for c in json_dict.get('connections', []) if len(c) == 2],
+            json_dict.get('custom_names'),
+            float(json_dict.get('date', 0.0)))
+
+
+def _snapshot_path(config_dir: Path, name: str) -> Path:
+    '''the file of the snapshot, named with the snapshot name where
+    characters other than ASCII letters, digits, '_', '-', '.', '~'
+    and spaces are %-encoded, so two names never share a file.'''
+    if not name:
+        raise ValueError('a snapshot name can not be empty')
+    return config_dir / SNAPSHOTS_DIR / f"{quote(name, safe=' ')}.json"
+
+
+def _find_snapshot_file(config_dir: Path, name: str) -> Optional[Path]:
+    '''the file containing the snapshot `name`, whatever its file name
+    (older versions replaced the unsafe characters with '_').'''
+    for path in sorted((config_dir / SNAPSHOTS_DIR).glob('*.json')):
+        try:
+            with open(path, 'r') as f:
+                if json.load(f).get('name') == name:
+                    return path
+        except Exception:
+            continue
+    return None
+
+
+def save_snapshot(config_dir: Path, snapshot: PatchSnapshot):
+    from patshared import from_json_to_str
+
+    if not snapshot.date:
+        snapshot.date = time.time()
+    path = _snapshot_path(config_dir, snapshot.name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    MemoryFileWriter(path).write(from_json_to_str(snapshot.to_json()))
+
+
+def load_snapshot(config_dir: Path, name: str) -> PatchSnapshot:
+    '''name can also be the path of a snapshot file'''
+    path = _snapshot_path(config_dir, name)
+    if not path.is_file():
+        if Path(name).is_file():
+            path = Path(name)
+        else:
+            path = _find_snapshot_file(config_dir, name) or path
+
+    with open(path, 'r') as f:
+        json_dict = json.load(f)
+    if not isinstance(json_dict, dict):
+        raise TypeError(f'{path} is not a snapshot file')
+    return PatchSnapshot.from_json(json_dict)
+
+
+def restore_custom_names(config_dir: Path, snapshot: PatchSnapshot) -> bool:
+    '''write the snapshot custom names in the canvas memory,
+    as the GUI does when it restores the snapshot.
+    Return True if the custom names have changed.'''
+    if snapshot.custom_names is None:
+        return False
+
+    from patshared import CustomNames
+    from layout_store import read_custom_names, write_custom_names
+
+    custom_names = CustomNames()
+    custom_names.eat_json(read_custom_names(config_dir))
+    if custom_names.to_json() == snapshot.custom_names:
+        return False
+
+    custom_names.eat_json(snapshot.custom_names)
+    write_custom_names(config_dir, custom_names.to_json())
+    return True
+
+
+def list_snapshots(config_dir: Path) -> list[str]:
+    snapshots_dir = config_dir / SNAPSHOTS_DIR
+    if not snapshots_dir.is_dir():
+        return []
+
+    names = list[str]()
+    for path in sorted(snapshots_dir.glob('*.json')):
+        try:
+            with open(path, 'r') as f:
+                names.append(str(json.load(f)['name']))
+        except Exception:
+            _logger.warning(f'{path} is not a valid snapshot file')
+    return names
+
+
+def snapshot_diff(
+        current: Iterable[tuple[str, str]],
+        wanted: Iterable[tuple[str, str]],
+        existing_ports: set[str]) \
+            -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    '''return (to_disconnect, to_connect), the minimal changes
+    to go from `current` to `wanted` connections.
+    Wanted connections with a port not in `existing_ports` are ignored.'''
+    current_set = set(current)
+    wanted_set = {c for c in wanted
+                  if c[0] in existing_ports and c[1] in existing_ports}
+    return (sorted(current_set - wanted_set),
+            sorted(wanted_set - current_set))
@@ -9,6 +9,9 @@ from pathlib import Path
 from typing import Optional
 import logging
 
+from startup_profiler import profiler
+from perf_monitor import perf
+
 # manage arguments now
 # Yes, that is not conventional to do this kind of code during imports
 # but it allows faster answer for --version and --help argument.
@@ -18,6 +21,14 @@ class ReadArg(Enum):
     CONFIG_DIR = auto()
     DBG = auto()
     INFO = auto()
+    EXPORT_MEMORY = auto()
+    IMPORT_MEMORY = auto()
+    SOCKET = auto()
+    SNAPSHOT = auto()
+    RECORD_EVENTS = auto()
+    EXPORT_DSP_HISTORY = auto()
+    RENDER = auto()
+    VIEW = auto()
 
 
 read_arg = ReadArg.NONE
@@ -25,6 +36,17 @@ config_dir: Optional[Path] = None
 debug_str = ''
 info_str = ''
 one_shot_act = ''
+memory_act: Optional[tuple[ReadArg, Path]] = None
+headless = False
+snapshot_act = ''
+snapshot_name = ''
+auto_connect_act = False
+socket_path: Optional[Path] = None
+record_events_path: Optional[Path] = None
+dsp_history_out = ''
+cli_args: Optional[list[str]] = None
+render_path: Optional[Path] = None
+render_view: Optional[int] = None
 
 for arg in sys.argv[1:]:
     match arg:
@@ -36,6 +58,48 @@ for arg in sys.argv[1:]:
                 |'--clear-pretty-names':
             one_shot_act = arg
         
+        case '--export-memory':
+            read_arg = ReadArg.EXPORT_MEMORY
+
+        case '--import-memory':
+            read_arg = ReadArg.IMPORT_MEMORY
+
+        case '--save-snapshot'|'--restore-snapshot':
+            snapshot_act = arg
+            read_arg = ReadArg.SNAPSHOT
+
+        case '--auto-connect':
+            auto_connect_act = True
+
+        case '--cli':
+            # all the following arguments are for the CLI commands
+            cli_args = sys.argv[sys.argv.index(arg) + 1:]
+            break
+
+        case '--headless':
+            headless = True
+
+        case '--socket':
+            read_arg = ReadArg.SOCKET
+
+        case '--export-dsp-history':
+            read_arg = ReadArg.EXPORT_DSP_HISTORY
+
+        case '--record-events':
+            read_arg = ReadArg.RECORD_EVENTS
+
+        case '--render':
+            read_arg = ReadArg.RENDER
+
+        case '--view':
+            read_arg = ReadArg.VIEW
+
+        case '--profile-startup':
+            profiler.enable()
+
+        case '--perf':
+            perf.enable()
+
         case '-dbg'|'--dbg':
             read_arg = ReadArg.DBG
             
@@ -68,6 +132,30 @@ for arg in sys.argv[1:]:
                     
                 case ReadArg.INFO:
                     info_str = arg
+
+                case ReadArg.EXPORT_MEMORY|ReadArg.IMPORT_MEMORY:
+                    memory_act = (read_arg, Path(arg).expanduser())
+
+                case ReadArg.SOCKET:
+                    socket_path = Path(arg).expanduser()
+
+                case ReadArg.SNAPSHOT:
+                    snapshot_name = arg
+
+                case ReadArg.RECORD_EVENTS:
+                    record_events_path = Path(arg).expanduser()
+
+                case ReadArg.EXPORT_DSP_HISTORY:
+                    dsp_history_out = arg
+
+                case ReadArg.RENDER:
+                    render_path = Path(arg).expanduser()
+
+                case ReadArg.VIEW:
+                    if not arg.isdigit():
+                        sys.stderr.write(f'Invalid view number {arg}\n')
+                        sys.exit(1)
+                    render_view = int(arg)
                 
                 case _:
                     sys.stderr.write(f'Unknown argument {arg}\n')
@@ -77,6 +165,10 @@ for arg in sys.argv[1:]:
             
             read_arg = ReadArg.NONE
 
+if render_view is not None and render_path is None:
+    sys.stderr.write('--view can only be used with --render\n')
+    sys.exit(1)
+
 
 import logging
 import os
@@ -102,6 +194,42 @@ if debug_str:
         _mod_logger = logging.getLogger(module_name)
         _mod_logger.setLevel(logging.DEBUG)
 
+from qt_api import QT_API
+
+# Needed for qtpy to know if it should use PyQt5 or PyQt6,
+# set before the one shot acts, in case one of them uses Qt.
+os.environ['QT_API'] = QT_API
+
+if memory_act is not None:
+    if config_dir is None:
+        import xdg
+        config_dir = xdg.xdg_config_home() / APP_TITLE
+
+    import layout_store
+    memory_read_arg, memory_path = memory_act
+    try:
+        if memory_read_arg is ReadArg.EXPORT_MEMORY:
+            layout_store.export_json_file(config_dir, memory_path)
+        else:
+            layout_store.import_json_file(config_dir, memory_path)
+    except Exception as e:
+        sys.stderr.write(f'{str(e)}\n')
+        sys.exit(1)
+    sys.exit(0)
+
+if dsp_history_out:
+    if config_dir is None:
+        import xdg
+        config_dir = xdg.xdg_config_home() / APP_TITLE
+
+    import dsp_history
+    try:
+        dsp_history.export_csv(config_dir, dsp_history_out)
+    except Exception as e:
+        sys.stderr.write(f'{str(e)}\n')
+        sys.exit(1)
+    sys.exit(0)
+
 if one_shot_act:
     if config_dir is None:
         import xdg
@@ -111,10 +239,55 @@ if one_shot_act:
     one_shot_pretty_act.make_one_shot_act(one_shot_act, config_dir)
     sys.exit(0)
 
-from qt_api import QT_API
+if snapshot_act:
+    if not snapshot_name:
+        sys.stderr.write(f'{snapshot_act} needs a snapshot name\n')
+        sys.exit(1)
 
-# Needed for qtpy to know if it should use PyQt5 or PyQt6
-os.environ['QT_API'] = QT_API
+    if config_dir is None:
+        import xdg
+        config_dir = xdg.xdg_config_home() / APP_TITLE
+
+    import one_shot_pretty_act
+    one_shot_pretty_act.make_snapshot_act(
+        snapshot_act, snapshot_name, config_dir)
+    sys.exit(0)
+
+if cli_args is not None:
+    if config_dir is None:
+        import xdg
+        config_dir = xdg.xdg_config_home() / APP_TITLE
+
+    import jack_cli
+    sys.exit(jack_cli.run(cli_args, config_dir))
+
+if render_path is not None:
+    if config_dir is None:
+        import xdg
+        config_dir = xdg.xdg_config_home() / APP_TITLE
+
+    import canvas_render
+    sys.exit(canvas_render.render(render_path, config_dir, render_view))
+
+if auto_connect_act:
+    if config_dir is None:
+        import xdg
+        config_dir = xdg.xdg_config_home() / APP_TITLE
+
+    import one_shot_pretty_act
+    one_shot_pretty_act.make_auto_connect_act(config_dir)
+    sys.exit(0)
+
+if headless:
+    # headless mode does not need any Qt widget
+    if config_dir is None:
+        import xdg
+        config_dir = xdg.xdg_config_home() / APP_TITLE
+        config_dir.mkdir(parents=True, exist_ok=True)
+
+    import headless as headless_mod
+    headless_mod.run(APP_TITLE, config_dir, socket_path)
+    sys.exit(0)
 
 from qtpy.QtWidgets import QApplication
 from qtpy.QtGui import QIcon, QFontDatabase
@@ -124,10 +297,14 @@ from patshared import Naming, custom_names
 from patch_engine import PatchEngine, ALSA_LIB_OK
 
 from engine_loop import PatchTimeoutObj
+from engine_wakeup import EngineWakeup
 from main_win import MainWindow
 from patchance_pb_manager import PatchancePatchbayManager
 from ptc_patch_engine_outer import PtcPatchEngineOuter
+from event_coalescer import PatchEventCoalescer
+from patchbay.bases.elements import CanvasOptimizeIt
 
+profiler.mark('imports')
 
 @dataclass
 class Main:
@@ -149,6 +326,7 @@ def main_loop():
     global main
     
     import resources_rc
+    profiler.mark('resources')
     
     app = QApplication(sys.argv)
     app.setApplicationName(APP_TITLE)
@@ -157,6 +335,7 @@ def main_loop():
     app.setWindowIcon(QIcon(
         f':/main_icon/scalable/{APP_TITLE.lower()}.svg'))
     app.setDesktopFileName(APP_TITLE.lower())
+    profiler.mark('QApplication')
     
     ### Translation process
     app_translator = QTranslator()
@@ -173,9 +352,11 @@ def main_loop():
     path_sys_translations = QLibraryInfo.location(QLibraryInfo.TranslationsPath)
     if sys_translator.load(QLocale(), 'qt', '_', path_sys_translations):
         app.installTranslator(sys_translator)
+    profiler.mark('translators')
 
     QFontDatabase.addApplicationFont(":/fonts/Ubuntu-R.ttf")
     QFontDatabase.addApplicationFont(":/fonts/Ubuntu-C.ttf")
+    profiler.mark('fonts')
 
     #connect signals
     signal.signal(signal.SIGINT, signal_handler)
@@ -194,6 +375,7 @@ def main_loop():
         settings = QSettings()
 
     main_win = MainWindow()
+    profiler.mark('main window')
     
     export_naming = Naming.from_config_str(
         settings.value(
@@ -203,6 +385,18 @@ def main_loop():
         Naming.CUSTOM in export_naming)
     pb_manager = PatchancePatchbayManager(engine, settings)
     pb_manager.jack_export_naming = export_naming
+    perf.instrument_methods(
+        pb_manager,
+        ('apply_delayed_changes_now', 'save_positions', '_load_memory_file'),
+        'manager.')
+    perf.instrument_context_manager(CanvasOptimizeIt, 'CanvasOptimizeIt')
+    # before any instance connects its bound methods to signals
+    perf.instrument_class(
+        PtcPatchEngineOuter,
+        [name for name, value in vars(PtcPatchEngineOuter).items()
+         if callable(value) and not name.startswith('_')],
+        'outer.')
+    perf.instrument_class(PatchEventCoalescer, ('flush',), 'coalescer.')
     engine.custom_names = pb_manager.custom_names
 
     main = Main(app,
@@ -210,27 +404,66 @@ def main_loop():
                 pb_manager,
                 settings)
 
+    pb_manager.alsa_midi_available = ALSA_LIB_OK
     pb_manager.finish_init(main)
-    if not ALSA_LIB_OK:
-        pb_manager.options_dialog.enable_alsa_midi(False)
     
     timeout_obj = PatchTimeoutObj(engine)
-    patch_timer = QTimer()
-    patch_timer.timeout.connect(timeout_obj.check_patch)
+    timeout_obj.set_dsp_history(pb_manager.dsp_history)
+    main_win.displayed_changed.connect(timeout_obj.set_displayed)
+    timeout_obj.jack_reconnect_status.connect(
+        main_win.show_jack_reconnect_status)
+    
+    engine_wakeup = EngineWakeup(engine)
+    if (settings.value('Engine/event_wakeups', True, type=bool)
+            and engine_wakeup.install()):
+        timeout_obj.set_event_driven(True)
+        engine_wakeup.events_queued.connect(timeout_obj.process_events)
     
     main_win.finish_init(main)
+    profiler.mark('main window init')
+    profiler.watch_first_paint(main_win)
+    profiler.report_when_marked('first paint', 'engine start')
     main_win.show()
-
-    engine.start(PtcPatchEngineOuter(pb_manager))
-    engine.apply_pretty_names_export()
-    patch_timer.start(50)
+    profiler.mark('show')
+
+    recorder = None
+    if record_events_path is not None:
+        from engine_recorder import EventRecorder, RecordingPatchEngineOuter
+        recorder = EventRecorder(record_events_path)
+
+    def start_engine():
+        if recorder is not None:
+            outer = RecordingPatchEngineOuter(
+                pb_manager, timeout_obj, recorder)
+        else:
+            outer = PtcPatchEngineOuter(pb_manager, timeout_obj)
+
+        tracker = outer.transport_tracker
+        tracker.set_window_displayed(main_win.isVisible())
+        tracker.set_widgets_displayed(main_win.transport_displayed)
+        main_win.displayed_changed.connect(tracker.set_window_displayed)
+        main_win.transport_displayed_changed.connect(
+            tracker.set_widgets_displayed)
+        engine.start(outer)
+        pb_manager.engine_worker.start()
+        engine.apply_pretty_names_export()
+        timeout_obj.start()
+        profiler.mark('engine start')
+
+    # let the window appear before to scan the JACK graph
+    QTimer.singleShot(0, start_engine)
 
     app.exec()
     settings.sync()
     pb_manager.save_positions()
     
-    patch_timer.stop()
+    timeout_obj.stop()
+    pb_manager.engine_worker.stop()
+    engine_wakeup.close()
     engine.exit()
+    if recorder is not None:
+        recorder.close()
+    perf.report()
     del app
 
 
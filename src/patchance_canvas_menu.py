@@ -0,0 +1,64 @@
+from typing import TYPE_CHECKING
+
+from qtpy.QtWidgets import QApplication, QInputDialog, QLineEdit, QMenu
+from qtpy.QtGui import QIcon
+
+from patchbay import CanvasMenu
+
+from patch_snapshots import list_snapshots
+
+if TYPE_CHECKING:
+    from patchance_pb_manager import PatchancePatchbayManager
+
+
+_translate = QApplication.translate
+
+
+class PatchanceCanvasMenu(CanvasMenu):
+    def __init__(self, patchbay_manager: 'PatchancePatchbayManager'):
+        super().__init__(patchbay_manager)
+        self._ptc_mng = patchbay_manager
+
+        self.snapshots_menu = QMenu(
+            _translate('canvas_menu', 'Snapshots'), self)
+        self.snapshots_menu.setIcon(QIcon.fromTheme('document-save'))
+        self.snapshots_menu.aboutToShow.connect(self._fill_snapshots_menu)
+        self.addSeparator()
+        self.addMenu(self.snapshots_menu)
+
+        self.reload_rules_act = self.addAction(
+            QIcon.fromTheme('view-refresh'),
+            _translate('canvas_menu', 'Reload auto-connect rules'))
+        self.reload_rules_act.triggered.connect(
+            self._ptc_mng.reload_auto_connect_rules)
+
+    def _fill_snapshots_menu(self):
+        self.snapshots_menu.clear()
+
+        save_act = self.snapshots_menu.addAction(
+            QIcon.fromTheme('document-save-as'),
+            _translate('canvas_menu', 'Save snapshot...'))
+        save_act.triggered.connect(self._save_snapshot)
+
+        config_dir = self._ptc_mng.config_dir
+        names = list_snapshots(config_dir) if config_dir is not None else []
+        if not names:
+            return
+
+        self.snapshots_menu.addSeparator()
+        for name in names:
+            act = self.snapshots_menu.addAction(
+                QIcon.fromTheme('document-revert'),
+                _translate('canvas_menu', 'Restore "%s"') % name)
+            act.triggered.connect(
+                lambda checked=False, name=name:
+                    self._ptc_mng.restore_snapshot(name))
+
+    def _save_snapshot(self):
+        name, ok = QInputDialog.getText(
+            self._ptc_mng.main_win,
+            _translate('canvas_menu', 'Save snapshot'),
+            _translate('canvas_menu', 'Snapshot name:'),
+            QLineEdit.EchoMode.Normal)
+        if ok and name:
+            self._ptc_mng.save_snapshot(name)
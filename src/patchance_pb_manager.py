@@ -2,15 +2,14 @@
 import json
 import logging
 from pathlib import Path
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Iterable, Optional, Union
 
-from qtpy.QtCore import QSettings
+from qtpy.QtCore import QSettings, QTimer
 from qtpy.QtWidgets import QApplication
 from patch_engine.patch_engine import PatchEngine
 from patchbay.bases.elements import CanvasOptimizeIt
 
 from patchbay import (
-    CanvasMenu,
     Callbacker,
     CanvasOptionsDialog,
     PatchbayManager)
@@ -18,14 +17,53 @@ from patshared import (
     PortType, PortTypesViewFlag, from_json_to_str, Naming)
 
 import xdg
+from startup_profiler import profiler
+from canvas_memory import MemoryFileWriter, memory_file_candidates
+from layout_store import LayoutStore, memory_backend, open_store
+from patch_snapshots import (
+    PatchSnapshot, load_snapshot, save_snapshot, snapshot_diff)
+from patchance_canvas_menu import PatchanceCanvasMenu
+from connection_batch import ConnectionBatch
+from connection_index import ConnectionIndex, ConnectionList
+from dsp_history import HISTORY_FILE as DSP_HISTORY_FILE, DspHistory
+from auto_connect import AutoConnectRule, AutoConnector, load_rules
+from engine_worker import EngineAct, EngineRequest, EngineWorker
+from jack_reconnect import RECONNECT_INTERVAL, ReconnectBackoff
+from pretty_export import PrettyNameExporter
+from search_index import PatchbaySearchIndex
 
 if TYPE_CHECKING:
+    from patchbay.bases.connection import Connection
+    from patchbay.bases.group import Group
+    from patchbay.bases.port import Port
     from main_win import MainWindow
     from patchance import Main
 
 _logger = logging.getLogger(__name__)
 
 MEMORY_FILE = 'canvas.json'
+AUTOSAVE_DELAY = 3000
+'ms without layout change before the canvas memory is saved'
+DSP_HISTORY_SAVE_INTERVAL = 60000
+'ms between two saves of the DSP load history'
+
+RESTART_GRACE_ATTEMPTS = 4
+'''when JACK stops, the canvas is kept (disabled) during this number
+of reconnection attempts, waiting for the server restart
+to reconcile it'''
+RESTART_GRACE_MS = (
+    RECONNECT_INTERVAL
+    + round(1000 * ReconnectBackoff().max_elapsed(RESTART_GRACE_ATTEMPTS))
+    + 500)
+'''time the canvas is kept when JACK stops, the reconnection attempts
+at their longest delays, plus 500ms for the last attempt itself'''
+
+BATCH_MAX_DURATION = 1000
+'''max time (in ms) the canvas waits for all the connections
+of a batch before to be redrawn'''
+BATCH_END_DURATION = 200
+'''max time (in ms) the canvas waits for the remaining connections
+of a batch once the engine worker has sent it'''
 
 
 class PatchanceCallbacker(Callbacker):
@@ -34,52 +72,128 @@ class PatchanceCallbacker(Callbacker):
 
         if TYPE_CHECKING:
             self.mng = manager
+
+        self._pending_connects = list[tuple[int, int, int, int]]()
+        self._pending_disconnects = list[int]()
+        self._flush_scheduled = False
     
-    def group_rename(
-            self, group_id: int, custom_name: str, save_in_jack: bool):
-        if not save_in_jack:
+    def _schedule_flush(self):
+        '''single connections requested during the same Qt event
+        (a portgroup connection for example) are sent as one batch.'''
+        if self._flush_scheduled:
             return
+        self._flush_scheduled = True
+        QTimer.singleShot(0, self._flush_pending)
 
+    def _flush_pending(self):
+        self._flush_scheduled = False
+        connects = self._pending_connects
+        disconnects = self._pending_disconnects
+        self._pending_connects = []
+        self._pending_disconnects = []
+
+        if connects:
+            self.ports_connect_many(connects)
+        if disconnects:
+            self.ports_disconnect_many(disconnects)
+
+    def group_rename(
+            self, group_id: int, custom_name: str, save_in_jack: bool):
         group = self.mng.get_group_from_id(group_id)
         if group is None:
             return
 
-        
+        self.mng.search_index.custom_name_changed(group.name)
+        self.mng.layout_changed()
+        if not save_in_jack:
+            return
+
         if not group.uuid:
             return
-        
-        self.mng.pe.write_group_pretty_name(group.name, custom_name)
+
+        self.mng.pretty_exporter.queue_group(
+            group.name, group.uuid, custom_name)
 
     def port_rename(
             self, group_id: int, port_id: int,
             custom_name: str, save_in_jack: bool):
-        if not save_in_jack:
-            return
-
         port = self.mng.get_port_from_id(group_id, port_id)
         if port is None:
             return
 
+        self.mng.search_index.custom_name_changed(port.full_name)
+        self.mng.layout_changed()
+        if not save_in_jack:
+            return
+
         if port.type.is_jack:
-            self.mng.pe.write_port_pretty_name(port.full_name, custom_name)
+            self.mng.pretty_exporter.queue_port(
+                port.full_name, port.uuid, custom_name)
+
+    # box and portgroup changes are saved in the canvas memory.
+    # Callbacker.receive() dispatches the canvas actions
+    # to these protected methods.
+
+    def _group_move(self, *args):
+        super()._group_move(*args)
+        self.mng.layout_changed()
+
+    def _group_wrap(self, *args):
+        super()._group_wrap(*args)
+        self.mng.layout_changed()
+
+    def _group_split(self, *args):
+        super()._group_split(*args)
+        self.mng.layout_changed()
+
+    def _group_join(self, *args):
+        super()._group_join(*args)
+        self.mng.layout_changed()
+
+    def _group_layout_change(self, *args):
+        super()._group_layout_change(*args)
+        self.mng.layout_changed()
+
+    def _portgroup_add(self, *args):
+        super()._portgroup_add(*args)
+        self.mng.layout_changed()
+
+    def _portgroup_remove(self, *args):
+        super()._portgroup_remove(*args)
+        self.mng.layout_changed()
 
     def ports_connect(self, group_out_id: int, port_out_id: int,
                       group_in_id: int, port_in_id: int):
-        port_out = self.mng.get_port_from_id(group_out_id, port_out_id)
-        port_in = self.mng.get_port_from_id(group_in_id, port_in_id)
-        if port_out is None or port_in is None:
-            return
-        
-        self.mng.pe.connect_ports(port_out.full_name, port_in.full_name)
+        self._pending_connects.append(
+            (group_out_id, port_out_id, group_in_id, port_in_id))
+        self._schedule_flush()
+
+    def ports_connect_many(
+            self, port_ids: list[tuple[int, int, int, int]]):
+        '''connect all ports given with
+        (group_out_id, port_out_id, group_in_id, port_in_id)'''
+        pairs = list[tuple[str, str]]()
+        for group_out_id, port_out_id, group_in_id, port_in_id in port_ids:
+            port_out = self.mng.get_port_from_id(group_out_id, port_out_id)
+            port_in = self.mng.get_port_from_id(group_in_id, port_in_id)
+            if port_out is None or port_in is None:
+                continue
+            pairs.append((port_out.full_name, port_in.full_name))
+
+        self.mng.connect_ports_many(pairs)
 
     def ports_disconnect(self, connection_id: int):
-        for conn in self.mng.connections:
-            if conn.connection_id == connection_id:
-                self.mng.pe.connect_ports(
-                    conn.port_out.full_name,
-                    conn.port_in.full_name,
-                    disconnect=True)
-                return
+        self._pending_disconnects.append(connection_id)
+        self._schedule_flush()
+
+    def ports_disconnect_many(self, connection_ids: list[int]):
+        pairs = list[tuple[str, str]]()
+        for connection_id in connection_ids:
+            conn = self.mng.get_connection_from_id(connection_id)
+            if conn is not None:
+                pairs.append((conn.port_out.full_name,
+                              conn.port_in.full_name))
+        self.mng.connect_ports_many(pairs, disconnect=True)
 
 
 class PatchancePatchbayManager(PatchbayManager):
@@ -88,8 +202,55 @@ class PatchancePatchbayManager(PatchbayManager):
         super().__init__(settings)
         self.pe = engine
         self._settings = settings
+        self.connections = ConnectionList()
+
+        self.alsa_midi_available = True
+        self._options_dialog_wanted = False
+        self._pretty_names_locked = False
+
+        self.engine_worker = EngineWorker(engine)
+        self.engine_worker.request_done.connect(self._engine_request_done)
+        self.pretty_exporter = PrettyNameExporter(engine, self.engine_worker)
+        self.pretty_exporter.applied = self.metadata_update
+
+        self.connection_index = ConnectionIndex(self)
+        self.search_index = PatchbaySearchIndex(self)
+        'names index for the filter frame'
+        self._filter_text = ''
+        self._filter_matching: Optional[set[str]] = None
+        'names of the groups matching the filter, None without filter'
+
+        self.auto_connector = AutoConnector(
+            self._load_auto_connect_rules(), self.connect_ports_many)
+        self.auto_connector.connections = lambda: self.pe.connections
+
+        self.reconcile_on_restart = True
+        '''if True, when JACK restarts quickly, the canvas is updated
+        with only the differences with the new JACK graph.'''
+        self._applied_metadatas = dict[int, dict[str, str]]()
+        self._restart_grace_timer = QTimer()
+        self._restart_grace_timer.setSingleShot(True)
+        self._restart_grace_timer.setInterval(RESTART_GRACE_MS)
+        self._restart_grace_timer.timeout.connect(self._apply_server_stopped)
+
+        self._batch = ConnectionBatch()
+        self._batch_timer = QTimer()
+        self._batch_timer.setSingleShot(True)
+        self._batch_timer.timeout.connect(self._end_batch)
         
         self._memory_path = None
+        self._memory_writer: Optional[MemoryFileWriter] = None
+        self._layout_store: Optional[LayoutStore] = None
+        self._lazy_views = set[int]()
+        'views of the layout store not loaded yet'
+        self.dsp_history = DspHistory()
+        self._autosave_timer = QTimer()
+        self._autosave_timer.setSingleShot(True)
+        self._autosave_timer.setInterval(AUTOSAVE_DELAY)
+        self._autosave_timer.timeout.connect(self._autosave)
+        self._dsp_save_timer = QTimer()
+        self._dsp_save_timer.setInterval(DSP_HISTORY_SAVE_INTERVAL)
+        self._dsp_save_timer.timeout.connect(self._save_dsp_history)
 
         # self._load_memory_file()
 
@@ -97,31 +258,58 @@ class PatchancePatchbayManager(PatchbayManager):
         if self._settings is None:
             return
         
-        self._memory_path = \
-            Path(self._settings.fileName()).parent / MEMORY_FILE
+        config_dir = Path(self._settings.fileName()).parent
+        if memory_backend(config_dir) == 'sqlite':
+            self._layout_store = open_store(config_dir)
+            prune_days = self._settings.value(
+                'Canvas/memory_prune_days', 0, type=int)
+            if prune_days > 0:
+                self._layout_store.prune(prune_days)
 
-        no_file_to_load = False
+            json_dict, self._lazy_views = self._layout_store.load_memory()
+            self._eat_memory_dict(json_dict)
+            return
 
-        try:
-            with open(self._memory_path, 'r') as f:                
-                json_dict = json.load(f)
+        self._memory_path = config_dir / MEMORY_FILE
+        self._memory_writer = MemoryFileWriter(self._memory_path)
+
+        json_dict = None
+
+        for path in memory_file_candidates(self._memory_path):
+            try:
+                with open(path, 'r') as f:
+                    contents = f.read()
+                json_dict = json.loads(contents)
                 assert isinstance(json_dict, dict)
 
-        except FileNotFoundError:
-            _logger.warning(
-                f"File {self._memory_path} has not been found, "
-                "It is probably the first startup.")
-            no_file_to_load = True
+            except FileNotFoundError:
+                json_dict = None
+                continue
 
-        except:
-            _logger.warning(
-                f"File {self._memory_path} is incorrectly written, "
-                "it will be ignored.")
-            no_file_to_load = True
+            except:
+                _logger.warning(
+                    f"File {path} is incorrectly written, "
+                    "it will be ignored.")
+                json_dict = None
+                continue
+            
+            if path == self._memory_path:
+                self._memory_writer.set_file_contents(contents)
+            else:
+                _logger.warning(f"Using backup file {path}")
+            break
         
-        if no_file_to_load:
+        if json_dict is None:
+            if not any(p.exists() for p in
+                       memory_file_candidates(self._memory_path)):
+                _logger.warning(
+                    f"File {self._memory_path} has not been found, "
+                    "It is probably the first startup.")
             return
 
+        self._eat_memory_dict(json_dict)
+
+    def _eat_memory_dict(self, json_dict: dict):
         self.view_number = 1
 
         if json_dict.get('views') is not None:
@@ -152,6 +340,415 @@ class PatchancePatchbayManager(PatchbayManager):
         self.change_port_types_view(
             self.views[self.view_number].default_port_types_view)
     
+    def _load_lazy_view(self, view_number: int):
+        if self._layout_store is None:
+            return
+
+        self._lazy_views.discard(view_number)
+        view_dict = self._layout_store.load_view(view_number)
+        if view_dict is not None:
+            self.views.eat_json_list([view_dict], clear=False)
+
+    def change_view(self, view_number: int):
+        if view_number in self._lazy_views:
+            self._load_lazy_view(view_number)
+        super().change_view(view_number)
+
+    def add_port(self, name: str, port_type: PortType,
+                 flags: int, uuid: int):
+        super().add_port(name, port_type, flags, uuid)
+        self.auto_connector.port_added(name, port_type, flags)
+        group_name = self._port_group_name(name)
+        self.search_index.port_added(name, uuid, group_name)
+        self._refilter_group(group_name)
+
+    def _port_group_name(self, port_name: str) -> str:
+        '''name of the group of the port, not always its JACK client
+        name (a2j and Midi-Bridge ports have one group per device).'''
+        port = self.get_port_from_name(port_name)
+        if port is not None:
+            group = self.get_group_from_id(port.group_id)
+            if group is not None:
+                return group.name
+        return port_name.partition(':')[0]
+
+    def rename_port(self, ex_name: str, new_name: str, uuid=0):
+        super().rename_port(ex_name, new_name, uuid=uuid)
+        self.connection_index.port_renamed(ex_name, new_name)
+        self.auto_connector.port_renamed(ex_name, new_name)
+        self.search_index.port_renamed(
+            ex_name, new_name, uuid, self._port_group_name(new_name))
+
+    def set_group_uuid_from_name(self, client_name: str, uuid: int):
+        super().set_group_uuid_from_name(client_name, uuid)
+        self.search_index.client_uuid_set(client_name, uuid)
+
+    def _load_auto_connect_rules(self) -> list[AutoConnectRule]:
+        if self.config_dir is None:
+            return []
+        return load_rules(self.config_dir)
+
+    def reload_auto_connect_rules(self):
+        '''read again the auto-connect rules file
+        and apply the rules to the current ports.'''
+        self.auto_connector.set_rules(self._load_auto_connect_rules())
+        self.auto_connector.resolve_all()
+
+    @property
+    def config_dir(self) -> Optional[Path]:
+        if self._settings is None:
+            return None
+        return Path(self._settings.fileName()).parent
+
+    def save_snapshot(self, name: str):
+        '''save current connections and custom names as snapshot'''
+        if self.config_dir is None:
+            return
+
+        snapshot = PatchSnapshot(
+            name, [tuple(c) for c in self.pe.connections],
+            self.custom_names.to_json())
+        try:
+            save_snapshot(self.config_dir, snapshot)
+        except Exception as e:
+            _logger.warning(f'Failed to save snapshot {name}: {str(e)}')
+
+    def restore_snapshot(self, name: str):
+        '''apply the snapshot connections with only the needed
+        disconnections and connections, in one batch.'''
+        if self.config_dir is None:
+            return
+
+        try:
+            snapshot = load_snapshot(self.config_dir, name)
+        except Exception as e:
+            _logger.warning(f'Failed to load snapshot {name}: {str(e)}')
+            return
+
+        existing_ports = {port.full_name
+                          for group in self.groups for port in group.ports}
+        to_disconnect, to_connect = snapshot_diff(
+            self.pe.connections, snapshot.connections, existing_ports)
+        _logger.info(
+            f'restore snapshot {name}: {len(to_disconnect)} disconnections, '
+            f'{len(to_connect)} connections')
+
+        self.change_connections(to_disconnect, to_connect)
+
+        if (snapshot.custom_names is not None
+                and snapshot.custom_names != self.custom_names.to_json()):
+            self._restore_custom_names(snapshot.custom_names)
+
+    def _restore_custom_names(self, custom_names: dict):
+        '''replace the custom names, and rename in the canvas
+        only the boxes and ports with a changed name.'''
+        old_groups = {g.name: self.custom_names.custom_group(g.name)
+                      for g in self.groups}
+        old_ports = {p.full_name: self.custom_names.custom_port(p.full_name)
+                     for g in self.groups for p in g.ports}
+        self.custom_names.eat_json(custom_names)
+
+        with CanvasOptimizeIt(self):
+            for group in self.groups:
+                if (self.custom_names.custom_group(group.name)
+                        != old_groups.get(group.name)):
+                    group.rename_in_canvas()
+                    self.search_index.custom_name_changed(group.name)
+
+                for port in group.ports:
+                    if (self.custom_names.custom_port(port.full_name)
+                            != old_ports.get(port.full_name)):
+                        port.rename_in_canvas()
+                        self.search_index.custom_name_changed(
+                            port.full_name)
+
+        self.apply_delayed_changes_now()
+        self.layout_changed()
+
+    def _engine_request_done(self, request: EngineRequest):
+        if request.act in (EngineAct.CONNECT_MANY,
+                           EngineAct.DISCONNECT_MANY,
+                           EngineAct.CHANGE_CONNECTIONS):
+            if request.failed_pairs:
+                _logger.warning(
+                    f'{request.act.name} failed for '
+                    f'{len(request.failed_pairs)} connections: '
+                    f'{request.error}')
+                self._batch.pairs_failed(request.failed_pairs)
+            if self._batch.complete:
+                self._end_batch()
+            elif (self._batch_timer.isActive()
+                    and self._batch_timer.remainingTime()
+                        > BATCH_END_DURATION):
+                # remaining notifications should come very soon
+                self._batch_timer.start(BATCH_END_DURATION)
+            return
+
+        if request.act is EngineAct.PRETTY_NAMES_MANY:
+            self.pretty_exporter.write_done(request)
+            return
+
+        if request.error:
+            _logger.warning(
+                f'{request.act.name} {request.args} failed: {request.error}')
+
+    def connect_ports_many(
+            self, pairs: list[tuple[str, str]], disconnect=False):
+        '''connect (or disconnect) all (port_out_name, port_in_name)
+        pairs in one batch. The resulting connection changes
+        are drawn in the canvas in one step.'''
+        if disconnect:
+            self.change_connections(pairs, [])
+        else:
+            self.change_connections([], pairs)
+
+    def change_connections(self, to_disconnect: list[tuple[str, str]],
+                           to_connect: list[tuple[str, str]]):
+        '''disconnect and connect (port_out_name, port_in_name) pairs
+        in one batch, disconnections first.'''
+        current = set(self.pe.connections)
+        to_disconnect = [p for p in to_disconnect if p in current]
+        to_connect = [p for p in to_connect if p not in current]
+
+        if len(to_disconnect) + len(to_connect) <= 1:
+            for pair in to_disconnect:
+                self.engine_worker.disconnect_ports(*pair)
+            for pair in to_connect:
+                self.engine_worker.connect_ports(*pair)
+            return
+
+        self._batch.add_pairs(to_disconnect)
+        self._batch.add_pairs(to_connect)
+        self._batch_timer.start(BATCH_MAX_DURATION)
+
+        if not to_connect:
+            self.engine_worker.disconnect_many(to_disconnect)
+        elif not to_disconnect:
+            self.engine_worker.connect_many(to_connect)
+        else:
+            self.engine_worker.change_connections(to_disconnect, to_connect)
+
+    def _batch_holds(self, added: bool,
+                     port_out_name: str, port_in_name: str) -> bool:
+        '''keep the connection change for the end of the batch
+        if it is part of the batch.'''
+        if self._batch.complete:
+            return False
+
+        if self._batch.conflicts(port_out_name, port_in_name):
+            # keep the changes order for this connection
+            self._end_batch()
+            return False
+
+        return self._batch.hold(added, port_out_name, port_in_name)
+
+    def _end_batch(self):
+        '''apply the connection changes of the batch in one step,
+        even if some of them have not been notified.'''
+        self._batch_timer.stop()
+        changes = self._batch.take()
+        if not changes:
+            return
+
+        with CanvasOptimizeIt(self):
+            for added, port_out_name, port_in_name in changes:
+                if added:
+                    self._add_connection(port_out_name, port_in_name)
+                else:
+                    self._remove_connection(port_out_name, port_in_name)
+        self.apply_delayed_changes_now()
+
+    def _drop_batch(self):
+        self._batch_timer.stop()
+        self._batch.clear()
+
+    def patch_events_processed(self):
+        '''called after each pass of patch events processing'''
+        if self._batch.has_changes and self._batch.complete:
+            self._end_batch()
+        self.auto_connector.resolve()
+
+    def _add_connection(self, port_out_name: str, port_in_name: str):
+        super().add_connection(port_out_name, port_in_name)
+        self.connection_index.connection_added(port_out_name, port_in_name)
+        if self._filter_matching is not None:
+            conn = self.connection_index.from_names(
+                port_out_name, port_in_name)
+            if conn is not None:
+                self._apply_filter_to_connection(conn)
+
+    def _remove_connection(self, port_out_name: str, port_in_name: str):
+        # same as the base method, with the connection found
+        # by the index, and removed from the id-keyed ConnectionList.
+        conn = self.connection_index.from_names(port_out_name, port_in_name)
+        if conn is None:
+            return
+
+        self.connections.remove(conn)
+        self.connection_index.connection_removed(
+            port_out_name, port_in_name)
+        self.sg.connection_removed.emit(conn.connection_id)
+        conn.remove_from_canvas()
+
+    def add_connection(self, port_out_name: str, port_in_name: str):
+        if not self._batch_holds(True, port_out_name, port_in_name):
+            self._add_connection(port_out_name, port_in_name)
+
+    def remove_connection(self, port_out_name: str, port_in_name: str):
+        if not self._batch_holds(False, port_out_name, port_in_name):
+            self._remove_connection(port_out_name, port_in_name)
+
+    def remove_port(self, name: str):
+        super().remove_port(name)
+        self.connection_index.port_removed(name)
+        self.auto_connector.port_removed(name)
+        self.search_index.port_removed(name)
+
+    def _filtered_out(self, group_name: str) -> bool:
+        return (self._filter_matching is not None
+                and group_name not in self._filter_matching)
+
+    def _apply_filter(self, groups: Iterable['Group']):
+        '''semi hide the groups and their connections
+        following the current filter.'''
+        conns = dict[int, 'Connection']()
+        for group in groups:
+            group.semi_hide(self._filtered_out(group.name))
+            for port in group.ports:
+                for conn in self.connection_index.from_port(port.full_name):
+                    conns[conn.connection_id] = conn
+
+        for conn in conns.values():
+            self._apply_filter_to_connection(conn)
+
+    def _apply_filter_to_connection(self, conn: 'Connection'):
+        hidden = False
+        for port in (conn.port_out, conn.port_in):
+            group = self.get_group_from_id(port.group_id)
+            if group is not None and self._filtered_out(group.name):
+                hidden = True
+                break
+        conn.semi_hide(hidden)
+
+    def _refilter_group(self, group_name: str):
+        '''apply the current filter to a group with a new port'''
+        if self._filter_matching is None:
+            return
+
+        if self.search_index.group_matches(group_name, self._filter_text):
+            self._filter_matching.add(group_name)
+        else:
+            self._filter_matching.discard(group_name)
+
+        group = self.get_group_from_name(group_name)
+        if group is not None:
+            self._apply_filter((group,))
+
+    def filter_groups(self, filter_text: str, n_select=0) -> int:
+        '''semi hide the boxes not matching filter_text in their group
+        name, custom name, pretty name or port names, select the
+        n_select matching box, and return the number of matching boxes,
+        as the base method does.
+
+        Called by the filter frame at each change. Matching groups are
+        found with the search index, and only the groups whose match
+        changed since the previous call are updated,
+        with their connections.'''
+        previous = self._filter_matching
+        self._filter_text = filter_text
+        self._filter_matching = (self.search_index.search_groups(filter_text)
+                                 if filter_text else None)
+
+        if previous is None and self._filter_matching is None:
+            pass
+        elif previous is None or self._filter_matching is None:
+            # filter set or removed, all the groups may change
+            self._apply_filter(self.groups)
+        else:
+            changed = list['Group']()
+            for group_name in previous ^ self._filter_matching:
+                group = self.get_group_from_name(group_name)
+                if group is not None:
+                    changed.append(group)
+            self._apply_filter(changed)
+
+        if self._filter_matching is None:
+            shown = self.groups
+        else:
+            shown = list['Group']()
+            for group_name in self._filter_matching:
+                group = self.get_group_from_name(group_name)
+                if group is not None:
+                    shown.append(group)
+            # in the order of self.groups
+            shown.sort(key=lambda g: g.group_id)
+
+        n_boxes = 0
+        for group in shown:
+            n_grp_boxes = group.get_number_of_boxes()
+            if n_boxes < n_select <= n_boxes + n_grp_boxes:
+                group.select_filtered_box(n_select - n_boxes)
+            n_boxes += n_grp_boxes
+        return n_boxes
+
+    def _set_canvas_enabled(self, enabled: bool):
+        if getattr(self, 'main_win', None) is not None:
+            self.main_win.ui.graphicsView.setEnabled(enabled)
+
+    def server_stopped(self):
+        self.dsp_history.add_stop()
+        if self.reconcile_on_restart:
+            # keep the canvas for the case JACK restarts soon,
+            # disabled, its ports do not exist anymore.
+            self._set_canvas_enabled(False)
+            self._restart_grace_timer.start()
+            return
+
+        self._apply_server_stopped()
+
+    def _apply_server_stopped(self):
+        self._set_canvas_enabled(True)
+        self._drop_batch()
+        self._applied_metadatas.clear()
+        self.pretty_exporter.clear()
+        super().server_stopped()
+        self.connection_index.clear()
+        self.auto_connector.clear()
+        self.search_index.clear()
+
+    def metadata_update(self, uuid: int, key: str, value: str):
+        if value:
+            self._applied_metadatas.setdefault(uuid, {})[key] = value
+        else:
+            uuid_dict = self._applied_metadatas.get(uuid)
+            if uuid_dict is not None:
+                uuid_dict.pop(key, None)
+        super().metadata_update(uuid, key, value)
+        self.search_index.metadata_changed(uuid, key, value)
+
+    def add_xrun(self):
+        self.dsp_history.add_xrun()
+        super().add_xrun()
+
+    def server_lose(self):
+        self.dsp_history.add_stop()
+        self._restart_grace_timer.stop()
+        self._set_canvas_enabled(True)
+        self._drop_batch()
+        super().server_lose()
+        self.connection_index.clear()
+        self.auto_connector.clear()
+        self.pretty_exporter.clear()
+        self.search_index.clear()
+
+    def get_connection_from_id(self, connection_id: int):
+        return self.connection_index.from_id(connection_id)
+
+    def get_connection_from_names(self, port_out_name: str,
+                                  port_in_name: str):
+        return self.connection_index.from_names(
+            port_out_name, port_in_name)
+
     def _setup_canvas(self):
         SUBMODULE = 'HoustonPatchbay'
         THEME_PATH = Path(SUBMODULE) / 'themes'
@@ -180,7 +777,9 @@ class PatchancePatchbayManager(PatchbayManager):
                       default_theme_name='Yellow Boards')
 
     def refresh(self):
+        self._drop_batch()
         super().refresh()
+        self.connection_index.clear()
         self.pe.refresh()
 
     def change_buffersize(self, buffer_size: int):
@@ -201,7 +800,8 @@ class PatchancePatchbayManager(PatchbayManager):
         super().set_alsa_midi_enabled(yesno)
 
     def export_custom_names_to_jack(self):
-        self.pe.export_all_custom_names_to_jack_now()
+        self.pretty_exporter.export_all(
+            self.custom_names.custom_group, self.custom_names.custom_port)
 
     def import_pretty_names_from_jack(self):
         clients_dict, ports_dict = \
@@ -212,6 +812,8 @@ class PatchancePatchbayManager(PatchbayManager):
         
         for port_name, pretty_name in ports_dict.items():
             self.custom_names.save_port(port_name, pretty_name)
+        self.search_index.rebuild()
+        self.layout_changed()
         self.pretty_diff_checker.full_update()
 
     def change_jack_export_naming(self, naming: Naming):
@@ -221,9 +823,16 @@ class PatchancePatchbayManager(PatchbayManager):
         self.pe.set_pretty_names_auto_export(auto_export)
 
     def server_restarted(self):
+        self.engine_worker.server_restarted()
         self.sample_rate_changed(self.pe.samplerate)
         self.buffer_size_changed(self.pe.buffer_size)
         
+        if self._restart_grace_timer.isActive():
+            self._restart_grace_timer.stop()
+            self._set_canvas_enabled(True)
+            self._reconcile_with_engine()
+            return
+
         with CanvasOptimizeIt(self):
             for port in self.pe.ports:
                 self.add_port(port.name, port.type, port.flags, port.uuid)
@@ -241,29 +850,179 @@ class PatchancePatchbayManager(PatchbayManager):
         self.apply_delayed_changes_now()
         self.pretty_diff_checker.full_update()
 
+    def _reconcile_with_engine(self):
+        '''Apply to the canvas still on screen only the differences
+        with the JACK graph of the restarted server.
+        Boxes and portgroups are not touched.'''
+        canvas_ports = dict[str, 'Port']()
+        for group in self.groups:
+            for port in group.ports:
+                if port.type.is_jack:
+                    canvas_ports[port.full_name] = port
+
+        engine_ports = {p.name: p for p in self.pe.ports}
+        canvas_by_uuid = {p.uuid: p for p in canvas_ports.values()
+                          if p.uuid}
+
+        removed = [n for n in canvas_ports if n not in engine_ports]
+        added = [p for n, p in engine_ports.items() if n not in canvas_ports]
+        n_changes = 0
+
+        with CanvasOptimizeIt(self):
+            # renamed ports keep their uuid
+            for eport in list(added):
+                cport = canvas_by_uuid.get(eport.uuid)
+                if cport is None or cport.full_name not in removed:
+                    continue
+                if cport.type is not eport.type:
+                    continue
+                self.rename_port(cport.full_name, eport.name,
+                                 uuid=eport.uuid)
+                removed.remove(cport.full_name)
+                added.remove(eport)
+                n_changes += 1
+
+            for port_name in removed:
+                self.remove_port(port_name)
+                n_changes += 1
+
+            for port_name, eport in engine_ports.items():
+                cport = canvas_ports.get(port_name)
+                if cport is None:
+                    continue
+
+                if cport.type is not eport.type or cport.flags != eport.flags:
+                    self.remove_port(port_name)
+                    added.append(eport)
+                elif cport.uuid != eport.uuid:
+                    # uuids change when JACK really restarts,
+                    # renaming with the same name only updates the uuid
+                    self.rename_port(port_name, port_name, uuid=eport.uuid)
+
+            for eport in added:
+                self.add_port(eport.name, eport.type, eport.flags, eport.uuid)
+                n_changes += 1
+
+            groups_by_name = {g.name: g for g in self.groups}
+            for client_name, client_uuid in self.pe.client_name_uuids.items():
+                group = groups_by_name.get(client_name)
+                if group is None or group.uuid != client_uuid:
+                    self.set_group_uuid_from_name(client_name, client_uuid)
+
+            canvas_conns = set[tuple[str, str]]()
+            for conn in self.connections:
+                if conn.port_out.type.is_jack and conn.port_in.type.is_jack:
+                    canvas_conns.add(
+                        (conn.port_out.full_name, conn.port_in.full_name))
+            engine_conns = set(self.pe.connections)
+
+            for connection in canvas_conns - engine_conns:
+                self.remove_connection(*connection)
+            for connection in engine_conns - canvas_conns:
+                self.add_connection(*connection)
+
+            old_metadatas = self._applied_metadatas
+            self._applied_metadatas = dict[int, dict[str, str]]()
+            for uuid, key_dict in self.pe.metadatas.items():
+                old_dict = old_metadatas.get(uuid, {})
+                for key, value in key_dict.items():
+                    if old_dict.get(key) == value:
+                        self._applied_metadatas.setdefault(
+                            uuid, {})[key] = value
+                        continue
+                    self.metadata_update(uuid, key, value)
+                    n_changes += 1
+
+            # keys removed while the server was stopped
+            for uuid, old_dict in old_metadatas.items():
+                key_dict = self.pe.metadatas.get(uuid, {})
+                for key in old_dict:
+                    if key not in key_dict:
+                        self.metadata_update(uuid, key, '')
+                        n_changes += 1
+
+        self.apply_delayed_changes_now()
+        if n_changes:
+            self.pretty_diff_checker.full_update()
+
+    @property
+    def options_dialog(self) -> Optional[CanvasOptionsDialog]:
+        '''The options dialog is built at its first use.'''
+        if (getattr(self, '_options_dialog', None) is None
+                and getattr(self, '_options_dialog_wanted', False)):
+            self._options_dialog_wanted = False
+            dialog = CanvasOptionsDialog(self.main_win, self)
+            self.set_options_dialog(dialog)
+            if not self.alsa_midi_available:
+                dialog.enable_alsa_midi(False)
+            if self._pretty_names_locked:
+                dialog.set_pretty_names_locked(True)
+        return getattr(self, '_options_dialog', None)
+
+    @options_dialog.setter
+    def options_dialog(self, dialog: Optional[CanvasOptionsDialog]):
+        self._options_dialog = dialog
+
+    def set_pretty_names_locked(self, locked: bool):
+        '''applied to the options dialog, now if it is built,
+        else when it will be built.'''
+        self._pretty_names_locked = locked
+        dialog = getattr(self, '_options_dialog', None)
+        if dialog is not None:
+            dialog.set_pretty_names_locked(locked)
+
     def finish_init(self, main: 'Main'):
         self.set_main_win(main.main_win)
         self._setup_canvas()
+        profiler.mark('canvas setup')
         self._load_memory_file()
+        profiler.mark('memory file')
 
-        self.set_canvas_menu(CanvasMenu(self))
+        self.set_canvas_menu(PatchanceCanvasMenu(self))
         self.set_tools_widget(main.main_win.patchbay_tools)
         self.set_filter_frame(main.main_win.ui.filterFrame)
+        self._options_dialog_wanted = True
+        profiler.mark('menu and tools')
 
-        self.set_options_dialog(
-            CanvasOptionsDialog(self.main_win, self))
+        if self.config_dir is not None:
+            self.dsp_history.load(self.config_dir / DSP_HISTORY_FILE)
+        self._dsp_save_timer.start()
+        # connected after the memory file loading, not to save it back
+        self.sg.views_changed.connect(self.layout_changed)
 
-    def save_positions(self):
-        '''Save patchbay boxes positions and custom names'''
-        json_str = from_json_to_str(
-            {'views': self.views.to_json_list(),
-             'portgroups': self.portgroups_memory.to_json(),
-             'custom_names': self.custom_names.to_json()})
+    def layout_changed(self):
+        '''save the canvas memory once the layout has not changed
+        for AUTOSAVE_DELAY ms.'''
+        self._autosave_timer.start()
 
-        if self._memory_path is not None:
-            try:
-                with open(self._memory_path, 'w') as f:
-                    f.write(json_str)
-            except Exception as e:
-                _logger.warning(str(e))
+    def _memory_dict(self) -> dict:
+        return {'views': self.views.to_json_list(),
+                'portgroups': self.portgroups_memory.to_json(),
+                'custom_names': self.custom_names.to_json()}
 
+    def _save_in_layout_store(self):
+        # the memory is keyed by group names, which are not always
+        # JACK client names (a2j and Midi-Bridge devices for example)
+        self._layout_store.touch_groups({g.name for g in self.groups})
+        self._layout_store.save_memory(
+            self._memory_dict(), self._lazy_views)
+
+    def _save_dsp_history(self):
+        if self.config_dir is not None:
+            self.dsp_history.save(self.config_dir / DSP_HISTORY_FILE)
+
+    def _autosave(self):
+        if self._layout_store is not None:
+            self._save_in_layout_store()
+        elif self._memory_writer is not None:
+            self._memory_writer.write_in_thread(
+                from_json_to_str(self._memory_dict()))
+
+    def save_positions(self):
+        '''Save patchbay boxes positions and custom names'''
+        self._autosave_timer.stop()
+        self._save_dsp_history()
+        if self._layout_store is not None:
+            self._save_in_layout_store()
+        elif self._memory_writer is not None:
+            self._memory_writer.write(from_json_to_str(self._memory_dict()))
@@ -0,0 +1,93 @@
+from qtpy.QtCore import Qt, QTimer
+from qtpy.QtWidgets import (
+    QApplication, QDockWidget, QFileDialog, QHBoxLayout, QPushButton,
+    QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget)
+
+from perf_monitor import PerfMonitor
+
+
+_translate = QApplication.translate
+
+REFRESH_MS = 1000
+COLUMNS = ('count', 'mean_ms', 'p50_ms', 'p99_ms', 'max_ms', 'total_ms')
+
+
+class PerfDock(QDockWidget):
+    '''Latency histograms of the --perf instrumentation,
+    refreshed only while visible.'''
+
+    def __init__(self, monitor: PerfMonitor, parent: QWidget):
+        super().__init__(_translate('perf', 'Performance'), parent)
+        self.setObjectName('PerfDock')
+        self.monitor = monitor
+        self._items = dict[str, QTreeWidgetItem]()
+
+        widget = QWidget(self)
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(2, 2, 2, 2)
+
+        self.tree = QTreeWidget(widget)
+        self.tree.setRootIsDecorated(False)
+        self.tree.setSortingEnabled(True)
+        self.tree.setHeaderLabels(
+            [_translate('perf', 'Function'),
+             _translate('perf', 'Calls'),
+             _translate('perf', 'Mean (ms)'),
+             _translate('perf', 'p50 (ms)'),
+             _translate('perf', 'p99 (ms)'),
+             _translate('perf', 'Max (ms)'),
+             _translate('perf', 'Total (ms)')])
+        self.tree.sortByColumn(len(COLUMNS), Qt.SortOrder.DescendingOrder)
+        layout.addWidget(self.tree)
+
+        buttons = QHBoxLayout()
+        reset_button = QPushButton(_translate('perf', 'Reset'), widget)
+        reset_button.clicked.connect(self._reset)
+        dump_button = QPushButton(
+            _translate('perf', 'Save as JSON...'), widget)
+        dump_button.clicked.connect(self._dump)
+        buttons.addStretch()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(dump_button)
+        layout.addLayout(buttons)
+        self.setWidget(widget)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_MS)
+        self._timer.timeout.connect(self._refresh)
+        self.visibilityChanged.connect(self._visibility_changed)
+
+    def _visibility_changed(self, visible: bool):
+        if visible:
+            self._refresh()
+            self._timer.start()
+        else:
+            self._timer.stop()
+
+    def _refresh(self):
+        self.tree.setSortingEnabled(False)
+        for name, histogram in self.monitor.histograms.items():
+            item = self._items.get(name)
+            if item is None:
+                item = QTreeWidgetItem([name])
+                self._items[name] = item
+                self.tree.addTopLevelItem(item)
+
+            values = histogram.to_json()
+            for column, key in enumerate(COLUMNS, start=1):
+                value = values[key]
+                item.setData(column, Qt.ItemDataRole.DisplayRole,
+                             value if key == 'count' else round(value, 3))
+        self.tree.setSortingEnabled(True)
+
+    def _reset(self):
+        self.monitor.reset()
+        self.tree.clear()
+        self._items.clear()
+
+    def _dump(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, _translate('perf', 'Save performance profile'),
+            'patchance_perf.json', 'JSON (*.json)')
+        if path:
+            self.monitor.dump(path)
@@ -0,0 +1,181 @@
+'''Hot path latency histograms, enabled with --perf.
+
+Instrumentation is installed only when enabled,
+so without --perf, instrumented functions are the original ones.
+
+This module must not import Qt at module level,
+it is imported before the Qt API is chosen.'''
+
+import json
+import sys
+import time
+from functools import wraps
+from typing import Any, Callable, Iterable
+
+N_BUCKETS = 32
+'bucket N counts durations in [2^(N-1), 2^N[ microseconds'
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float):
+        '''add a duration in seconds'''
+        bucket = int(duration * 1_000_000).bit_length()
+        self.buckets[min(bucket, N_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def percentile(self, percent: float) -> float:
+        '''upper bound in seconds of the bucket
+        containing this percentile'''
+        if not self.count:
+            return 0.0
+
+        wanted = self.count * percent / 100.0
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min((1 << bucket) / 1_000_000, self.max)
+        return self.max
+
+    def to_json(self) -> dict[str, Any]:
+        return {'count': self.count,
+                'total_ms': self.total * 1000,
+                'mean_ms': self.total * 1000 / self.count
+                           if self.count else 0.0,
+                'p50_ms': self.percentile(50) * 1000,
+                'p99_ms': self.percentile(99) * 1000,
+                'max_ms': self.max * 1000,
+                'buckets_us': {f'<{1 << i}': count
+                               for i, count in enumerate(self.buckets)
+                               if count}}
+
+
+class PerfMonitor:
+    def __init__(self):
+        self.enabled = False
+        self.histograms = dict[str, LatencyHistogram]()
+        self._start = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        self.histograms.clear()
+        self._start = time.perf_counter()
+
+    def record(self, name: str, duration: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.add(duration)
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        '''return `func` measured under `name` if enabled,
+        else `func` itself.'''
+        if not self.enabled:
+            return func
+
+        perf_counter = time.perf_counter
+        record = self.record
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, perf_counter() - start)
+        return wrapper
+
+    def instrument_methods(self, obj: object, method_names: Iterable[str],
+                           prefix: str):
+        '''replace these bound methods of `obj` with measured ones,
+        named `prefix` + method name.'''
+        if not self.enabled:
+            return
+
+        for method_name in method_names:
+            method = getattr(obj, method_name, None)
+            if callable(method):
+                setattr(obj, method_name,
+                        self.wrap(prefix + method_name, method))
+
+    def instrument_class(self, cls: type, method_names: Iterable[str],
+                         prefix: str):
+        '''replace these methods of the class `cls` with measured ones,
+        named `prefix` + method name. Unlike `instrument_methods`,
+        it also measures the bound methods already connected to
+        signals, if it is called before any instance is created.'''
+        if not self.enabled:
+            return
+
+        for method_name in method_names:
+            method = cls.__dict__.get(method_name)
+            if callable(method):
+                setattr(cls, method_name,
+                        self.wrap(prefix + method_name, method))
+
+    def instrument_context_manager(self, cls: type, name: str):
+        '''measure the blocks of the context manager class `cls`,
+        from __enter__ to the end of __exit__.'''
+        if not self.enabled:
+            return
+
+        orig_enter, orig_exit = cls.__enter__, cls.__exit__
+        perf_counter = time.perf_counter
+        record = self.record
+
+        def __enter__(self_, *args, **kwargs):
+            self_._perf_start = perf_counter()
+            return orig_enter(self_, *args, **kwargs)
+
+        def __exit__(self_, *args, **kwargs):
+            try:
+                return orig_exit(self_, *args, **kwargs)
+            finally:
+                start = getattr(self_, '_perf_start', None)
+                if start is not None:
+                    record(name, perf_counter() - start)
+
+        cls.__enter__ = __enter__
+        cls.__exit__ = __exit__
+
+    def to_json(self) -> dict[str, Any]:
+        return {'duration_s': time.perf_counter() - self._start,
+                'histograms': {name: histogram.to_json()
+                               for name, histogram
+                               in sorted(self.histograms.items())}}
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def report(self):
+        if not self.enabled or not self.histograms:
+            return
+
+        name_len = max(len(name) for name in self.histograms)
+        lines = ['Performance profile (ms):',
+                 f'  {"".ljust(name_len)} {"count":>8} {"mean":>9} '
+                 f'{"p99":>9} {"max":>9} {"total":>10}']
+        for name, histogram in sorted(
+                self.histograms.items(), key=lambda item: -item[1].total):
+            mean = histogram.total / histogram.count
+            lines.append(
+                f'  {name.ljust(name_len)} {histogram.count:8d} '
+                f'{mean * 1000:9.3f} {histogram.percentile(99) * 1000:9.3f} '
+                f'{histogram.max * 1000:9.3f} '
+                f'{histogram.total * 1000:10.1f}')
+        sys.stderr.write('\n'.join(lines) + '\n')
+
+
+perf = PerfMonitor()
@@ -0,0 +1,178 @@
+import logging
+from typing import TYPE_CHECKING, Callable, Optional
+
+from qtpy.QtCore import QObject, QTimer
+
+if TYPE_CHECKING:
+    from patch_engine import PatchEngine
+    from engine_worker import EngineRequest, EngineWorker
+
+
+_logger = logging.getLogger(__name__)
+
+PRETTY_NAME_KEY = 'http://jackaudio.org/metadata/pretty-name'
+FLUSH_INTERVAL = 50
+'ms between two batches of pretty-name writes'
+MAX_WRITES_PER_FLUSH = 64
+'''max metadata writes sent in one batch,
+others wait for the next flush'''
+
+
+class PrettyNameExporter(QObject):
+    '''Writes custom names as JACK pretty-name metadatas,
+    only for the clients and ports where it changes something.
+
+    Writes are queued, sent in batches to the engine worker at most
+    every FLUSH_INTERVAL ms, and their echoes (the `metadata_updated`
+    notifications of our own writes) are recognized with `is_echo`.
+    Failed writes are rolled back in the patchbay with `write_done`.'''
+
+    def __init__(self, patch_engine: 'PatchEngine',
+                 engine_worker: 'EngineWorker'):
+        super().__init__()
+        self.pe = patch_engine
+        self.engine_worker = engine_worker
+
+        self.applied: Optional[Callable[[int, str, str], None]] = None
+        '''called with (uuid, key, value) for each written value,
+        so the patchbay is updated without waiting for the echo,
+        and with the previous value if the write fails.'''
+
+        self._echoes = dict[int, str]()
+        '''pretty name written and not notified back yet, for each uuid.
+        The value itself is kept, echoes are compared exactly.'''
+        self._in_flight = list[
+            tuple['EngineRequest', dict[tuple[bool, str], tuple[int, str]]]]()
+        '''requests sent to the engine worker, with the uuid and the
+        previous pretty name of each (is_group, name) written'''
+        self._pending = dict[tuple[bool, str], tuple[int, str]]()
+        '''(is_group, name) -> (uuid, pretty_name) to write,
+        only the last value for a same name is kept'''
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(FLUSH_INTERVAL)
+        self._timer.timeout.connect(self.flush)
+
+    def _queue(self, is_group: bool, name: str, uuid: int,
+               pretty_name: str):
+        if not uuid:
+            return
+
+        self._pending[(is_group, name)] = (uuid, pretty_name)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def queue_group(self, client_name: str, uuid: int, pretty_name: str):
+        self._queue(True, client_name, uuid, pretty_name)
+
+    def queue_port(self, port_name: str, uuid: int, pretty_name: str):
+        self._queue(False, port_name, uuid, pretty_name)
+
+    def _current(self, uuid: int) -> str:
+        return self.pe.metadatas.get(uuid, {}).get(PRETTY_NAME_KEY, '')
+
+    def _is_up_to_date(self, uuid: int, pretty_name: str) -> bool:
+        expected = self._echoes.get(uuid)
+        if expected is not None:
+            # written and not notified back yet
+            return expected == pretty_name
+        return self._current(uuid) == pretty_name
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        if not self.pe.jack_running:
+            self._pending.clear()
+            return
+
+        writes = list[tuple[bool, str, str]]()
+        rollbacks = dict[tuple[bool, str], tuple[int, str]]()
+        while self._pending and len(writes) < MAX_WRITES_PER_FLUSH:
+            (is_group, name), (uuid, pretty_name) = \
+                self._pending.popitem()
+            if self._is_up_to_date(uuid, pretty_name):
+                continue
+
+            writes.append((is_group, name, pretty_name))
+            rollbacks[(is_group, name)] = (uuid, self._current(uuid))
+            self._echoes[uuid] = pretty_name
+            if self.applied is not None:
+                self.applied(uuid, PRETTY_NAME_KEY, pretty_name)
+
+        if writes:
+            _logger.debug(f'writing {len(writes)} pretty names')
+            request = self.engine_worker.write_pretty_names(writes)
+            self._in_flight.append((request, rollbacks))
+
+        if self._pending:
+            self._timer.start()
+
+    def export_all(self, custom_group: Callable[[str], str],
+                   custom_port: Callable[[str], str]):
+        '''queue the custom names of all clients and ports,
+        only the ones different from their JACK pretty name are written.'''
+        for client_name, uuid in self.pe.client_name_uuids.items():
+            pretty_name = custom_group(client_name)
+            if pretty_name:
+                self.queue_group(client_name, uuid, pretty_name)
+
+        for port in self.pe.ports:
+            pretty_name = custom_port(port.name)
+            if pretty_name:
+                self.queue_port(port.name, port.uuid, pretty_name)
+
+        self.flush()
+
+    def write_done(self, request: 'EngineRequest'):
+        '''restore in the patchbay the previous pretty names
+        of the writes of this request which failed.'''
+        for i, (in_flight, rollbacks) in enumerate(self._in_flight):
+            if in_flight is request:
+                del self._in_flight[i]
+                break
+        else:
+            # sent before a clear()
+            return
+
+        if request.failed_writes is None:
+            # not executed at all
+            failed_writes = request.args[0] if request.error else []
+        else:
+            failed_writes = request.failed_writes
+
+        if failed_writes:
+            _logger.warning(f'failed to write {len(failed_writes)} '
+                            f'pretty names: {request.error}')
+
+        for is_group, name, pretty_name in failed_writes:
+            uuid, previous = rollbacks[(is_group, name)]
+            if self._echoes.get(uuid) != pretty_name:
+                # a later write replaces it
+                continue
+
+            del self._echoes[uuid]
+            if self.applied is not None:
+                self.applied(uuid, PRETTY_NAME_KEY, previous)
+
+    def is_echo(self, uuid: int, key: str, value: str) -> bool:
+        '''True if this metadata update is the notification
+        of one of our writes, already applied to the patchbay.'''
+        if key != PRETTY_NAME_KEY:
+            return False
+
+        expected = self._echoes.get(uuid)
+        if expected is None:
+            return False
+
+        # if changed by another client, a later export has to write it
+        del self._echoes[uuid]
+        return value == expected
+
+    def clear(self):
+        '''uuids are not valid anymore (JACK stopped)'''
+        self._timer.stop()
+        self._pending.clear()
+        self._echoes.clear()
+        self._in_flight.clear()
@@ -1,8 +1,219 @@
-from ctypes import CDLL, c_ulong, c_void_p, c_int
+'''ctypes wrapper of process_cb.so, peak and RMS meters
+computed in C in the JACK process thread. Build it with `make meters`.
+
+The C side writes the meters in a MeterBuffer, an anonymous mmap
+shared with Python. It is read through memoryviews (or a NumPy view
+if NumPy is installed) without any copy or call to the library.'''
+
+import logging
+import math
+import mmap
+from ctypes import (
+    CDLL, POINTER, addressof, c_char, c_char_p, c_float, c_int,
+    c_void_p)
 from pathlib import Path
+from typing import Optional
+
+
+_logger = logging.getLogger(__name__)
+
+LIB_PATH = Path(__file__).parent / 'process_cb.so'
+
+MAX_SLOTS = 256
+'same as METERS_MAX_PORTS in process_cb.h'
+SLOT_FIELDS = 4
+'32 bits fields of meter_slot_t: seq, ack, peak, mean_square'
+SEQ, ACK, PEAK, MEAN_SQUARE = range(SLOT_FIELDS)
+
+
+def _load_lib() -> Optional[CDLL]:
+    try:
+        ccb = CDLL(str(LIB_PATH))
+    except OSError as e:
+        _logger.info(f'meters are not available: {str(e)}')
+        return None
+
+    ccb.meters_set_buffer.argtypes = [c_void_p, c_int]
+    ccb.meters_set_buffer.restype = c_int
+    ccb.meters_start.argtypes = [c_char_p]
+    ccb.meters_start.restype = c_int
+    ccb.meters_stop.argtypes = []
+    ccb.meters_stop.restype = None
+    ccb.meters_add_port.argtypes = [c_char_p]
+    ccb.meters_add_port.restype = c_int
+    ccb.meters_remove_port.argtypes = [c_int]
+    ccb.meters_remove_port.restype = None
+    ccb.meters_read.argtypes = [c_int, POINTER(c_float), POINTER(c_float)]
+    ccb.meters_read.restype = c_int
+    return ccb
+
+
+class MeterBuffer:
+    '''The meter slots, in an anonymous mmap written by the C side.
+    `uints` and `floats` are views of the same memory,
+    field F of slot N is at index N * SLOT_FIELDS + F.
+
+    The reader only writes the ACK field, with the seq of the values
+    it has read. Until it sees this ack, the process thread keeps
+    merging the new periods with the values read, so no peak is lost
+    between a read and its ack.'''
+
+    def __init__(self, n_slots: int=MAX_SLOTS):
+        self.n_slots = n_slots
+        self._mmap = mmap.mmap(-1, n_slots * SLOT_FIELDS * 4)
+        self.uints = memoryview(self._mmap).cast('I')
+        self.floats = memoryview(self._mmap).cast('f')
+        self._anchor = c_char.from_buffer(self._mmap)
+        self._numpy_view = None
+
+    @property
+    def address(self) -> int:
+        return addressof(self._anchor)
+
+    def numpy_view(self):
+        '''structured NumPy array of the slots, without copy.
+        Returns None if NumPy is not installed.'''
+        if self._numpy_view is not None:
+            return self._numpy_view
+
+        try:
+            import numpy
+        except ImportError:
+            return None
+
+        dtype = numpy.dtype([('seq', '<u4'), ('ack', '<u4'),
+                             ('peak', '<f4'), ('mean_square', '<f4')])
+        self._numpy_view = numpy.frombuffer(self._mmap, dtype=dtype)
+        return self._numpy_view
+
+    def read_slots(self, slots: list[int]) \
+            -> list[Optional[tuple[float, float]]]:
+        '''read_slot() for all `slots`, vectorized with NumPy if present.
+        Slots being written are returned as None, as with nothing new.'''
+        view = self.numpy_view()
+        if view is None:
+            return [self.read_slot(slot) for slot in slots]
+
+        import numpy
+        indexes = numpy.asarray(slots, dtype=numpy.intp)
+        seqs = view['seq'][indexes]
+        peaks = view['peak'][indexes]
+        rms = numpy.sqrt(view['mean_square'][indexes])
+        valid = ((seqs == view['seq'][indexes]) & ((seqs & 1) == 0)
+                 & (seqs != view['ack'][indexes]))
+        view['ack'][indexes[valid]] = seqs[valid]
+
+        return [(float(p), float(r)) if v else None
+                for p, r, v in zip(peaks, rms, valid)]
+
+    def read_slot(self, slot: int) -> Optional[tuple[float, float]]:
+        '''return (peak, rms) since the previous read of this slot,
+        or None if nothing has been processed since.'''
+        base = slot * SLOT_FIELDS
+        uints, floats = self.uints, self.floats
+
+        for _ in range(100):
+            seq = uints[base + SEQ]
+            if seq & 1:
+                continue
+            peak = floats[base + PEAK]
+            mean_square = floats[base + MEAN_SQUARE]
+            if uints[base + SEQ] == seq:
+                break
+        else:
+            return None
+
+        if seq == uints[base + ACK]:
+            return None
+
+        uints[base + ACK] = seq
+        return peak, math.sqrt(mean_square)
+
+    def close(self):
+        self._numpy_view = None
+        self.uints.release()
+        self.floats.release()
+        del self._anchor
+        self._mmap.close()
+
+
+class PeakMeters:
+    '''Meters of JACK audio ports, with their own JACK client.
+    Values are peak and RMS since the previous read.'''
+
+    def __init__(self):
+        self._lib = _load_lib()
+        self.started = False
+        self.buffer: Optional[MeterBuffer] = None
+        self.slots = dict[str, int]()
+        'slot index for each monitored port name'
+
+    @property
+    def available(self) -> bool:
+        return self._lib is not None
+
+    def start(self, client_name: str) -> bool:
+        if self._lib is None:
+            return False
+        if self.started:
+            return True
+
+        self.buffer = MeterBuffer()
+        if self._lib.meters_set_buffer(
+                self.buffer.address, self.buffer.n_slots):
+            _logger.warning('Failed to give the meters buffer')
+        else:
+            self.started = self._lib.meters_start(client_name.encode()) == 0
+            if not self.started:
+                _logger.warning('Failed to start the meters JACK client')
+
+        if not self.started:
+            self.buffer.close()
+            self.buffer = None
+        return self.started
+
+    def stop(self):
+        if self._lib is None or not self.started:
+            return
+
+        self._lib.meters_stop()
+        self.started = False
+        self.slots.clear()
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+    def add_port(self, port_name: str) -> bool:
+        if not self.started:
+            return False
+        if port_name in self.slots:
+            return True
+
+        slot = self._lib.meters_add_port(port_name.encode())
+        if slot < 0:
+            _logger.info(f'Impossible to monitor {port_name}')
+            return False
+
+        self.slots[port_name] = slot
+        return True
+
+    def remove_port(self, port_name: str):
+        slot = self.slots.pop(port_name, None)
+        if slot is not None and self.started:
+            self._lib.meters_remove_port(slot)
 
-ccb = CDLL(str(Path(__file__).parent / 'process_cb.so'))
+    def read(self, port_name: str) -> Optional[tuple[float, float]]:
+        '''return (peak, rms) since the last read,
+        or None if no period has been processed since.'''
+        slot = self.slots.get(port_name)
+        if slot is None or self.buffer is None:
+            return None
+        return self.buffer.read_slot(slot)
 
-process_cb = ccb.process_cb
-process_cb.argtypes = [c_ulong, c_void_p]
-process_cb.restype = c_int
+    def read_all(self) -> dict[str, Optional[tuple[float, float]]]:
+        '''read() for all monitored ports'''
+        if self.buffer is None:
+            return {}
+        port_names = list(self.slots)
+        return dict(zip(port_names, self.buffer.read_slots(
+            [self.slots[p] for p in port_names])))
@@ -1,25 +1,257 @@
+/* Peak and RMS meters on JACK audio ports.
+ *
+ * The meters use their own JACK client, with one input port
+ * per monitored port. The process callback only reads the port buffers
+ * and writes the meter slots: no allocation, no lock, no print.
+ *
+ * The slots are in a buffer given by the reader (an mmap in Python),
+ * so the reader can see all of them without any copy or call.
+ * Each slot is written by the process thread only, with a sequence
+ * counter (odd while writing) so the reader can check its values are
+ * consistent. The reader only writes `ack`, the sequence of the values
+ * it has read. While the published sequence is not acknowledged,
+ * the process thread merges the new periods with the published values,
+ * so a peak is never lost, even if the reader acknowledges late
+ * (it is then read twice). No read-modify-write is needed on the
+ * reader side, which can be Python on the mmap. */
+
+#include <math.h>
+#include <stdatomic.h>
 #include <stdio.h>
-#include <stdint.h>
-#include <jack/jack.h>
+#include <string.h>
+#include <time.h>
+
+#include "process_cb.h"
+
+static jack_client_t *client = NULL;
+static jack_port_t *_Atomic ports[METERS_MAX_PORTS];
+static meter_slot_t *slots = NULL;
+static int max_slots = 0;
+static atomic_int n_slots = 0;
+static atomic_uint cycles = 0;
+
+/* published values, only used by the process thread */
+static float peaks[METERS_MAX_PORTS];
+static double sum_squares[METERS_MAX_PORTS];
+static uint32_t frames_count[METERS_MAX_PORTS];
+
+int process_cb(jack_nframes_t frames, void *arg){
+    (void)arg;
+    int n = atomic_load_explicit(&n_slots, memory_order_acquire);
+
+    for (int i = 0; i < n; i++){
+        jack_port_t *port = atomic_load_explicit(
+            &ports[i], memory_order_acquire);
+        if (port == NULL){
+            continue;
+        }
+
+        const jack_default_audio_sample_t *in =
+            jack_port_get_buffer(port, frames);
+        if (in == NULL){
+            continue;
+        }
+
+        float peak = 0.0f;
+        double period_sum = 0.0;
+        for (jack_nframes_t j = 0; j < frames; j++){
+            float abs_sample = fabsf(in[j]);
+            if (abs_sample > peak){
+                peak = abs_sample;
+            }
+            period_sum += (double)in[j] * in[j];
+        }
 
-jack_port_t *main_port;
+        meter_slot_t *slot = &slots[i];
+        uint32_t seq = __atomic_load_n(&slot->seq, __ATOMIC_RELAXED);
 
-void set_jack_port(jack_port_t *jack_port){
-    main_port = jack_port;
+        if (__atomic_load_n(&slot->ack, __ATOMIC_ACQUIRE) == seq){
+            /* published values have been read */
+            peaks[i] = peak;
+            sum_squares[i] = period_sum;
+            frames_count[i] = frames;
+        } else {
+            if (peak > peaks[i]){
+                peaks[i] = peak;
+            }
+            sum_squares[i] += period_sum;
+            frames_count[i] += frames;
+        }
+
+        __atomic_store_n(&slot->seq, seq + 1, __ATOMIC_RELAXED);
+        __atomic_thread_fence(__ATOMIC_RELEASE);
+        slot->peak = peaks[i];
+        slot->mean_square = (float)(sum_squares[i] / frames_count[i]);
+
+        __atomic_store_n(&slot->seq, seq + 2, __ATOMIC_RELEASE);
+    }
+
+    atomic_fetch_add_explicit(&cycles, 1, memory_order_release);
+    return 0;
 }
 
-int process_cb(uint32_t frames, void *arg){
-    // printf("framesas %lu\n", frames);
-    if (main_port != NULL){ return 0;}
+int meters_set_buffer(void *buffer, int buffer_slots){
+    /* the buffer must contain buffer_slots meter_slot_t,
+       and stay valid until meters_stop(). */
+    if (client != NULL || buffer == NULL || buffer_slots <= 0){
+        return -1;
+    }
+
+    slots = buffer;
+    max_slots = buffer_slots < METERS_MAX_PORTS ?
+        buffer_slots : METERS_MAX_PORTS;
+    memset(slots, 0, sizeof(meter_slot_t) * max_slots);
+    return 0;
+}
 
-    jack_default_audio_sample_t *in;
+int meters_start(const char *client_name){
+    if (client != NULL){
+        return 0;
+    }
+    if (slots == NULL){
+        return -1;
+    }
 
-    in = jack_port_get_buffer(main_port, frames);
+    jack_status_t status;
+    client = jack_client_open(client_name, JackNoStartServer, &status);
+    if (client == NULL){
+        return -1;
+    }
 
-    for (int i=0; i < frames; i++){
-        printf("todou %d %.2f\n", i, in[i]);
+    for (int i = 0; i < METERS_MAX_PORTS; i++){
+        atomic_store(&ports[i], NULL);
     }
+    atomic_store(&n_slots, 0);
 
+    if (jack_set_process_callback(client, process_cb, NULL)
+            || jack_activate(client)){
+        jack_client_close(client);
+        client = NULL;
+        return -1;
+    }
     return 0;
- }
+}
 
+void meters_stop(void){
+    if (client == NULL){
+        return;
+    }
+
+    jack_deactivate(client);
+    jack_client_close(client);
+    client = NULL;
+
+    for (int i = 0; i < METERS_MAX_PORTS; i++){
+        atomic_store(&ports[i], NULL);
+    }
+    atomic_store(&n_slots, 0);
+    slots = NULL;
+    max_slots = 0;
+}
+
+static void wait_cycles(unsigned n_cycles){
+    /* wait for the process thread to end the cycles
+       which could still use a removed port */
+    unsigned start = atomic_load_explicit(&cycles, memory_order_acquire);
+    struct timespec one_ms = {0, 1000000};
+
+    for (int i = 0; i < 200; i++){
+        if (atomic_load_explicit(&cycles, memory_order_acquire) - start
+                >= n_cycles){
+            return;
+        }
+        nanosleep(&one_ms, NULL);
+    }
+}
+
+int meters_add_port(const char *source_port_name){
+    if (client == NULL){
+        return -1;
+    }
+
+    int slot_index = -1;
+    for (int i = 0; i < max_slots; i++){
+        if (atomic_load(&ports[i]) == NULL){
+            slot_index = i;
+            break;
+        }
+    }
+    if (slot_index < 0){
+        return -1;
+    }
+
+    char port_name[32];
+    snprintf(port_name, sizeof(port_name), "meter_%d", slot_index + 1);
+    jack_port_t *port = jack_port_register(
+        client, port_name, JACK_DEFAULT_AUDIO_TYPE, JackPortIsInput, 0);
+    if (port == NULL){
+        return -1;
+    }
+
+    /* the process thread does not use this slot yet */
+    meter_slot_t *slot = &slots[slot_index];
+    slot->peak = 0.0f;
+    slot->mean_square = 0.0f;
+    uint32_t seq = __atomic_load_n(&slot->seq, __ATOMIC_RELAXED);
+    __atomic_store_n(&slot->ack, seq, __ATOMIC_RELAXED);
+
+    atomic_store_explicit(&ports[slot_index], port, memory_order_release);
+    if (slot_index >= atomic_load(&n_slots)){
+        atomic_store_explicit(&n_slots, slot_index + 1, memory_order_release);
+    }
+
+    if (jack_connect(client, source_port_name, jack_port_name(port))){
+        meters_remove_port(slot_index);
+        return -1;
+    }
+    return slot_index;
+}
+
+void meters_remove_port(int slot_index){
+    if (client == NULL || slot_index < 0 || slot_index >= max_slots){
+        return;
+    }
+
+    jack_port_t *port = atomic_exchange(&ports[slot_index], NULL);
+    if (port == NULL){
+        return;
+    }
+
+    wait_cycles(2);
+    jack_port_unregister(client, port);
+}
+
+int meters_read(int slot_index, float *peak, float *rms){
+    /* read one slot, for readers without access to the buffer.
+       returns 0 if values have been read,
+       1 if no period has been processed since the last read,
+       -1 if the slot is not used */
+    if (slot_index < 0 || slot_index >= max_slots
+            || atomic_load(&ports[slot_index]) == NULL){
+        return -1;
+    }
+
+    meter_slot_t *slot = &slots[slot_index];
+    uint32_t seq_before, seq_after;
+    float slot_peak, mean_square;
+
+    do {
+        seq_before = __atomic_load_n(&slot->seq, __ATOMIC_ACQUIRE);
+        slot_peak = slot->peak;
+        mean_square = slot->mean_square;
+        __atomic_thread_fence(__ATOMIC_ACQUIRE);
+        seq_after = __atomic_load_n(&slot->seq, __ATOMIC_RELAXED);
+    } while (seq_before != seq_after || (seq_before & 1));
+
+    if (__atomic_load_n(&slot->ack, __ATOMIC_RELAXED) == seq_before){
+        /* nothing new since the last read */
+        return 1;
+    }
+
+    /* values published after seq_before contain these ones,
+       until the process thread sees this ack */
+    __atomic_store_n(&slot->ack, seq_before, __ATOMIC_RELEASE);
+    *peak = slot_peak;
+    *rms = sqrtf(mean_square);
+    return 0;
+}
@@ -0,0 +1,27 @@
+#ifndef PROCESS_CB_H
+#define PROCESS_CB_H
+
+#include <stdint.h>
+#include <jack/jack.h>
+
+#define METERS_MAX_PORTS 256
+
+/* one slot in the shared buffer, 16 bytes, read as 4 x 32 bits */
+typedef struct {
+    uint32_t seq;          /* odd while the process thread writes */
+    uint32_t ack;          /* last seq read, written by the reader only */
+    float peak;            /* peak since the last acknowledged seq */
+    float mean_square;     /* mean square since the last acknowledged seq */
+} meter_slot_t;
+
+int process_cb(jack_nframes_t frames, void *arg);
+
+int meters_set_buffer(void *buffer, int n_slots);
+
+int meters_start(const char *client_name);
+void meters_stop(void);
+int meters_add_port(const char *source_port_name);
+void meters_remove_port(int slot);
+int meters_read(int slot, float *peak, float *rms);
+
+#endif
@@ -1,14 +1,46 @@
+from typing import TYPE_CHECKING
+
+from qtpy.QtWidgets import QApplication, QLabel, QLineEdit
+
 from patchbay import FilterFrame, PatchGraphicsView
 from patchbay.widgets.tool_bar import PatchbayToolBar
 
+if TYPE_CHECKING:
+    from patchance_pb_manager import PatchancePatchbayManager
+
+
+_translate = QApplication.translate
+
 
 class PatchFilterFrame(FilterFrame):
-    ...
+    def set_patchbay_manager(self, mng: 'PatchancePatchbayManager'):
+        super().set_patchbay_manager(mng)
+        self._search_index = mng.search_index
+
+        # counts of the search index, shown at each keystroke.
+        # The boxes are filtered with the same index,
+        # see PatchancePatchbayManager.filter_groups.
+        self._matches_label = QLabel(self)
+        self.layout().addWidget(self._matches_label)
+
+        line_edit = self.findChild(QLineEdit)
+        if line_edit is not None:
+            line_edit.textChanged.connect(self._update_matches_label)
+
+    def _update_matches_label(self, text: str):
+        if not text:
+            self._matches_label.clear()
+            return
+
+        n_groups, n_ports = self._search_index.count_matches(text)
+        self._matches_label.setText(
+            _translate('filter_frame', '%i groups, %i ports')
+            % (n_groups, n_ports))
+
 
-        
 class PatchanceGraphicsView(PatchGraphicsView):
     ...
 
 
 class PatchanceToolBar(PatchbayToolBar):
-    ...
\ No newline at end of file
+    ...
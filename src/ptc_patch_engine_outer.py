@@ -1,31 +1,53 @@
+from typing import Optional
+
 from patch_engine import PatchEngineOuter
 from patshared import TransportPosition
 
+from engine_loop import PatchTimeoutObj
+from event_coalescer import PatchEventCoalescer
 from patchance_pb_manager import PatchancePatchbayManager
+from transport_tracker import TransportTracker
 
 class PtcPatchEngineOuter(PatchEngineOuter):
-    def __init__(self, mng: PatchancePatchbayManager):
+    def __init__(self, mng: PatchancePatchbayManager,
+                 timeout_obj: Optional[PatchTimeoutObj]=None):
         super().__init__()
         self.mng = mng
+        self.timeout_obj = timeout_obj
+        self.transport_tracker = TransportTracker(mng, timeout_obj)
+        self.coalescer = PatchEventCoalescer(mng)
+        'graph events are applied once per pass of patch events'
+        if timeout_obj is not None:
+            timeout_obj.patch_events_processed.connect(
+                self.patch_events_processed)
+
+    def patch_events_processed(self):
+        self.coalescer.flush()
+        self.mng.patch_events_processed()
         
     def associate_client_name_and_uuid(self, client_name: str, uuid: int):
-        self.mng.set_group_uuid_from_name(client_name, uuid)
+        self.coalescer.client_uuid_associated(client_name, uuid)
     def port_added(self, pname: str, ptype: int, pflags: int, puuid: int):
-        self.mng.add_port(pname, ptype, pflags, puuid)
+        self.coalescer.port_added(pname, ptype, pflags, puuid)
     def port_renamed(self, ex_name: str, new_name: str, uuid=0):
-        self.mng.rename_port(ex_name, new_name, uuid=uuid)
+        self.coalescer.port_renamed(ex_name, new_name, uuid)
     def port_removed(self, port_name: str):
-        self.mng.remove_port(port_name)
+        self.coalescer.port_removed(port_name)
     def metadata_updated(self, uuid: int, key: str, value: str):
-        self.mng.metadata_update(uuid, key, value)
+        if self.mng.pretty_exporter.is_echo(uuid, key, value):
+            return
+        self.coalescer.metadata_updated(uuid, key, value)
     def connection_added(self, connection: tuple[str, str]):
-        self.mng.add_connection(*connection)
+        self.coalescer.connection_added(*connection)
     def connection_removed(self, connection: tuple[str, str]):
-        self.mng.remove_connection(*connection)
+        self.coalescer.connection_removed(*connection)
     def server_stopped(self):
+        self.coalescer.flush()
         self.mng.server_stopped()
     def send_transport_position(self, tpos: TransportPosition):
-        self.mng.refresh_transport(tpos)
+        if self.timeout_obj is not None:
+            self.timeout_obj.set_transport_rolling(tpos.rolling)
+        self.transport_tracker.position_received(tpos)
     def send_dsp_load(self, dsp_load: int):
         self.mng.set_dsp_load(dsp_load)
     def send_one_xrun(self):
@@ -35,10 +57,11 @@ class PtcPatchEngineOuter(PatchEngineOuter):
     def send_samplerate(self, samplerate: int):
         self.mng.sample_rate_changed(samplerate)
     def send_pretty_names_locked(self, locked: bool):
-        if self.mng.options_dialog is not None:
-            self.mng.options_dialog.set_pretty_names_locked(locked)
+        self.mng.set_pretty_names_locked(locked)
     def send_server_lose(self):
+        self.coalescer.flush()
         self.mng.server_lose()
     def server_restarted(self):
+        self.coalescer.flush()
         self.mng.server_restarted()
     def make_one_shot_act(self, one_shot_act: str):...
\ No newline at end of file
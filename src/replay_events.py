@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+'''Replay a log recorded with `patchance --record-events FILE`
+in the patchbay, with a fake engine, without JACK and without display.
+
+Usage: replay_events.py LOG_FILE [--config-dir DIR] [--realtime]
+                                 [--json OUT_FILE] [--top N]
+
+Reports the time spent for each kind of event, the slowest events,
+and the total wall time. The layout files of the config dir
+(default is none) are copied in a temporary dir.'''
+
+import argparse
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import offscreen_patchbay
+
+
+def _replay(log_path: Path, config_dir: Path, realtime: bool) -> dict:
+    from qtpy.QtWidgets import QApplication
+
+    from engine_recorder import read_event_log, tpos_from_json
+    from fake_engine import FakePatchEngine
+    from ptc_patch_engine_outer import PtcPatchEngineOuter
+
+    engine = FakePatchEngine()
+    main = offscreen_patchbay.build(engine, config_dir)
+    mng = main.patchbay_manager
+    outer = PtcPatchEngineOuter(mng)
+
+    # method: [count, total_time, max_time]
+    stats = dict[str, list]()
+    slowest = list[tuple[float, int, str]]()
+    n_events = 0
+
+    def account(method: str, duration: float, line_num: int):
+        stat = stats.setdefault(method, [0, 0.0, 0.0])
+        stat[0] += 1
+        stat[1] += duration
+        stat[2] = max(stat[2], duration)
+        slowest.append((duration, line_num, method))
+
+    start = time.perf_counter()
+
+    for line_num, (time_ms, method, args) in enumerate(
+            read_event_log(log_path), start=2):
+        if realtime:
+            while (time.perf_counter() - start) * 1000 < time_ms:
+                QApplication.processEvents()
+                time.sleep(0.001)
+
+        n_events += 1
+        engine.apply_event(method, args)
+
+        t0 = time.perf_counter()
+        match method:
+            case 'pass':
+                outer.patch_events_processed()
+                QApplication.processEvents()
+            case 'connection_added'|'connection_removed':
+                getattr(outer, method)(tuple(args[0]))
+            case 'send_transport_position':
+                outer.send_transport_position(tpos_from_json(args[0]))
+            case 'server_restarted':
+                outer.server_restarted()
+            case _:
+                method_func = getattr(outer, method, None)
+                if method_func is None:
+                    sys.stderr.write(
+                        f'line {line_num}: unknown method {method}\n')
+                    continue
+                method_func(*args)
+        account(method, time.perf_counter() - t0, line_num)
+
+    t0 = time.perf_counter()
+    outer.patch_events_processed()
+    QApplication.processEvents()
+    account('final pass', time.perf_counter() - t0, 0)
+
+    total = time.perf_counter() - start
+    main.close()
+
+    slowest.sort(reverse=True)
+    return {'log': str(log_path),
+            'events': n_events,
+            'wall_time': total,
+            'methods': {m: {'count': s[0], 'total': s[1],
+                            'mean': s[1] / s[0], 'max': s[2]}
+                        for m, s in stats.items()},
+            'slowest': [{'line': l, 'method': m, 'time': d}
+                        for d, l, m in slowest[:100]],
+            'engine_requests': engine.requests}
+
+
+def _print_report(result: dict, top: int):
+    lines = [f"{result['events']} events replayed "
+             f"in {result['wall_time'] * 1000:.1f} ms",
+             '',
+             f"{'method'.ljust(32)} {'count':>7} {'total ms':>10} "
+             f"{'mean ms':>9} {'max ms':>9}"]
+
+    methods = sorted(result['methods'].items(),
+                     key=lambda item: item[1]['total'], reverse=True)
+    for method, stat in methods:
+        lines.append(
+            f"{method.ljust(32)} {stat['count']:7d} "
+            f"{stat['total'] * 1000:10.2f} {stat['mean'] * 1000:9.3f} "
+            f"{stat['max'] * 1000:9.3f}")
+
+    lines += ['', f'slowest events:']
+    for event in result['slowest'][:top]:
+        lines.append(f"  line {event['line']:7d}  "
+                     f"{event['method'].ljust(32)} "
+                     f"{event['time'] * 1000:9.3f} ms")
+
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replay a Patchance engine events log')
+    parser.add_argument('log_file', type=Path)
+    parser.add_argument('--config-dir', type=Path,
+                        help='use the layout files of this config dir')
+    parser.add_argument('--realtime', action='store_true',
+                        help='respect the recorded delays between events')
+    parser.add_argument('--json', type=Path, dest='json_file',
+                        help='write the full results in this JSON file')
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of slowest events to print')
+    args = parser.parse_args()
+
+    offscreen_patchbay.prepare()
+    config_dir = offscreen_patchbay.copy_config_dir(args.config_dir)
+    try:
+        result = _replay(
+            args.log_file.expanduser(), config_dir, args.realtime)
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+    if args.json_file is not None:
+        with open(args.json_file, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    _print_report(result, args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+'''N-gram index of the searchable names of the patchbay:
+group and port names, JACK pretty names and custom names.
+
+Each text is indexed with all its substrings of 1 to 3 characters,
+so a search only verifies the entries containing all the n-grams
+of the pattern, and costs about the number of matches,
+not the size of the graph.'''
+
+from typing import TYPE_CHECKING, Iterable
+
+from pretty_export import PRETTY_NAME_KEY
+
+if TYPE_CHECKING:
+    from patchance_pb_manager import PatchancePatchbayManager
+
+
+GRAM_MAX = 3
+
+
+def _grams(text: str) -> set[str]:
+    grams = set[str]()
+    for size in range(1, GRAM_MAX + 1):
+        for i in range(len(text) - size + 1):
+            grams.add(text[i:i + size])
+    return grams
+
+
+def _pattern_grams(pattern: str) -> set[str]:
+    size = min(GRAM_MAX, len(pattern))
+    return {pattern[i:i + size] for i in range(len(pattern) - size + 1)}
+
+
+class SearchIndex:
+    '''Entries are keyed by (group_name, port_name),
+    with an empty port_name for the group itself.'''
+
+    def __init__(self):
+        self._texts = dict[tuple[str, str], tuple[str, ...]]()
+        'lower case texts of each entry'
+        self._postings = dict[str, set[tuple[str, str]]]()
+        'entries containing each n-gram'
+        self._group_ports = dict[str, set[str]]()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def set_entry(self, group_name: str, port_name: str,
+                  texts: Iterable[str]):
+        key = (group_name, port_name)
+        new_texts = tuple(sorted({t.lower() for t in texts if t}))
+        old_texts = self._texts.get(key)
+        if old_texts == new_texts:
+            return
+
+        old_grams = set[str]()
+        for text in old_texts or ():
+            old_grams |= _grams(text)
+        new_grams = set[str]()
+        for text in new_texts:
+            new_grams |= _grams(text)
+
+        for gram in old_grams - new_grams:
+            posting = self._postings[gram]
+            posting.discard(key)
+            if not posting:
+                del self._postings[gram]
+        for gram in new_grams - old_grams:
+            self._postings.setdefault(gram, set()).add(key)
+
+        self._texts[key] = new_texts
+        if port_name:
+            self._group_ports.setdefault(group_name, set()).add(port_name)
+
+    def remove_entry(self, group_name: str, port_name: str):
+        key = (group_name, port_name)
+        texts = self._texts.pop(key, None)
+        if texts is None:
+            return
+
+        for text in texts:
+            for gram in _grams(text):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    continue
+                posting.discard(key)
+                if not posting:
+                    del self._postings[gram]
+
+        if port_name:
+            ports = self._group_ports.get(group_name)
+            if ports is not None:
+                ports.discard(port_name)
+                if not ports:
+                    del self._group_ports[group_name]
+
+    def has_ports(self, group_name: str) -> bool:
+        return group_name in self._group_ports
+
+    def clear(self):
+        self._texts.clear()
+        self._postings.clear()
+        self._group_ports.clear()
+
+    def _entry_matches(self, key: tuple[str, str], pattern: str) -> bool:
+        return any(pattern in text for text in self._texts.get(key, ()))
+
+    def search(self, pattern: str) -> list[tuple[str, str]]:
+        '''all the entries with a text containing pattern,
+        case insensitive.'''
+        pattern = pattern.lower()
+        if not pattern:
+            return []
+
+        postings = list[set[tuple[str, str]]]()
+        for gram in _pattern_grams(pattern):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return []
+            postings.append(posting)
+
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        if len(pattern) <= GRAM_MAX:
+            return list(candidates)
+
+        return [key for key in candidates
+                if self._entry_matches(key, pattern)]
+
+    def search_groups(self, pattern: str) -> set[str]:
+        '''names of the groups matching pattern,
+        in their own texts or in one of their ports.'''
+        return {group_name for group_name, _ in self.search(pattern)}
+
+    def group_matches(self, group_name: str, pattern: str) -> bool:
+        '''True if the group or one of its ports matches pattern,
+        checks only the entries of this group.'''
+        pattern = pattern.lower()
+        if self._entry_matches((group_name, ''), pattern):
+            return True
+        return any(self._entry_matches((group_name, port_name), pattern)
+                   for port_name in self._group_ports.get(group_name, ()))
+
+    def count_matches(self, pattern: str) -> tuple[int, int]:
+        '''return the numbers of (groups, ports) matching pattern.
+        A group matches if its name or one of its ports matches.'''
+        groups = set[str]()
+        n_ports = 0
+        for group_name, port_name in self.search(pattern):
+            groups.add(group_name)
+            if port_name:
+                n_ports += 1
+        return len(groups), n_ports
+
+
+class PatchbaySearchIndex(SearchIndex):
+    '''SearchIndex of the groups and ports of the manager,
+    updated from its graph, metadata and custom names changes.
+
+    Entries are keyed by the patchbay group name, which is not
+    always the JACK client name of the port: a2j and Midi-Bridge
+    ports are split in one group per device.'''
+
+    def __init__(self, mng: 'PatchancePatchbayManager'):
+        super().__init__()
+        self.mng = mng
+        self._uuids = dict[str, int]()
+        'uuid of each client and port name'
+        self._uuid_names = dict[int, str]()
+        'client or port name of each uuid'
+        self._pretty_names = dict[int, str]()
+        self._port_groups = dict[str, str]()
+        'group name of each port'
+
+    def _update_group(self, group_name: str):
+        self.set_entry(
+            group_name, '',
+            (group_name,
+             self.mng.custom_names.custom_group(group_name),
+             self._pretty_names.get(self._uuids.get(group_name, 0), '')))
+
+    def _update_port(self, port_name: str):
+        self.set_entry(
+            self._port_groups[port_name], port_name,
+            (port_name,
+             self.mng.custom_names.custom_port(port_name),
+             self._pretty_names.get(self._uuids.get(port_name, 0), '')))
+
+    def _set_uuid(self, name: str, uuid: int):
+        if uuid:
+            self._uuids[name] = uuid
+            self._uuid_names[uuid] = name
+
+    def port_added(self, port_name: str, uuid: int, group_name: str):
+        self._port_groups[port_name] = group_name
+        self._set_uuid(port_name, uuid)
+        self._update_port(port_name)
+        if (group_name, '') not in self._texts:
+            self._update_group(group_name)
+
+    def port_removed(self, port_name: str):
+        group_name = self._port_groups.pop(port_name, None)
+        uuid = self._uuids.pop(port_name, 0)
+        self._uuid_names.pop(uuid, None)
+        self._pretty_names.pop(uuid, None)
+        if group_name is None:
+            return
+
+        self.remove_entry(group_name, port_name)
+        if not self.has_ports(group_name):
+            self.remove_entry(group_name, '')
+
+    def port_renamed(self, ex_name: str, new_name: str, uuid: int,
+                     group_name: str):
+        uuid = uuid or self._uuids.get(ex_name, 0)
+        pretty_name = self._pretty_names.get(uuid)
+        self.port_removed(ex_name)
+        if pretty_name is not None:
+            self._pretty_names[uuid] = pretty_name
+        self.port_added(new_name, uuid, group_name)
+
+    def client_uuid_set(self, client_name: str, uuid: int):
+        self._set_uuid(client_name, uuid)
+        if (client_name, '') in self._texts:
+            self._update_group(client_name)
+
+    def metadata_changed(self, uuid: int, key: str, value: str):
+        if key != PRETTY_NAME_KEY:
+            return
+
+        if value:
+            self._pretty_names[uuid] = value
+        else:
+            self._pretty_names.pop(uuid, None)
+
+        name = self._uuid_names.get(uuid)
+        if name is not None:
+            self.custom_name_changed(name)
+
+    def custom_name_changed(self, name: str):
+        '''name is a group name or a full port name'''
+        group_name = self._port_groups.get(name)
+        if group_name is not None:
+            self._update_port(name)
+        elif (name, '') in self._texts:
+            self._update_group(name)
+
+    def clear(self):
+        super().clear()
+        self._uuids.clear()
+        self._uuid_names.clear()
+        self._pretty_names.clear()
+        self._port_groups.clear()
+
+    def rebuild(self):
+        '''index again all the groups and ports of the manager'''
+        self.clear()
+        pe = self.mng.pe
+        for uuid, key_dict in pe.metadatas.items():
+            pretty_name = key_dict.get(PRETTY_NAME_KEY)
+            if pretty_name:
+                self._pretty_names[uuid] = pretty_name
+        for client_name, uuid in pe.client_name_uuids.items():
+            self._set_uuid(client_name, uuid)
+        for group in self.mng.groups:
+            for port in group.ports:
+                self.port_added(port.full_name, port.uuid, group.name)
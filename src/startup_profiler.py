@@ -0,0 +1,78 @@
+'''Startup time profiling, enabled with --profile-startup.
+
+This module must not import Qt at module level,
+it is imported before the Qt API is chosen.'''
+
+import sys
+import time
+from typing import Optional
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.enabled = False
+        self._start = time.perf_counter()
+        self._last = self._start
+        self._phases = list[tuple[str, float]]()
+        self._awaited = set[str]()
+        self._paint_filter = None
+
+    def enable(self, start: Optional[float]=None):
+        self.enabled = True
+        if start is not None:
+            self._start = start
+            self._last = start
+
+    def mark(self, phase: str):
+        '''mark the end of a startup phase'''
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last))
+        self._last = now
+
+        if phase in self._awaited:
+            self._awaited.discard(phase)
+            if not self._awaited:
+                self.report()
+
+    def report_when_marked(self, *phases: str):
+        '''print the report once all these phases are marked'''
+        self._awaited.update(phases)
+
+    def watch_first_paint(self, widget):
+        '''mark the "first paint" phase
+        when `widget` is painted for the first time.'''
+        if not self.enabled:
+            return
+
+        from qtpy.QtCore import QObject, QEvent
+
+        profiler = self
+
+        class FirstPaintFilter(QObject):
+            def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+                if event.type() == QEvent.Type.Paint:
+                    obj.removeEventFilter(self)
+                    profiler.mark('first paint')
+                return False
+
+        self._paint_filter = FirstPaintFilter()
+        widget.installEventFilter(self._paint_filter)
+
+    def report(self):
+        if not self.enabled:
+            return
+
+        total = sum(duration for _, duration in self._phases)
+        name_len = max([len(name) for name, _ in self._phases] + [5])
+        lines = ['Startup profile:']
+        for name, duration in self._phases:
+            lines.append(
+                f'  {name.ljust(name_len)} {duration * 1000:9.1f} ms')
+        lines.append(f'  {"total".ljust(name_len)} {total * 1000:9.1f} ms')
+        sys.stderr.write('\n'.join(lines) + '\n')
+
+
+profiler = StartupProfiler()
@@ -0,0 +1,114 @@
+import copy
+import dataclasses
+import time
+from typing import TYPE_CHECKING, Optional
+
+from qtpy.QtCore import QObject, QTimer
+
+from patshared import TransportPosition
+
+if TYPE_CHECKING:
+    from engine_loop import PatchTimeoutObj
+    from patchance_pb_manager import PatchancePatchbayManager
+
+
+INTERPOLATION_MS = 50
+'refresh interval of the clock while interpolated'
+DRIFT_TOLERANCE = 0.05
+'max difference in seconds between a received and an expected frame'
+
+
+def _tpos_values(tpos: TransportPosition) -> tuple:
+    if dataclasses.is_dataclass(tpos):
+        return dataclasses.astuple(tpos)
+    return tuple(vars(tpos).values())
+
+
+class TransportTracker(QObject):
+    '''Sends to the patchbay only the transport positions
+    which are not the expected ones.
+
+    When the transport is stopped, positions are sent only if they change.
+    When it rolls without BBT, the position is interpolated locally
+    from the frame rate, the engine is queried less often only to check
+    the drift and detect relocations. With BBT, bars and beats can not be
+    interpolated, so all the received positions are sent.'''
+
+    def __init__(self, mng: 'PatchancePatchbayManager',
+                 timeout_obj: Optional['PatchTimeoutObj']=None):
+        super().__init__()
+        self.mng = mng
+        self.timeout_obj = timeout_obj
+        self._last: Optional[TransportPosition] = None
+        self._last_values: tuple = ()
+        self._last_time = 0.0
+        self._interpolating = False
+        self._window_displayed = True
+        self._widgets_displayed = True
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(INTERPOLATION_MS)
+        self._timer.timeout.connect(self._send_interpolated)
+
+    def _expected_frame(self, now: float) -> int:
+        return self._last.frame + int(
+            (now - self._last_time) * self.mng.pe.samplerate)
+
+    def _set_interpolating(self, interpolating: bool):
+        if interpolating is self._interpolating:
+            return
+
+        self._interpolating = interpolating
+        self._update_timer()
+
+        if self.timeout_obj is not None:
+            self.timeout_obj.set_transport_interpolated(interpolating)
+
+    def position_received(self, tpos: TransportPosition):
+        now = time.monotonic()
+        values = _tpos_values(tpos)
+
+        if self._last is not None and tpos.rolling is self._last.rolling:
+            if not tpos.rolling:
+                if values == self._last_values:
+                    return
+            elif not tpos.valid_bbt and self._interpolating:
+                drift = abs(tpos.frame - self._expected_frame(now))
+                if drift < DRIFT_TOLERANCE * self.mng.pe.samplerate:
+                    return
+
+        self._last = tpos
+        self._last_values = values
+        self._last_time = now
+        self._set_interpolating(tpos.rolling and not tpos.valid_bbt)
+        self.mng.refresh_transport(tpos)
+
+    def _send_interpolated(self):
+        if self._last is None or not self._last.rolling:
+            self._set_interpolating(False)
+            return
+
+        tpos = copy.copy(self._last)
+        tpos.frame = self._expected_frame(time.monotonic())
+        self.mng.refresh_transport(tpos)
+
+    def _update_timer(self):
+        # the interpolation timer runs only when the clock is visible
+        if (self._interpolating and self._window_displayed
+                and self._widgets_displayed):
+            if not self._timer.isActive():
+                self._timer.start()
+        else:
+            self._timer.stop()
+
+    def set_window_displayed(self, displayed: bool):
+        self._window_displayed = displayed
+        self._update_timer()
+
+    def set_widgets_displayed(self, displayed: bool):
+        '''when the transport widgets are hidden, the engine
+        is not queried at all.'''
+        self._widgets_displayed = displayed
+        self._update_timer()
+        if self.timeout_obj is not None:
+            self.timeout_obj.set_transport_displayed(displayed)
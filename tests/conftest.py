@@ -0,0 +1,60 @@
+import os
+import sys
+from pathlib import Path
+from typing import Iterable
+
+import pytest
+
+# modules of patchance are flat in src/, as when it runs
+sys.path.insert(0, str(Path(__file__).parents[1] / 'src'))
+
+# src/qt_api.py is written by 'make', tests using Qt
+# need any binding available for qtpy.
+os.environ.setdefault('QT_API', 'pyqt6')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+JACK_PORT_IS_INPUT = 0x1
+JACK_PORT_IS_OUTPUT = 0x2
+
+
+def require_offscreen():
+    '''skip the test without HoustonPatchbay and the files
+    built by 'make', else prepare the offscreen patchbay.'''
+    for module in ('qtpy.QtWidgets', 'qt_api', 'patshared',
+                   'patch_engine', 'resources_rc'):
+        pytest.importorskip(module)
+
+    import offscreen_patchbay
+    offscreen_patchbay.prepare()
+    pytest.importorskip('patchbay')
+
+
+@pytest.fixture
+def offscreen_main(tmp_path):
+    '''patchance main window and patchbay manager on a fake engine,
+    as used by the benchmarks.'''
+    require_offscreen()
+
+    import offscreen_patchbay
+    from fake_engine import FakePatchEngine
+
+    config_dir = tmp_path / 'config'
+    config_dir.mkdir()
+    main = offscreen_patchbay.build(FakePatchEngine(), config_dir, show=False)
+    yield main
+    main.close()
+
+
+def graph_state(ports: list[tuple[str, bool]],
+                connections: Iterable[tuple[str, str]]=()) -> dict:
+    '''fake engine state with (port_name, is_output) audio ports,
+    uuids are given in order.'''
+    from patshared import PortType
+
+    return {'ports': [[name, int(PortType.AUDIO_JACK),
+                       JACK_PORT_IS_OUTPUT if is_output
+                       else JACK_PORT_IS_INPUT, uuid]
+                      for uuid, (name, is_output)
+                      in enumerate(ports, start=1)],
+            'connections': [list(c) for c in connections]}
@@ -0,0 +1,130 @@
+from auto_connect import AutoConnectRule, AutoConnector
+
+AUDIO = 1
+MIDI = 2
+IS_INPUT = 0x1
+IS_OUTPUT = 0x2
+
+
+def make_connector(*rules: AutoConnectRule) \
+        -> tuple[AutoConnector, list[tuple[str, str]]]:
+    connected = list[tuple[str, str]]()
+    connector = AutoConnector(list(rules), connected.extend)
+    connector.connections = lambda: connected
+    return connector, connected
+
+
+def add_ports(connector: AutoConnector, names: list[str],
+              flags: int, port_type=AUDIO):
+    for name in names:
+        connector.port_added(name, port_type, flags)
+
+
+SYSTEM_PLAYBACKS = [f'system:playback_{i}' for i in range(1, 11)]
+MASTER_OUTS = ['Ardour:Master/audio_out 1', 'Ardour:Master/audio_out 2']
+
+
+def test_glob_to_glob_pairs_ports_by_index():
+    connector, connected = make_connector(
+        AutoConnectRule('Ardour:Master/audio_out *', 'system:playback_*'))
+    add_ports(connector, SYSTEM_PLAYBACKS, IS_INPUT)
+    connector.resolve()
+    assert connected == []
+
+    add_ports(connector, MASTER_OUTS, IS_OUTPUT)
+    connector.resolve()
+    assert connected == [
+        ('Ardour:Master/audio_out 1', 'system:playback_1'),
+        ('Ardour:Master/audio_out 2', 'system:playback_2')]
+
+
+def test_pairs_use_natural_order():
+    connector, connected = make_connector(
+        AutoConnectRule('src:out_*', 'system:playback_*'))
+    add_ports(connector, SYSTEM_PLAYBACKS, IS_INPUT)
+    add_ports(connector, [f'src:out_{i}' for i in range(10, 0, -1)],
+              IS_OUTPUT)
+    connector.resolve()
+    assert sorted(connected) == sorted(
+        (f'src:out_{i}', f'system:playback_{i}') for i in range(1, 11))
+
+
+def test_ports_added_in_several_passes():
+    connector, connected = make_connector(
+        AutoConnectRule('Ardour:Master/audio_out *', 'system:playback_*'))
+    add_ports(connector, MASTER_OUTS[:1], IS_OUTPUT)
+    connector.resolve()
+    add_ports(connector, SYSTEM_PLAYBACKS[:2], IS_INPUT)
+    connector.resolve()
+    add_ports(connector, MASTER_OUTS[1:], IS_OUTPUT)
+    connector.resolve()
+    assert connected == [
+        ('Ardour:Master/audio_out 1', 'system:playback_1'),
+        ('Ardour:Master/audio_out 2', 'system:playback_2')]
+
+
+def test_literal_side_connects_all_the_other_side():
+    connector, connected = make_connector(
+        AutoConnectRule('Keyboard:midi_capture', 'Ardour:MIDI in*'))
+    add_ports(connector, ['Ardour:MIDI in 1', 'Ardour:MIDI in 2'],
+              IS_INPUT, MIDI)
+    add_ports(connector, ['Keyboard:midi_capture'], IS_OUTPUT, MIDI)
+    connector.resolve()
+    assert sorted(connected) == [
+        ('Keyboard:midi_capture', 'Ardour:MIDI in 1'),
+        ('Keyboard:midi_capture', 'Ardour:MIDI in 2')]
+
+
+def test_only_ports_of_the_same_type_are_paired():
+    connector, connected = make_connector(
+        AutoConnectRule('src:*', 'dst:*'))
+    add_ports(connector, ['dst:midi_in'], IS_INPUT, MIDI)
+    add_ports(connector, ['dst:audio_in'], IS_INPUT, AUDIO)
+    add_ports(connector, ['src:audio_out'], IS_OUTPUT, AUDIO)
+    connector.resolve()
+    assert connected == [('src:audio_out', 'dst:audio_in')]
+
+
+def test_removed_and_renamed_ports():
+    connector, connected = make_connector(
+        AutoConnectRule('src:out_*', 'dst:in_*'))
+    add_ports(connector, ['dst:in_1', 'dst:in_2'], IS_INPUT)
+    add_ports(connector, ['src:out_1'], IS_OUTPUT)
+    connector.port_removed('dst:in_1')
+    connector.resolve()
+    assert connected == [('src:out_1', 'dst:in_2')]
+
+    connector.port_renamed('dst:in_2', 'dst:other')
+    add_ports(connector, ['src:out_2'], IS_OUTPUT)
+    connector.resolve()
+    assert connected == [('src:out_1', 'dst:in_2')]
+
+
+def test_existing_connections_are_not_requested_again():
+    connector, connected = make_connector(
+        AutoConnectRule('src:out_*', 'dst:in_*'))
+    add_ports(connector, ['dst:in_1'], IS_INPUT)
+    add_ports(connector, ['src:out_1'], IS_OUTPUT)
+    connector.resolve()
+    connector.resolve_all()
+    assert connected == [('src:out_1', 'dst:in_1')]
+
+
+def test_set_rules_matches_known_ports():
+    connector, connected = make_connector()
+    add_ports(connector, ['dst:in_1'], IS_INPUT)
+    add_ports(connector, ['src:out_1'], IS_OUTPUT)
+    connector.set_rules([AutoConnectRule('src:out_*', 'dst:in_*')])
+    connector.resolve_all()
+    assert connected == [('src:out_1', 'dst:in_1')]
+
+
+def test_disabled_and_regex_rules():
+    connector, connected = make_connector(
+        AutoConnectRule('src:out_1', 'dst:in_1', enabled=False),
+        AutoConnectRule(r'^src:out_(\d+)$', r'^dst:in_\d+$', regex=True))
+    add_ports(connector, ['dst:in_1', 'dst:in_2'], IS_INPUT)
+    add_ports(connector, ['src:out_1', 'src:out_2'], IS_OUTPUT)
+    connector.resolve()
+    assert sorted(connected) == [
+        ('src:out_1', 'dst:in_1'), ('src:out_2', 'dst:in_2')]
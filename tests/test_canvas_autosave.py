@@ -0,0 +1,45 @@
+import json
+
+from conftest import graph_state
+
+
+def move_group(mng, group_name: str, x: int, y: int):
+    from patchbay.patchcanvas.init_values import CallbackAct
+    from patshared import PortMode
+    from patchance_pb_manager import PatchanceCallbacker
+
+    group = next(g for g in mng.groups if g.name == group_name)
+    PatchanceCallbacker(mng).receive(
+        CallbackAct.GROUP_MOVE, (group.group_id, PortMode.OUTPUT, x, y))
+
+
+def test_canvas_move_saves_the_memory(offscreen_main):
+    mng = offscreen_main.patchbay_manager
+    mng.pe.set_state(graph_state([('synth:out', True)]))
+    mng.server_restarted()
+    assert not mng._autosave_timer.isActive()
+
+    move_group(mng, 'synth', 120, 80)
+    assert mng._autosave_timer.isActive()
+
+    mng._autosave()
+    mng._memory_writer.wait()
+    memory = json.loads(
+        (offscreen_main.config_dir / 'canvas.json').read_text())
+    assert 'synth' in json.dumps(memory['views'])
+
+
+def test_unchanged_memory_is_not_written_again(offscreen_main):
+    from patchance_pb_manager import MEMORY_FILE
+
+    mng = offscreen_main.patchbay_manager
+    mng.save_positions()
+    memory_path = offscreen_main.config_dir / MEMORY_FILE
+    first_mtime = memory_path.stat().st_mtime_ns
+
+    # as at next startup
+    mng._load_memory_file()
+    mng.save_positions()
+
+    assert memory_path.stat().st_mtime_ns == first_mtime
+    assert not (offscreen_main.config_dir / f'{MEMORY_FILE}.1').exists()
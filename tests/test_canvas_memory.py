@@ -0,0 +1,85 @@
+from canvas_memory import (
+    BACKUP_GENERATIONS, MemoryFileWriter, backup_path,
+    memory_file_candidates)
+
+
+def test_write_replaces_the_file_without_temporary_left(tmp_path):
+    path = tmp_path / 'canvas.json'
+    writer = MemoryFileWriter(path)
+    writer.write('first')
+    writer.write('second')
+
+    assert path.read_text() == 'second'
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'canvas.json']
+
+
+def test_backups_rotate_once_per_session(tmp_path):
+    path = tmp_path / 'canvas.json'
+    for session in range(BACKUP_GENERATIONS + 2):
+        writer = MemoryFileWriter(path)
+        writer.write(f'session {session}')
+        writer.write(f'session {session} again')
+
+    last = BACKUP_GENERATIONS + 1
+    assert path.read_text() == f'session {last} again'
+    for generation in range(1, BACKUP_GENERATIONS + 1):
+        assert backup_path(path, generation).read_text() \
+            == f'session {last - generation} again'
+    assert not backup_path(path, BACKUP_GENERATIONS + 1).exists()
+
+
+def test_backup_is_not_modified_by_next_writes(tmp_path):
+    path = tmp_path / 'canvas.json'
+    path.write_text('previous session')
+    writer = MemoryFileWriter(path)
+    writer.write('one')
+    writer.write('two')
+
+    assert backup_path(path, 1).read_text() == 'previous session'
+
+
+def test_same_contents_are_not_written_again(tmp_path):
+    path = tmp_path / 'canvas.json'
+    writer = MemoryFileWriter(path)
+    writer.write('contents')
+    path.write_text('changed outside')
+    writer.write('contents')
+
+    assert path.read_text() == 'changed outside'
+
+
+def test_thread_writes_the_last_contents(tmp_path):
+    path = tmp_path / 'canvas.json'
+    writer = MemoryFileWriter(path)
+    for i in range(20):
+        writer.write_in_thread(f'contents {i}')
+    writer.wait()
+    assert path.read_text() == 'contents 19'
+
+    # a synchronous write wins over pending thread contents
+    writer.write_in_thread('from thread')
+    writer.write('from write')
+    writer.wait()
+    assert path.read_text() == 'from write'
+
+
+def test_candidates_order(tmp_path):
+    path = tmp_path / 'canvas.json'
+    assert memory_file_candidates(path) == [
+        path] + [backup_path(path, i)
+                 for i in range(1, BACKUP_GENERATIONS + 1)]
+
+
+def test_unchanged_file_contents_are_not_written_nor_backed_up(tmp_path):
+    path = tmp_path / 'canvas.json'
+    path.write_text('loaded')
+    writer = MemoryFileWriter(path)
+    writer.set_file_contents('loaded')
+    writer.write('loaded')
+
+    assert not backup_path(path, 1).exists()
+
+    writer.write('changed')
+    assert path.read_text() == 'changed'
+    assert backup_path(path, 1).read_text() == 'loaded'
@@ -0,0 +1,60 @@
+import re
+
+import pytest
+
+pytest.importorskip('qtpy.QtWidgets')
+
+from qtpy.QtCore import QRectF, Qt
+from qtpy.QtGui import QImage
+from qtpy.QtWidgets import QApplication, QGraphicsScene
+
+import canvas_render
+from conftest import graph_state, require_offscreen
+
+
+@pytest.fixture(scope='module')
+def app():
+    app = QApplication.instance()
+    if app is None:
+        return QApplication([])
+    if not isinstance(app, QApplication):
+        pytest.skip('a QCoreApplication is already running')
+    return app
+
+
+def test_png_rendered_strip_by_strip(app, tmp_path, monkeypatch):
+    scene = QGraphicsScene()
+    scene.setBackgroundBrush(Qt.GlobalColor.white)
+    scene.addRect(QRectF(0, 90, 50, 20), brush=Qt.GlobalColor.red)
+    # 4 strips of 32 rows
+    monkeypatch.setattr(canvas_render, 'STRIP_BYTES', 64 * 4 * 32)
+
+    path = tmp_path / 'scene.png'
+    canvas_render.render_png(scene, QRectF(0, 0, 64, 120), path)
+
+    image = QImage(str(path))
+    assert (image.width(), image.height()) == (64, 120)
+    assert image.pixelColor(10, 100).red() == 255
+    assert image.pixelColor(10, 100).green() == 0
+    assert image.pixelColor(10, 10).green() == 255
+
+
+def test_unsupported_format(tmp_path):
+    assert canvas_render.render(tmp_path / 'canvas.jpg', tmp_path) == 1
+
+
+def test_render_drains_the_engine_queue(tmp_path):
+    require_offscreen()
+    from fake_engine import FakePatchEngine
+
+    engine = FakePatchEngine()
+    engine.set_state(graph_state(
+        [('synth:out', True), ('system:playback_1', False)],
+        [('synth:out', 'system:playback_1')]))
+    out_path = tmp_path / 'canvas.svg'
+
+    assert canvas_render.render_engine(engine, out_path, tmp_path) == 0
+
+    view_box = re.search(r'viewBox="0 0 (\d+) (\d+)"', out_path.read_text())
+    # an empty canvas is only the margins
+    assert int(view_box.group(1)) > 4 * canvas_render.MARGIN
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+
+from conftest import graph_state
+from connection_batch import ConnectionBatch
+
+
+def test_changes_held_until_complete():
+    batch = ConnectionBatch()
+    batch.add_pairs([('a:out', 'b:in'), ('a:out', 'c:in')])
+    assert not batch.complete
+
+    assert batch.hold(True, 'a:out', 'b:in')
+    assert not batch.hold(True, 'x:out', 'b:in')
+    assert not batch.complete
+    assert batch.hold(False, 'a:out', 'c:in')
+    assert batch.complete
+
+    assert batch.take() == [(True, 'a:out', 'b:in'),
+                            (False, 'a:out', 'c:in')]
+    assert not batch.has_changes
+
+
+def test_failed_pairs_complete_the_batch():
+    batch = ConnectionBatch()
+    batch.add_pairs([('a:out', 'b:in'), ('a:out', 'c:in')])
+    batch.hold(True, 'a:out', 'b:in')
+    batch.pairs_failed([('a:out', 'c:in')])
+
+    assert batch.complete
+    assert batch.take() == [(True, 'a:out', 'b:in')]
+
+
+def test_change_after_a_held_one_conflicts():
+    batch = ConnectionBatch()
+    batch.add_pairs([('a:out', 'b:in'), ('a:out', 'c:in')])
+    assert not batch.conflicts('a:out', 'b:in')
+
+    batch.hold(True, 'a:out', 'b:in')
+    # the same connection removed out of the batch
+    assert batch.conflicts('a:out', 'b:in')
+    assert not batch.conflicts('a:out', 'c:in')
+    assert not batch.conflicts('x:out', 'b:in')
+
+
+def test_take_before_complete_ends_the_batch():
+    batch = ConnectionBatch()
+    batch.add_pairs([('a:out', 'b:in'), ('a:out', 'c:in')])
+    batch.hold(True, 'a:out', 'b:in')
+
+    assert batch.take() == [(True, 'a:out', 'b:in')]
+    assert batch.complete
+    assert not batch.conflicts('a:out', 'b:in')
+    assert not batch.hold(True, 'a:out', 'c:in')
+
+
+GRAPH_PORTS = [('synth:out', True), ('reverb:in', False),
+               ('delay:in', False), ('system:playback_1', False)]
+
+
+def batch_manager(offscreen_main):
+    mng = offscreen_main.patchbay_manager
+    mng.pe.set_state(graph_state(GRAPH_PORTS))
+    mng.server_restarted()
+    requests = list[tuple]()
+    mng.engine_worker = SimpleNamespace(
+        connect_many=lambda pairs: requests.append(('connect', pairs)),
+        change_connections=lambda *args: requests.append(('change', args)))
+    mng.requests = requests
+    return mng
+
+
+def canvas_connections(mng) -> set[tuple[str, str]]:
+    return {(c.port_out.full_name, c.port_in.full_name)
+            for c in mng.connections}
+
+
+def test_batch_drawn_when_all_notified(offscreen_main):
+    mng = batch_manager(offscreen_main)
+    pairs = [('synth:out', 'reverb:in'), ('synth:out', 'delay:in')]
+    mng.connect_ports_many(pairs)
+    assert mng.requests == [('connect', pairs)]
+    assert mng._batch_timer.isActive()
+
+    mng.add_connection(*pairs[0])
+    assert canvas_connections(mng) == set()
+
+    # a connection out of the batch is not held
+    mng.add_connection('synth:out', 'system:playback_1')
+    assert canvas_connections(mng) == {('synth:out', 'system:playback_1')}
+
+    mng.add_connection(*pairs[1])
+    mng.patch_events_processed()
+    assert canvas_connections(mng) == set(pairs) | {
+        ('synth:out', 'system:playback_1')}
+    assert not mng._batch_timer.isActive()
+
+
+def test_batch_drawn_at_max_duration(offscreen_main):
+    from patchance_pb_manager import BATCH_MAX_DURATION
+
+    mng = batch_manager(offscreen_main)
+    pairs = [('synth:out', 'reverb:in'), ('synth:out', 'delay:in')]
+    mng.connect_ports_many(pairs)
+    assert mng._batch_timer.remainingTime() <= BATCH_MAX_DURATION
+
+    mng.add_connection(*pairs[0])
+    mng.patch_events_processed()
+    assert canvas_connections(mng) == set()
+
+    mng._batch_timer.timeout.emit()
+    assert canvas_connections(mng) == {pairs[0]}
+
+    # the late notification is drawn at once
+    mng.add_connection(*pairs[1])
+    assert canvas_connections(mng) == set(pairs)
+
+
+def test_change_after_a_held_one_ends_the_batch(offscreen_main):
+    mng = batch_manager(offscreen_main)
+    pairs = [('synth:out', 'reverb:in'), ('synth:out', 'delay:in')]
+    mng.connect_ports_many(pairs)
+
+    mng.add_connection(*pairs[0])
+    mng.remove_connection(*pairs[0])
+    assert canvas_connections(mng) == set()
+    assert mng._batch.complete
+    assert not mng._batch_timer.isActive()
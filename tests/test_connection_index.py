@@ -0,0 +1,165 @@
+from types import SimpleNamespace
+
+import pytest
+
+from connection_index import ConnectionIndex, ConnectionList
+
+
+def make_conn(connection_id: int, port_out_name: str, port_in_name: str):
+    return SimpleNamespace(
+        connection_id=connection_id,
+        port_out=SimpleNamespace(full_name=port_out_name),
+        port_in=SimpleNamespace(full_name=port_in_name))
+
+
+def make_index(*conns) -> tuple[ConnectionIndex, SimpleNamespace]:
+    mng = SimpleNamespace(connections=ConnectionList(conns))
+    return ConnectionIndex(mng), mng
+
+
+def test_lookups_build_the_index():
+    conn = make_conn(1, 'a:out', 'b:in')
+    index, mng = make_index(conn)
+
+    assert index.from_id(1) is conn
+    assert index.from_names('a:out', 'b:in') is conn
+    assert index.from_names('b:in', 'a:out') is None
+
+
+def test_added_and_removed_incrementally():
+    index, mng = make_index()
+    assert index.from_id(1) is None
+
+    conn = make_conn(1, 'a:out', 'b:in')
+    mng.connections.append(conn)
+    index.connection_added('a:out', 'b:in')
+    assert index._valid
+    assert index.from_names('a:out', 'b:in') is conn
+
+    mng.connections.remove(conn)
+    index.connection_removed('a:out', 'b:in')
+    assert index._valid
+    assert index.from_id(1) is None
+
+
+def test_unexpected_last_connection_invalidates():
+    index, mng = make_index()
+    index.from_id(0)
+    conn = make_conn(1, 'a:out', 'b:in')
+    mng.connections.append(conn)
+    index.connection_added('x:out', 'y:in')
+
+    assert not index._valid
+    assert index.from_id(1) is conn
+
+
+def test_connections_changed_by_the_manager_are_seen():
+    conn_1 = make_conn(1, 'a:out', 'b:in')
+    conn_2 = make_conn(2, 'a:out', 'c:in')
+    index, mng = make_index(conn_1, conn_2)
+    assert index.from_id(2) is conn_2
+
+    # removed with its port, without connection_removed
+    mng.connections.remove(conn_2)
+    assert index.from_id(2) is None
+
+    # renamed port, same number of connections
+    conn_1.port_in.full_name = 'b:renamed'
+    index.invalidate()
+    assert index.from_names('a:out', 'b:renamed') is conn_1
+    assert index.from_names('a:out', 'b:in') is None
+
+
+def test_connections_of_a_port():
+    conn_1 = make_conn(1, 'a:out', 'b:in')
+    conn_2 = make_conn(2, 'a:out', 'c:in')
+    index, mng = make_index(conn_1, conn_2)
+
+    assert {c.connection_id for c in index.from_port('a:out')} == {1, 2}
+    assert index.from_port('c:in') == [conn_2]
+    assert index.from_port('d:in') == []
+
+
+def test_port_renamed_keeps_the_index_valid():
+    conn_1 = make_conn(1, 'a:out', 'b:in')
+    conn_2 = make_conn(2, 'a:out', 'c:in')
+    index, mng = make_index(conn_1, conn_2)
+    index.from_id(1)
+
+    conn_1.port_out.full_name = 'a:renamed'
+    conn_2.port_out.full_name = 'a:renamed'
+    index.port_renamed('a:out', 'a:renamed')
+
+    assert index._valid
+    assert index.from_names('a:renamed', 'b:in') is conn_1
+    assert index.from_names('a:out', 'b:in') is None
+    assert index.from_port('a:out') == []
+    assert index.from_port('c:in') == [conn_2]
+    assert index.from_names('a:renamed', 'c:in') is conn_2
+
+
+def test_port_removed_with_its_connections():
+    conn_1 = make_conn(1, 'a:out', 'b:in')
+    conn_2 = make_conn(2, 'a:out', 'c:in')
+    conn_3 = make_conn(3, 'd:out', 'c:in')
+    index, mng = make_index(conn_1, conn_2, conn_3)
+    index.from_id(1)
+
+    mng.connections.remove(conn_1)
+    mng.connections.remove(conn_2)
+    index.port_removed('a:out')
+
+    assert index._valid
+    assert index.from_id(1) is None
+    assert index.from_port('b:in') == []
+    assert index.from_port('c:in') == [conn_3]
+    assert index._by_id == {3: conn_3}
+
+
+def test_connection_list():
+    conn_1 = make_conn(1, 'a:out', 'b:in')
+    conn_2 = make_conn(2, 'a:out', 'c:in')
+    conns = ConnectionList()
+    assert not conns
+
+    conns.append(conn_1)
+    conns.append(conn_2)
+    assert len(conns) == 2
+    assert conns[-1] is conn_2
+    assert conns[0] is conn_1
+    assert conn_2 in conns
+    assert list(reversed(conns)) == [conn_2, conn_1]
+
+    # removal while iterating
+    for conn in conns:
+        conns.remove(conn)
+    assert list(conns) == []
+    assert conn_1 not in conns
+
+    with pytest.raises(ValueError):
+        conns.remove(conn_1)
+
+
+def test_manager_keeps_the_index_with_the_ports(offscreen_main):
+    from conftest import graph_state
+
+    mng = offscreen_main.patchbay_manager
+    mng.pe.set_state(graph_state(
+        [('a:out', True), ('b:in', False), ('c:in', False)],
+        [('a:out', 'b:in'), ('a:out', 'c:in')]))
+    mng.server_restarted()
+    assert isinstance(mng.connections, ConnectionList)
+    assert len(mng.connections) == 2
+
+    mng.remove_connection('a:out', 'c:in')
+    assert mng.get_connection_from_names('a:out', 'c:in') is None
+    assert len(mng.connections) == 1
+
+    mng.rename_port('a:out', 'a:renamed')
+    conn = mng.get_connection_from_names('a:renamed', 'b:in')
+    assert conn is not None and conn in mng.connections
+    assert mng.connection_index._valid
+
+    mng.remove_port('b:in')
+    assert mng.get_connection_from_names('a:renamed', 'b:in') is None
+    assert not mng.connections
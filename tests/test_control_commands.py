@@ -0,0 +1,152 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from auto_connect import RULES_FILE, AutoConnector
+from control_commands import ControlCommands, read_request
+from layout_store import SETTINGS_FILE, read_custom_names
+
+AUDIO = 1
+IS_INPUT = 0x1
+IS_OUTPUT = 0x2
+
+
+class FakeCustomNames:
+    def __init__(self):
+        self.groups = dict[str, str]()
+        self.ports = dict[str, str]()
+
+    def custom_port(self, name: str) -> str:
+        return self.ports.get(name, '')
+
+    def save_port(self, name: str, custom_name: str):
+        self.ports[name] = custom_name
+
+    def save_group(self, name: str, custom_name: str):
+        self.groups[name] = custom_name
+
+    def to_json(self) -> dict:
+        return {'groups': dict(self.groups), 'ports': dict(self.ports)}
+
+
+class FakeEngine:
+    def __init__(self):
+        self.ports = [
+            SimpleNamespace(name='synth:out', type=AUDIO,
+                            flags=IS_OUTPUT, uuid=1),
+            SimpleNamespace(name='system:playback_1', type=AUDIO,
+                            flags=IS_INPUT, uuid=2)]
+        self.connections = list[tuple[str, str]]()
+        self.jack_running = True
+        self.custom_names = FakeCustomNames()
+        self.pretty_names = list[tuple[str, str]]()
+
+    def connect_ports(self, port_out_name: str, port_in_name: str,
+                      disconnect=False):
+        if port_in_name not in {p.name for p in self.ports}:
+            raise ValueError(f'no port {port_in_name}')
+        if disconnect:
+            self.connections.remove((port_out_name, port_in_name))
+        else:
+            self.connections.append((port_out_name, port_in_name))
+
+    def write_port_pretty_name(self, port_name: str, pretty_name: str):
+        self.pretty_names.append((port_name, pretty_name))
+
+
+@pytest.fixture
+def commands(tmp_path):
+    # custom names are written in the sqlite store, without patshared
+    (tmp_path / SETTINGS_FILE).write_text(
+        '[Canvas]\nmemory_backend=sqlite\n')
+    pe = FakeEngine()
+    auto_connector = AutoConnector([], pe.connections.extend)
+    auto_connector.connections = lambda: pe.connections
+    return ControlCommands(pe, auto_connector, tmp_path)
+
+
+def test_read_request():
+    assert read_request('{"cmd": "list-ports", "id": 3}') == {
+        'cmd': 'list-ports', 'id': 3}
+    assert read_request('{"cmd": ') is None
+    assert read_request('not json') is None
+    assert read_request('["cmd", "list-ports"]') is None
+    assert read_request('12') is None
+
+
+def test_list_ports_and_connections(commands):
+    commands.pe.custom_names.ports['synth:out'] = 'Synth'
+    response = commands.handle_request({'cmd': 'list-ports'})
+    assert response['ok']
+    assert response['ports'][0] == {
+        'name': 'synth:out', 'type': '1', 'flags': IS_OUTPUT,
+        'uuid': 1, 'custom_name': 'Synth'}
+
+    commands.pe.connections.append(('synth:out', 'system:playback_1'))
+    assert commands.handle_request({'cmd': 'list-connections'}) == {
+        'ok': True, 'connections': [['synth:out', 'system:playback_1']]}
+
+
+def test_connect_and_disconnect(commands):
+    pair = ['synth:out', 'system:playback_1']
+    assert commands.handle_request(
+        {'cmd': 'connect', 'connections': [pair]}) == {'ok': True}
+    assert commands.pe.connections == [tuple(pair)]
+
+    assert commands.handle_request(
+        {'cmd': 'disconnect', 'out': pair[0], 'in': pair[1]}) == {'ok': True}
+    assert commands.pe.connections == []
+
+
+def test_connect_failures(commands):
+    response = commands.handle_request(
+        {'cmd': 'connect', 'connections': [
+            ['synth:out', 'system:playback_1'], ['synth:out', 'nowhere'],
+            ['not a pair']]})
+    assert response == {'ok': False, 'error': 'connect failed',
+                        'failed': [['synth:out', 'nowhere'], ['not a pair']]}
+
+    assert commands.handle_request({'cmd': 'connect'}) == {
+        'ok': False, 'error': 'missing connections'}
+
+    commands.pe.jack_running = False
+    assert commands.handle_request(
+        {'cmd': 'connect', 'connections': []}) == {
+            'ok': False, 'error': 'JACK is not running'}
+
+
+def test_rename_saves_the_custom_names(commands):
+    assert commands.handle_request(
+        {'cmd': 'rename', 'port': 'synth:out', 'name': 'Lead',
+         'jack': True}) == {'ok': True}
+    assert commands.handle_request(
+        {'cmd': 'rename', 'group': 'synth', 'name': 'Synth'}) == {'ok': True}
+
+    assert commands.pe.pretty_names == [('synth:out', 'Lead')]
+    assert read_custom_names(commands.config_dir) == {
+        'groups': {'synth': 'Synth'}, 'ports': {'synth:out': 'Lead'}}
+
+    assert commands.handle_request(
+        {'cmd': 'rename', 'name': 'Nothing'}) == {
+            'ok': False, 'error': 'missing port or group'}
+    assert commands.handle_request(
+        {'cmd': 'rename', 'port': 'synth:out', 'name': 3}) == {
+            'ok': False, 'error': 'name must be a string'}
+
+
+def test_reload_rules_applies_them(commands):
+    for port in commands.pe.ports:
+        commands.auto_connector.port_added(port.name, port.type, port.flags)
+    (commands.config_dir / RULES_FILE).write_text(json.dumps(
+        {'rules': [{'out': 'synth:out', 'in': 'system:playback_*'}]}))
+
+    assert commands.handle_request({'cmd': 'reload-rules'}) == {'ok': True}
+    assert commands.pe.connections == [('synth:out', 'system:playback_1')]
+
+
+def test_unknown_command(commands):
+    assert commands.handle_request({'cmd': 'explode'}) == {
+        'ok': False, 'error': 'unknown command explode'}
+    assert commands.handle_request({}) == {
+        'ok': False, 'error': 'unknown command None'}
@@ -0,0 +1,176 @@
+import csv
+import io
+import math
+
+import dsp_history
+from dsp_history import (
+    COARSE_PERIOD, FINE_SIZE, HISTORY_FILE, XRUNS_SIZE, DspHistory, _Ring,
+    export_csv)
+
+
+def test_ring_keeps_the_last_items_in_order():
+    ring = _Ring(3, 'd')
+    for value in range(5):
+        ring.append(value)
+
+    assert ring.count == 3
+    assert [item[0] for item in ring.items()] == [2.0, 3.0, 4.0]
+    assert [item[0] for item in ring.items(2)] == [3.0, 4.0]
+    assert [item[0] for item in ring.items(10)] == [2.0, 3.0, 4.0]
+
+    ring.clear()
+    assert list(ring.items()) == []
+
+
+def test_fine_history_is_bounded():
+    history = DspHistory()
+    for i in range(FINE_SIZE + 10):
+        history.add_dsp_load(float(i % 100), now=1000.0 + i * 0.2)
+
+    assert history.fine.count == FINE_SIZE
+    assert history.last_dsp_loads(3) == [7.0, 8.0, 9.0]
+
+
+def test_coarse_buckets_per_minute():
+    history = DspHistory()
+    start = 600.0
+    history.add_dsp_load(10.0, now=start)
+    history.add_dsp_load(30.0, now=start + 1)
+    history.add_dsp_load(20.0, now=start + 2)
+    # next minute closes the first bucket
+    history.add_dsp_load(50.0, now=start + COARSE_PERIOD)
+
+    assert list(history.coarse.items()) == [(start, 10.0, 30.0, 20.0)]
+
+
+def test_save_writes_the_open_bucket(tmp_path):
+    history = DspHistory()
+    start = 600.0
+    history.add_dsp_load(10.0, now=start)
+    history.add_dsp_load(30.0, now=start + 1)
+    path = tmp_path / HISTORY_FILE
+    history.save(path)
+
+    loaded = DspHistory()
+    assert loaded.load(path)
+    assert list(loaded.coarse.items()) == [(start, 10.0, 30.0, 20.0)]
+
+    # the bucket stays open, and is not written twice
+    history.add_dsp_load(50.0, now=start + 2)
+    history.save(path)
+    history.add_dsp_load(0.0, now=start + COARSE_PERIOD)
+    assert list(history.coarse.items()) == [(start, 10.0, 50.0, 30.0)]
+
+
+def test_bucket_continues_after_load(tmp_path):
+    history = DspHistory()
+    start = 600.0
+    history.add_dsp_load(10.0, now=start)
+    history.add_dsp_load(30.0, now=start + 1)
+    path = tmp_path / HISTORY_FILE
+    history.save(path)
+
+    loaded = DspHistory()
+    assert loaded.load(path)
+    loaded.add_dsp_load(50.0, now=start + 2)
+    loaded.flush()
+    assert list(loaded.coarse.items()) == [(start, 10.0, 50.0, 30.0)]
+
+
+def test_stop_closes_the_bucket_and_marks_the_gap():
+    history = DspHistory()
+    start = 600.0
+    history.add_dsp_load(10.0, now=start)
+    history.add_dsp_load(20.0, now=start + 1)
+    history.add_stop(now=start + 2)
+    history.add_stop(now=start + 3)
+
+    assert list(history.coarse.items()) == [(start, 10.0, 20.0, 15.0)]
+    assert history.fine.count == 3
+    assert math.isnan(next(history.fine.items(1))[1])
+    assert history.last_dsp_loads(3) == [10.0, 20.0]
+
+    # JACK restarts hours later
+    history.add_dsp_load(40.0, now=start + 3 * 3600)
+    history.add_dsp_load(60.0, now=start + 3 * 3600 + COARSE_PERIOD)
+    assert list(history.coarse.items()) == [
+        (start, 10.0, 20.0, 15.0),
+        (start + 3 * 3600, 40.0, 40.0, 40.0)]
+
+
+def test_xruns_since_reads_only_recent_xruns():
+    history = DspHistory()
+    for i in range(XRUNS_SIZE + 5):
+        history.add_xrun(now=float(i))
+
+    assert history.xruns_since(XRUNS_SIZE + 2) == [
+        float(XRUNS_SIZE + 2), float(XRUNS_SIZE + 3),
+        float(XRUNS_SIZE + 4)]
+    assert history.xruns_since(XRUNS_SIZE + 10) == []
+    assert len(history.xruns_since(0.0)) == XRUNS_SIZE
+
+
+def test_save_and_load(tmp_path):
+    history = DspHistory()
+    for i in range(10):
+        history.add_dsp_load(float(i), now=1200.0 + i * 20)
+    history.add_xrun(now=1250.0)
+    path = tmp_path / HISTORY_FILE
+    history.save(path)
+
+    loaded = DspHistory()
+    assert loaded.load(path)
+    assert list(loaded.fine.items()) == list(history.fine.items())
+    assert list(loaded.coarse.items()) == list(history.coarse.items())
+    assert loaded.xruns_since(0.0) == [1250.0]
+    assert not list(tmp_path.glob('.*.tmp'))
+
+
+def test_load_rejects_other_files(tmp_path):
+    history = DspHistory()
+    assert not history.load(tmp_path / 'missing.bin')
+
+    path = tmp_path / HISTORY_FILE
+    path.write_bytes(b'not a history')
+    assert not history.load(path)
+    assert history.fine.count == 0
+
+
+def test_load_rejects_other_sizes(tmp_path, monkeypatch):
+    path = tmp_path / HISTORY_FILE
+    DspHistory().save(path)
+
+    monkeypatch.setattr(dsp_history, 'FINE_SIZE', FINE_SIZE + 1)
+    assert not DspHistory().load(path)
+
+
+def test_export_csv(tmp_path):
+    history = DspHistory()
+    history.add_dsp_load(12.5, now=600.0)
+    history.add_dsp_load(13.5, now=600.0 + COARSE_PERIOD)
+    history.add_xrun(now=630.0)
+    history.save(tmp_path / HISTORY_FILE)
+
+    out_path = tmp_path / 'history.csv'
+    export_csv(tmp_path, str(out_path))
+    rows = list(csv.reader(io.StringIO(out_path.read_text())))
+
+    assert rows[0] == ['time', 'kind', 'dsp', 'dsp_min', 'dsp_max']
+    assert [row[1] for row in rows[1:]] == [
+        'minute', 'minute', 'sample', 'sample', 'xrun']
+    assert rows[1][2:] == ['12.50', '12.50', '12.50']
+    # the current minute is saved too
+    assert rows[2][2:] == ['13.50', '13.50', '13.50']
+
+
+def test_export_csv_with_stops(tmp_path):
+    history = DspHistory()
+    history.add_dsp_load(12.5, now=600.0)
+    history.add_stop(now=601.0)
+    history.add_dsp_load(13.5, now=700.0)
+
+    out = io.StringIO()
+    history.write_csv(out)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert [row[1:3] for row in rows[1:] if row[1] != 'minute'] == [
+        ['sample', '12.50'], ['stop', ''], ['sample', '13.50']]
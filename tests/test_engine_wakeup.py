@@ -0,0 +1,82 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from qtpy.QtCore import QCoreApplication
+
+import engine_wakeup
+from engine_wakeup import EngineWakeup
+
+
+@pytest.fixture(scope='module', autouse=True)
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+class EventQueue:
+    def __init__(self):
+        self.events = list[tuple]()
+
+    def add(self, *args):
+        self.events.append(args)
+
+
+def process_until(condition, timeout=1.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        QCoreApplication.processEvents()
+        time.sleep(0.005)
+
+
+def test_queued_events_wake_up_the_loop():
+    queue = EventQueue()
+    wakeup = EngineWakeup(SimpleNamespace(patch_event_queue=queue))
+    wakeups = []
+    wakeup.events_queued.connect(lambda: wakeups.append(1))
+
+    assert wakeup.install()
+    assert wakeup.install()
+    assert isinstance(queue, EventQueue)
+    assert 'add' not in vars(queue)
+
+    queue.add('port_added', 'system:capture_1')
+    queue.add('port_added', 'system:capture_2')
+    assert queue.events == [('port_added', 'system:capture_1'),
+                            ('port_added', 'system:capture_2')]
+
+    process_until(lambda: wakeups)
+    # one wakeup for the events queued before the loop runs
+    assert wakeups == [1]
+
+    wakeup.close()
+    assert type(queue) is EventQueue
+    assert not wakeup.installed
+
+
+def test_retained_events_are_processed_once_more(monkeypatch):
+    monkeypatch.setattr(engine_wakeup, 'RETAINED_EVENTS_DELAY', 20)
+    queue = EventQueue()
+    wakeup = EngineWakeup(SimpleNamespace(patch_event_queue=queue))
+    wakeups = []
+    wakeup.events_queued.connect(lambda: wakeups.append(1))
+    wakeup.install()
+
+    queue.add('port_added', 'system:capture_1')
+    process_until(lambda: len(wakeups) >= 2)
+    process_until(lambda: False, timeout=0.1)
+    assert wakeups == [1, 1]
+    wakeup.close()
+
+
+def test_install_fails_on_other_queues():
+    no_queue = EngineWakeup(SimpleNamespace())
+    assert not no_queue.install()
+    no_queue.close()
+
+    # builtin types can not change their class, events are then polled
+    builtin_queue = EngineWakeup(SimpleNamespace(patch_event_queue=set()))
+    assert not builtin_queue.install()
+    builtin_queue.close()
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from engine_worker import EngineAct, EngineRequest, EngineWorker
+
+
+class FakeWorkerClient:
+    def __init__(self, number: int, failing: set[tuple[str, str]]):
+        self.number = number
+        self.failing = failing
+        self.connections = list[tuple[str, str, bool]]()
+        self.closed = False
+
+    def connect_ports(self, port_out_name: str, port_in_name: str,
+                      disconnect=False):
+        if (port_out_name, port_in_name) in self.failing:
+            raise RuntimeError(f'cannot connect {port_out_name}')
+        self.connections.append((port_out_name, port_in_name, disconnect))
+
+    def write_group_pretty_name(self, client_name: str, pretty_name: str):
+        ...
+
+    def write_port_pretty_name(self, port_name: str, pretty_name: str):
+        ...
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def worker():
+    worker = EngineWorker(SimpleNamespace(jack_running=True))
+    worker.clients = list[FakeWorkerClient]()
+    worker.failing = set[tuple[str, str]]()
+
+    def open_client() -> FakeWorkerClient:
+        client = FakeWorkerClient(len(worker.clients), worker.failing)
+        worker.clients.append(client)
+        return client
+
+    worker.client_factory = open_client
+    worker.done = list[EngineRequest]()
+    worker.request_done.connect(worker.done.append)
+    return worker
+
+
+def run(worker: EngineWorker, *requests: EngineRequest):
+    '''execute the requests in this thread'''
+    for request in requests:
+        worker._queue.put(request)
+    worker._queue.put(None)
+    worker._run()
+
+
+def test_requests_use_one_client(worker):
+    run(worker,
+        EngineRequest(EngineAct.CONNECT, ('a:out', 'b:in')),
+        EngineRequest(EngineAct.DISCONNECT, ('a:out', 'c:in')))
+
+    assert len(worker.clients) == 1
+    assert worker.clients[0].connections == [
+        ('a:out', 'b:in', False), ('a:out', 'c:in', True)]
+    assert [r.error for r in worker.done] == ['', '']
+    # closed when the worker stops
+    assert worker.clients[0].closed
+
+
+def test_client_reopened_after_a_failed_request(worker):
+    worker.failing.add(('x:out', 'b:in'))
+    run(worker,
+        EngineRequest(EngineAct.CONNECT, ('x:out', 'b:in')),
+        EngineRequest(EngineAct.CONNECT, ('a:out', 'b:in')))
+
+    assert worker.done[0].error == 'cannot connect x:out'
+    assert len(worker.clients) == 2
+    assert worker.clients[0].closed
+    assert worker.clients[1].connections == [('a:out', 'b:in', False)]
+
+
+def test_failed_pairs_of_a_batch(worker):
+    worker.failing.add(('x:out', 'b:in'))
+    run(worker,
+        EngineRequest(EngineAct.CHANGE_CONNECTIONS,
+                      ([('a:out', 'c:in')], [('x:out', 'b:in'),
+                                             ('a:out', 'b:in')])),
+        EngineRequest(EngineAct.CONNECT, ('d:out', 'b:in')))
+
+    request = worker.done[0]
+    assert request.failed_pairs == [('x:out', 'b:in')]
+    assert worker.clients[0].connections == [
+        ('a:out', 'c:in', True), ('a:out', 'b:in', False)]
+    # the batch had a failure, the next request has a new client
+    assert worker.clients[0].closed
+    assert worker.clients[1].connections == [('d:out', 'b:in', False)]
+
+
+def test_client_reopened_after_a_server_restart(worker):
+    run(worker, EngineRequest(EngineAct.CONNECT, ('a:out', 'b:in')))
+    assert len(worker.clients) == 1
+
+    worker.server_restarted()
+    run(worker, EngineRequest(EngineAct.CONNECT, ('a:out', 'b:in')))
+    assert len(worker.clients) == 2
+    assert worker.clients[1].connections == [('a:out', 'b:in', False)]
+
+
+def test_no_request_executed_while_jack_is_stopped(worker):
+    client = worker.client_factory()
+    worker._client = client
+    worker.pe.jack_running = False
+
+    run(worker, EngineRequest(EngineAct.CONNECT, ('a:out', 'c:in')))
+    assert worker.done[-1].error == 'JACK is not running'
+    assert client.closed
+    assert client.connections == []
+    assert len(worker.clients) == 1
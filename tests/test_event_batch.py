@@ -0,0 +1,83 @@
+from event_batch import EventBatch
+
+
+def test_connection_added_and_removed_is_dropped():
+    batch = EventBatch()
+    batch.connection_added('a:out', 'b:in')
+    batch.connection_removed('a:out', 'b:in')
+    assert batch.take() == []
+
+
+def test_connection_removed_and_added_is_dropped():
+    batch = EventBatch()
+    batch.connection_removed('a:out', 'b:in')
+    batch.connection_added('a:out', 'b:in')
+    assert batch.take() == []
+
+
+def test_connection_not_cancelled_across_port_removed_and_added():
+    batch = EventBatch()
+    batch.connection_removed('a:out', 'b:in')
+    batch.port_removed('a:out')
+    batch.port_added('a:out', 1, 2, 0)
+    batch.connection_added('a:out', 'b:in')
+
+    assert batch.take() == [
+        ('remove_connection', ('a:out', 'b:in')),
+        ('remove_port', ('a:out',)),
+        ('add_port', ('a:out', 1, 2, 0)),
+        ('add_connection', ('a:out', 'b:in'))]
+
+
+def test_connection_not_cancelled_across_input_port_removed():
+    batch = EventBatch()
+    batch.connection_added('a:out', 'b:in')
+    batch.port_removed('b:in')
+    batch.connection_removed('a:out', 'b:in')
+
+    assert [method for method, args in batch.take()] == [
+        'add_connection', 'remove_port', 'remove_connection']
+
+
+def test_connection_not_cancelled_across_port_renamed():
+    batch = EventBatch()
+    batch.connection_removed('a:out', 'b:in')
+    batch.port_renamed('a:out', 'a:other', 0)
+    batch.connection_added('a:out', 'b:in')
+
+    assert [method for method, args in batch.take()] == [
+        'remove_connection', 'rename_port', 'add_connection']
+
+
+def test_port_added_and_removed_drops_its_events():
+    batch = EventBatch()
+    batch.port_added('a:out', 1, 2, 12)
+    batch.connection_added('a:out', 'b:in')
+    batch.metadata_updated(12, 'key', 'value')
+    batch.metadata_updated(5, 'key', 'value')
+    batch.port_removed('a:out')
+
+    assert batch.take() == [('metadata_update', (5, 'key', 'value'))]
+
+
+def test_only_last_metadata_value_is_kept():
+    batch = EventBatch()
+    batch.metadata_updated(5, 'key', 'one')
+    batch.client_uuid_associated('client', 3)
+    batch.metadata_updated(5, 'key', 'two')
+
+    assert batch.take() == [
+        ('set_group_uuid_from_name', ('client', 3)),
+        ('metadata_update', (5, 'key', 'two'))]
+
+
+def test_take_starts_a_new_pass():
+    batch = EventBatch()
+    batch.connection_added('a:out', 'b:in')
+    assert len(batch) == 1
+    assert batch.take() == [('add_connection', ('a:out', 'b:in'))]
+    assert len(batch) == 0
+
+    # the removal can not cancel the addition of the previous pass
+    batch.connection_removed('a:out', 'b:in')
+    assert batch.take() == [('remove_connection', ('a:out', 'b:in'))]
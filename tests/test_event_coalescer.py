@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+pytest.importorskip('patchbay')
+
+from qtpy.QtCore import QCoreApplication
+
+import event_coalescer
+from event_coalescer import WINDOW_MS, PatchEventCoalescer
+
+
+@pytest.fixture(scope='module', autouse=True)
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+class FakeManager:
+    def __init__(self):
+        self.calls = list[tuple]()
+
+    def __getattr__(self, name: str):
+        return lambda *args: self.calls.append((name,) + args)
+
+
+@pytest.fixture
+def mng(monkeypatch) -> FakeManager:
+    mng = FakeManager()
+
+    @contextmanager
+    def optimize_it(manager):
+        manager.calls.append(('optimize_begin',))
+        yield
+        manager.calls.append(('optimize_end',))
+
+    monkeypatch.setattr(event_coalescer, 'CanvasOptimizeIt', optimize_it)
+    return mng
+
+
+def test_single_event_applied_without_optimize_block(mng):
+    coalescer = PatchEventCoalescer(mng)
+    coalescer.connection_added('a:out', 'b:in')
+    coalescer.flush()
+
+    assert mng.calls == [('add_connection', 'a:out', 'b:in')]
+
+
+def test_events_applied_in_one_block(mng):
+    coalescer = PatchEventCoalescer(mng)
+    coalescer.port_added('a:out', 1, 2, 0)
+    coalescer.connection_added('a:out', 'b:in')
+    coalescer.connection_added('x:out', 'y:in')
+    coalescer.connection_removed('x:out', 'y:in')
+    coalescer.flush()
+
+    assert mng.calls == [
+        ('optimize_begin',),
+        ('add_port', 'a:out', 1, 2, 0),
+        ('add_connection', 'a:out', 'b:in'),
+        ('optimize_end',),
+        ('apply_delayed_changes_now',)]
+
+
+def test_cancelled_events_apply_nothing(mng):
+    coalescer = PatchEventCoalescer(mng)
+    coalescer.port_added('a:out', 1, 2, 0)
+    coalescer.port_removed('a:out')
+    coalescer.flush()
+
+    assert mng.calls == []
+
+
+def test_events_out_of_a_pass_are_flushed_by_the_timer(mng):
+    coalescer = PatchEventCoalescer(mng)
+    coalescer.connection_added('a:out', 'b:in')
+    assert mng.calls == []
+
+    deadline = time.monotonic() + WINDOW_MS * 50 / 1000
+    while not mng.calls and time.monotonic() < deadline:
+        QCoreApplication.processEvents()
+        time.sleep(0.001)
+
+    assert mng.calls == [('add_connection', 'a:out', 'b:in')]
@@ -0,0 +1,58 @@
+import io
+import subprocess
+import sys
+from pathlib import Path
+
+import jack_cli
+from jack_cli import COMMANDS, JackCli, parse_commands, run
+
+SRC_DIR = Path(__file__).parents[1] / 'src'
+
+
+def test_commands_are_split_on_and():
+    assert parse_commands(
+        ['connect', 'a:out', 'b:in', '--and', 'list-ports', '--json']) \
+            == [['connect', 'a:out', 'b:in'], ['list-ports', '--json']]
+    assert parse_commands(['--and', 'list-ports', '--and']) \
+        == [['list-ports']]
+    assert parse_commands([]) == []
+
+
+def test_commands_are_read_from_stdin(monkeypatch):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(
+        '# comment\n'
+        'connect "Ardour:Master/audio_out 1" system:playback_1\n'
+        '\n'
+        '  list-connections\n'))
+    assert parse_commands(['-']) == [
+        ['connect', 'Ardour:Master/audio_out 1', 'system:playback_1'],
+        ['list-connections']]
+
+
+def test_usage(tmp_path: Path, capsys):
+    assert run(['help'], tmp_path) == 0
+    assert 'Usage' in capsys.readouterr().out
+    assert run([], tmp_path) == 1
+
+
+def test_unknown_command_fails_before_jack(tmp_path: Path, capsys,
+                                          monkeypatch):
+    monkeypatch.setattr(JackCli, '__init__', None)
+    assert run(['list-ports', '--and', 'frobnicate'], tmp_path) == 1
+    assert 'Unknown command frobnicate' in capsys.readouterr().err
+
+
+def test_each_command_has_its_method():
+    for name, method_name in COMMANDS.items():
+        assert callable(getattr(JackCli, method_name)), name
+        assert name in jack_cli.USAGE
+
+
+def test_cli_modules_do_not_import_qt():
+    code = ('import sys\n'
+            'import auto_connect, canvas_memory, dsp_history, jack_cli\n'
+            'import layout_store, patch_snapshots\n'
+            'qt = [m for m in sys.modules\n'
+            '      if m.split(".")[0] in ("qtpy", "PyQt5", "PyQt6")]\n'
+            'assert not qt, qt\n')
+    subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, check=True)
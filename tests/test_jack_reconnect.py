@@ -0,0 +1,141 @@
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from jack_reconnect import ReconnectBackoff
+
+
+def test_delays_grow_exponentially_up_to_max():
+    backoff = ReconnectBackoff(
+        first_delay=0.5, factor=2.0, max_delay=3.0, jitter=0.0)
+    delays = [backoff.failed('no server') for _ in range(5)]
+
+    assert delays == [0.5, 1.0, 2.0, 3.0, 3.0]
+    assert backoff.attempts == 5
+    assert backoff.last_error == 'no server'
+
+
+def test_jitter_stays_in_range():
+    backoff = ReconnectBackoff(first_delay=1.0, factor=1.0, jitter=0.2)
+    for _ in range(100):
+        assert 0.8 <= backoff.failed('') <= 1.2
+
+
+def test_reset_restarts_from_first_delay():
+    backoff = ReconnectBackoff(first_delay=0.5, jitter=0.0)
+    backoff.failed('error')
+    backoff.failed('error')
+    backoff.reset()
+
+    assert backoff.attempts == 0
+    assert backoff.last_error == ''
+    assert backoff.failed('error') == 0.5
+
+
+def test_jitter_does_not_exceed_max_delay():
+    backoff = ReconnectBackoff(
+        first_delay=1.0, factor=2.0, max_delay=4.0, jitter=0.5)
+    for _ in range(100):
+        assert backoff.failed('') <= 4.0
+
+
+def test_max_elapsed_covers_the_attempts(monkeypatch):
+    backoff = ReconnectBackoff(first_delay=0.5, factor=2.0,
+                               max_delay=1.5, jitter=0.2)
+    assert backoff.max_elapsed(1) == 0.0
+
+    # all the delays at the top of their jitter range
+    monkeypatch.setattr('random.uniform', lambda low, high: high)
+    elapsed = 0.0
+    for attempts in range(2, 6):
+        elapsed += backoff.failed('')
+        assert backoff.max_elapsed(attempts) == pytest.approx(elapsed)
+    assert elapsed == pytest.approx(0.6 + 1.2 + 1.5 + 1.5)
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = list[str]()
+
+    def deactivate(self):
+        self.calls.append('deactivate')
+
+    def close(self):
+        self.calls.append('close')
+
+
+class ReconnectEngine:
+    '''engine with a JACK server available after `n_failures` tries'''
+
+    def __init__(self, n_failures: int):
+        self.n_failures = n_failures
+        self.client = FakeClient()
+        self.jack_running = False
+        self.n_starts = 0
+
+    def start_jack_client(self):
+        self.n_starts += 1
+        if self.n_starts <= self.n_failures:
+            raise RuntimeError(f'no server {self.n_starts}')
+        self.client = FakeClient()
+        self.jack_running = True
+
+    def remember_dsp_load(self):
+        ...
+
+    def check_pretty_names_export(self):
+        ...
+
+    def send_transport_pos(self):
+        ...
+
+
+@pytest.fixture
+def timeout_obj():
+    pytest.importorskip('patch_engine')
+    from qtpy.QtCore import QCoreApplication
+    from engine_loop import PatchTimeoutObj
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    timeout_obj = PatchTimeoutObj(ReconnectEngine(2))
+    timeout_obj._backoff.jitter = 0.0
+    statuses = list[tuple[int, str]]()
+    timeout_obj.jack_reconnect_status.connect(
+        lambda attempts, error: statuses.append((attempts, error)))
+    timeout_obj.statuses = statuses
+    yield timeout_obj
+    timeout_obj._socket_watcher.stop()
+    del app
+
+
+def test_try_reconnect_counts_attempts_until_success(timeout_obj):
+    pe = timeout_obj.pe
+    old_client = pe.client
+    job = timeout_obj.scheduler.jobs['reconnect_jack']
+
+    timeout_obj._try_reconnect()
+    assert old_client.calls == ['deactivate', 'close']
+    assert timeout_obj._backoff.attempts == 1
+    assert timeout_obj.statuses == [(1, 'no server 1')]
+    first_due = job.next_due
+
+    timeout_obj._try_reconnect()
+    assert timeout_obj._backoff.attempts == 2
+    assert timeout_obj.statuses[-1] == (2, 'no server 2')
+    # the second delay is longer
+    assert job.next_due > first_due
+
+    timeout_obj._try_reconnect()
+    assert pe.jack_running
+    assert pe.n_starts == 3
+    assert timeout_obj._backoff.attempts == 0
+    assert timeout_obj.statuses[-1] == (0, '')
+    assert not timeout_obj._socket_watcher._watching
+
+
+def test_try_reconnect_at_first_attempt_sends_no_status(timeout_obj):
+    timeout_obj.pe.n_failures = 0
+    timeout_obj._try_reconnect()
+
+    assert timeout_obj.pe.jack_running
+    assert timeout_obj.statuses == []
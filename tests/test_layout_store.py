@@ -0,0 +1,150 @@
+import json
+import time
+
+from layout_store import (
+    JSON_FILE, SETTINGS_FILE, STORE_FILE, LayoutStore, memory_backend,
+    open_store, read_custom_names, read_memory, write_custom_names)
+
+
+def gpos(x: int, y: int) -> dict:
+    return {'boxes': {'OUTPUT': {'pos': f'{x}:{y}'}}, 'flags': 0}
+
+
+def make_memory() -> dict:
+    '''memory in the shape of ViewsDict.to_json_list(), with groups
+    under port types view, then port mode.'''
+    return {'views': [
+                {'index': 1, 'name': 'Main',
+                 'ALL': {'OUTPUT': {'system': gpos(10, 0),
+                                    'old': gpos(20, 0)},
+                         'INPUT': {'system': gpos(400, 0)}},
+                 'AUDIO': {'BOTH': {'old': gpos(30, 0)}}},
+                {'index': 2, 'name': 'Mixing',
+                 'ALL': {'OUTPUT': {'mixer': gpos(30, 0)}}}],
+            'portgroups': {'audio': []},
+            'custom_names': {'groups': {'system': 'Sound card'}}}
+
+
+def set_backend(config_dir, backend: str):
+    (config_dir / SETTINGS_FILE).write_text(
+        f'[Canvas]\nmemory_backend={backend}\n')
+
+
+def test_save_and_load_with_lazy_views(tmp_path):
+    store = LayoutStore(tmp_path / STORE_FILE)
+    store.save_memory(make_memory(), set())
+
+    memory, lazy_views = store.load_memory(eager_view=2)
+    assert lazy_views == {1}
+    assert memory['views'][0] == {'index': 1, 'name': 'Main'}
+    assert memory['views'][1]['ALL'] == {'OUTPUT': {'mixer': gpos(30, 0)}}
+    assert memory['custom_names'] == make_memory()['custom_names']
+
+    assert store.export_json() == make_memory()
+    store.close()
+
+
+def test_lazy_view_keeps_its_body(tmp_path):
+    store = LayoutStore(tmp_path / STORE_FILE)
+    store.save_memory(make_memory(), set())
+    memory, lazy_views = store.load_memory(eager_view=1)
+
+    memory['views'][1]['name'] = 'Renamed'
+    del memory['views'][0]['AUDIO']
+    store.save_memory(memory, lazy_views)
+
+    exported = store.export_json()
+    assert 'AUDIO' not in exported['views'][0]
+    assert exported['views'][1] == {
+        'index': 2, 'name': 'Renamed',
+        'ALL': {'OUTPUT': {'mixer': gpos(30, 0)}}}
+    store.close()
+
+
+def test_removed_view_is_deleted(tmp_path):
+    store = LayoutStore(tmp_path / STORE_FILE)
+    store.save_memory(make_memory(), set())
+    memory = make_memory()
+    del memory['views'][1]
+    store.save_memory(memory, set())
+
+    assert list(store.view_headers()) == [1]
+    store.close()
+
+
+def test_import_records_the_group_names(tmp_path):
+    store = LayoutStore(tmp_path / STORE_FILE)
+    store.import_json(make_memory())
+
+    assert {row[0] for row in store._conn.execute(
+        'SELECT name FROM groups_seen')} == {'system', 'old', 'mixer'}
+    store.close()
+
+
+def test_prune_removes_groups_not_seen(tmp_path):
+    store = LayoutStore(tmp_path / STORE_FILE)
+    store.import_json(make_memory())
+    store._conn.execute(
+        'UPDATE groups_seen SET last_seen=? WHERE name=?',
+        (time.time() - 100 * 86400, 'old'))
+
+    assert store.prune(30) == 1
+    view = store.load_view(1)
+    assert view['ALL'] == {'OUTPUT': {'system': gpos(10, 0)},
+                           'INPUT': {'system': gpos(400, 0)}}
+    assert view['AUDIO'] == {'BOTH': {}}
+    assert store.load_view(2) == make_memory()['views'][1]
+    assert store.prune(30) == 0
+    store.close()
+
+
+def test_open_store_imports_json_once(tmp_path):
+    (tmp_path / JSON_FILE).write_text(json.dumps(make_memory()))
+    store = open_store(tmp_path)
+    assert store.export_json() == make_memory()
+    store.close()
+
+    (tmp_path / JSON_FILE).write_text(json.dumps({'views': []}))
+    store = open_store(tmp_path)
+    assert store.export_json() == make_memory()
+    store.close()
+
+
+def test_memory_backend(tmp_path):
+    assert memory_backend(tmp_path) == 'json'
+    set_backend(tmp_path, 'sqlite')
+    assert memory_backend(tmp_path) == 'sqlite'
+    set_backend(tmp_path, '"sqlite"')
+    assert memory_backend(tmp_path) == 'sqlite'
+    set_backend(tmp_path, 'other')
+    assert memory_backend(tmp_path) == 'json'
+
+    (tmp_path / SETTINGS_FILE).write_text('not an ini file')
+    assert memory_backend(tmp_path) == 'json'
+
+
+def test_read_memory_follows_the_backend(tmp_path):
+    assert read_memory(tmp_path) is None
+
+    (tmp_path / JSON_FILE).write_text(json.dumps(make_memory()))
+    store = open_store(tmp_path)
+    store.save_custom_names({'groups': {'system': 'From store'}})
+    store.close()
+
+    # the json file is used until the sqlite backend is set
+    assert read_custom_names(tmp_path) == {
+        'groups': {'system': 'Sound card'}}
+    set_backend(tmp_path, 'sqlite')
+    assert read_custom_names(tmp_path) == {
+        'groups': {'system': 'From store'}}
+    assert read_memory(tmp_path)['views'] == make_memory()['views']
+
+
+def test_write_custom_names_in_the_store(tmp_path):
+    set_backend(tmp_path, 'sqlite')
+    (tmp_path / JSON_FILE).write_text(json.dumps(make_memory()))
+    write_custom_names(tmp_path, {'groups': {'mixer': 'Desk'}})
+
+    assert read_custom_names(tmp_path) == {'groups': {'mixer': 'Desk'}}
+    # the views imported from canvas.json are kept
+    assert read_memory(tmp_path)['views'] == make_memory()['views']
@@ -0,0 +1,122 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from process_callback import (
+    ACK, MEAN_SQUARE, PEAK, SEQ, SLOT_FIELDS, MeterBuffer, PeakMeters)
+
+
+@pytest.fixture
+def buffer():
+    buffer = MeterBuffer(4)
+    yield buffer
+    buffer.close()
+
+
+class SlotWriter:
+    '''the process callback for one slot, as the C side does'''
+
+    def __init__(self, buffer: MeterBuffer, slot: int):
+        self.buffer = buffer
+        self.base = slot * SLOT_FIELDS
+        self.peak = 0.0
+        self.sum_squares = 0.0
+        self.frames = 0
+
+    def period(self, peak: float, mean_square: float, frames: int=64):
+        uints, floats, base = self.buffer.uints, self.buffer.floats, self.base
+        seq = uints[base + SEQ]
+        if uints[base + ACK] == seq:
+            self.peak = peak
+            self.sum_squares = mean_square * frames
+            self.frames = frames
+        else:
+            self.peak = max(self.peak, peak)
+            self.sum_squares += mean_square * frames
+            self.frames += frames
+
+        uints[base + SEQ] = seq + 1
+        floats[base + PEAK] = self.peak
+        floats[base + MEAN_SQUARE] = self.sum_squares / self.frames
+        uints[base + SEQ] = seq + 2
+
+
+def test_slot_read_once(buffer):
+    SlotWriter(buffer, 1).period(0.5, 0.04)
+
+    peak, rms = buffer.read_slot(1)
+    assert peak == 0.5
+    assert rms == pytest.approx(math.sqrt(0.04))
+    assert buffer.read_slot(1) is None
+
+
+def test_periods_merged_until_read(buffer):
+    writer = SlotWriter(buffer, 0)
+    writer.period(0.5, 0.04)
+    writer.period(0.25, 0.16)
+    assert buffer.read_slot(0) == pytest.approx((0.5, math.sqrt(0.1)))
+
+    writer.period(0.25, 0.16)
+    assert buffer.read_slot(0) == pytest.approx((0.25, 0.4))
+
+
+def test_peak_written_before_the_ack_is_not_lost(buffer):
+    writer = SlotWriter(buffer, 0)
+    writer.period(0.2, 0.01)
+
+    # the reader reads the values, the process thread writes a clipping
+    # period, then the reader acknowledges what it has read.
+    seq = buffer.uints[SEQ]
+    writer.period(1.0, 0.5)
+    buffer.uints[ACK] = seq
+
+    assert buffer.read_slot(0)[0] == 1.0
+    assert buffer.read_slot(0) is None
+
+    writer.period(0.1, 0.01)
+    assert buffer.read_slot(0)[0] == pytest.approx(0.1)
+
+
+def test_slot_being_written_reads_nothing(buffer):
+    SlotWriter(buffer, 2).period(0.5, 0.04)
+    buffer.uints[2 * SLOT_FIELDS + SEQ] += 1
+    assert buffer.read_slot(2) is None
+
+
+def test_read_slots_matches_read_slot(buffer):
+    SlotWriter(buffer, 0).period(0.1, 0.01)
+    SlotWriter(buffer, 3).period(0.9, 0.25)
+    SlotWriter(buffer, 2).period(0.5, 0.04)
+    buffer.uints[2 * SLOT_FIELDS + SEQ] += 1
+
+    values = buffer.read_slots([0, 1, 2, 3])
+    assert values[1] is None
+    assert values[2] is None
+    assert values[0] == pytest.approx((0.1, 0.1))
+    assert values[3] == pytest.approx((0.9, 0.5))
+    assert buffer.read_slots([0, 3]) == [None, None]
+
+
+def test_address_is_stable(buffer):
+    assert buffer.address == buffer.address
+    assert buffer.address != 0
+
+
+def test_start_fails_if_the_buffer_is_refused():
+    started = list[bytes]()
+    meters = PeakMeters()
+    meters._lib = SimpleNamespace(
+        meters_set_buffer=lambda address, n_slots: -1,
+        meters_start=lambda name: started.append(name) or 0)
+
+    assert not meters.start('meters')
+    assert not meters.started
+    assert meters.buffer is None
+    assert started == []
+
+    meters._lib.meters_set_buffer = lambda address, n_slots: 0
+    assert meters.start('meters')
+    assert started == [b'meters']
+    assert meters.buffer is not None
+    meters.buffer.close()
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from patch_snapshots import (
+    SNAPSHOTS_DIR, PatchSnapshot, _snapshot_path, list_snapshots,
+    load_snapshot, snapshot_diff)
+
+
+def test_diff_is_minimal():
+    current = [('a:out', 'b:in'), ('a:out', 'c:in')]
+    wanted = [('a:out', 'c:in'), ('a:out', 'd:in')]
+    ports = {'a:out', 'b:in', 'c:in', 'd:in'}
+
+    assert snapshot_diff(current, wanted, ports) == (
+        [('a:out', 'b:in')], [('a:out', 'd:in')])
+
+
+def test_diff_ignores_wanted_connections_of_missing_ports():
+    current = [('a:out', 'b:in')]
+    wanted = [('a:out', 'b:in'), ('gone:out', 'b:in')]
+
+    assert snapshot_diff(current, wanted, {'a:out', 'b:in'}) == ([], [])
+
+
+def test_diff_disconnects_all_with_empty_snapshot():
+    current = [('a:out', 'c:in'), ('a:out', 'b:in')]
+    assert snapshot_diff(current, [], {'a:out', 'b:in', 'c:in'}) == (
+        [('a:out', 'b:in'), ('a:out', 'c:in')], [])
+
+
+def test_json_round_trip():
+    snapshot = PatchSnapshot(
+        'Live', [('a:out', 'b:in')], {'groups': {'a': 'Synth'}}, 12.5)
+    assert PatchSnapshot.from_json(
+        json.loads(json.dumps(snapshot.to_json()))) == snapshot
+
+
+def test_from_json_skips_invalid_connections():
+    snapshot = PatchSnapshot.from_json(
+        {'name': 'Bad', 'connections': [['a:out'], ['a:out', 'b:in']]})
+    assert snapshot.connections == [('a:out', 'b:in')]
+    assert snapshot.custom_names is None
+
+
+def test_snapshot_file_names_are_safe(tmp_path):
+    path = _snapshot_path(tmp_path, '../Live / set:1')
+    assert path.parent == tmp_path / SNAPSHOTS_DIR
+    assert '/' not in path.name
+
+    with pytest.raises(ValueError):
+        _snapshot_path(tmp_path, '')
+
+
+def test_snapshot_file_names_do_not_collide(tmp_path):
+    names = ['a/b', 'a_b', 'a:b', 'a%2Fb', 'a b', 'Élan', '..', '.']
+    paths = {_snapshot_path(tmp_path, name) for name in names}
+    assert len(paths) == len(names)
+    assert _snapshot_path(tmp_path, 'Live set-1.2').name \
+        == 'Live set-1.2.json'
+
+
+def test_load_and_list(tmp_path):
+    snapshot = PatchSnapshot('Live: set 1', [('a:out', 'b:in')])
+    path = _snapshot_path(tmp_path, snapshot.name)
+    path.parent.mkdir()
+    path.write_text(json.dumps(snapshot.to_json()))
+    (path.parent / 'broken.json').write_text('{')
+
+    assert list_snapshots(tmp_path) == ['Live: set 1']
+    assert load_snapshot(tmp_path, 'Live: set 1') == snapshot
+    # a snapshot file path can also be given
+    assert load_snapshot(tmp_path, str(path)) == snapshot
+
+
+def test_load_a_file_named_by_older_versions(tmp_path):
+    snapshot = PatchSnapshot('Live: set 1', [('a:out', 'b:in')])
+    snapshots_dir = tmp_path / SNAPSHOTS_DIR
+    snapshots_dir.mkdir()
+    (snapshots_dir / 'Live_ set 1.json').write_text(
+        json.dumps(snapshot.to_json()))
+
+    assert load_snapshot(tmp_path, 'Live: set 1') == snapshot
+    with pytest.raises(FileNotFoundError):
+        load_snapshot(tmp_path, 'Live: set 2')
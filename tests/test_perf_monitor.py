@@ -0,0 +1,68 @@
+import json
+
+from perf_monitor import N_BUCKETS, LatencyHistogram, PerfMonitor
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = LatencyHistogram()
+    for _ in range(99):
+        histogram.add(0.000_010)
+    histogram.add(0.5)
+
+    assert histogram.count == 100
+    assert histogram.max == 0.5
+    # 10 us is in the bucket [8, 16[ us
+    assert histogram.buckets[4] == 99
+    assert histogram.percentile(50) == 16 / 1_000_000
+    assert histogram.percentile(99) == 16 / 1_000_000
+    assert histogram.percentile(100) == 0.5
+
+
+def test_histogram_huge_duration_goes_to_last_bucket():
+    histogram = LatencyHistogram()
+    histogram.add(1e9)
+    assert histogram.buckets[N_BUCKETS - 1] == 1
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0.0
+    assert histogram.to_json()['mean_ms'] == 0.0
+
+
+def test_disabled_monitor_keeps_functions():
+    monitor = PerfMonitor()
+    func = lambda: None
+    assert monitor.wrap('func', func) is func
+
+
+class Flusher:
+    def __init__(self, connections: list):
+        self.calls = 0
+        # as a signal connection, keeps the bound method
+        connections.append(self.flush)
+
+    def flush(self):
+        self.calls += 1
+
+
+def test_instrument_class_measures_already_connected_methods(tmp_path):
+    monitor = PerfMonitor()
+    monitor.enable()
+    monitor.instrument_class(Flusher, ('flush', 'missing'), 'flusher.')
+
+    try:
+        connections = []
+        flusher = Flusher(connections)
+        connections[0]()
+        flusher.flush()
+    finally:
+        Flusher.flush = Flusher.flush.__wrapped__
+
+    assert flusher.calls == 2
+    assert monitor.histograms['flusher.flush'].count == 2
+
+    path = tmp_path / 'perf.json'
+    monitor.dump(str(path))
+    assert json.loads(path.read_text())['histograms'][
+        'flusher.flush']['count'] == 2
@@ -0,0 +1,136 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from qtpy.QtCore import QCoreApplication
+
+from pretty_export import PRETTY_NAME_KEY, PrettyNameExporter
+
+
+@pytest.fixture(scope='module', autouse=True)
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+class FakeWorker:
+    def __init__(self):
+        self.requests = list[SimpleNamespace]()
+
+    def write_pretty_names(self, writes):
+        request = SimpleNamespace(
+            args=(writes,), error='', failed_writes=[])
+        self.requests.append(request)
+        return request
+
+
+def make_exporter():
+    pe = SimpleNamespace(jack_running=True, metadatas={},
+                         client_name_uuids={}, ports=[])
+    worker = FakeWorker()
+    exporter = PrettyNameExporter(pe, worker)
+    applied = list[tuple[int, str, str]]()
+    exporter.applied = lambda *args: applied.append(args)
+    return exporter, pe, worker, applied
+
+
+def written(worker: FakeWorker) -> list[tuple[bool, str, str]]:
+    return [w for request in worker.requests for w in request.args[0]]
+
+
+def notify(exporter: PrettyNameExporter, pe, uuid: int, value: str) -> bool:
+    '''the engine receives a metadata change, as JACK notifies it'''
+    pe.metadatas.setdefault(uuid, {})[PRETTY_NAME_KEY] = value
+    return exporter.is_echo(uuid, PRETTY_NAME_KEY, value)
+
+
+def test_only_changed_names_are_written():
+    exporter, pe, worker, applied = make_exporter()
+    pe.metadatas[10] = {PRETTY_NAME_KEY: 'Same'}
+    exporter.queue_port('sys:a', 10, 'Same')
+    exporter.queue_port('sys:b', 11, 'New')
+    exporter.flush()
+    assert written(worker) == [(False, 'sys:b', 'New')]
+    assert applied == [(11, PRETTY_NAME_KEY, 'New')]
+
+
+def test_pending_write_is_not_sent_twice():
+    exporter, pe, worker, _ = make_exporter()
+    exporter.queue_group('client', 5, 'Client')
+    exporter.flush()
+    exporter.queue_group('client', 5, 'Client')
+    exporter.flush()
+    assert written(worker) == [(True, 'client', 'Client')]
+
+    assert notify(exporter, pe, 5, 'Client')
+    exporter.queue_group('client', 5, 'Client')
+    exporter.flush()
+    assert len(written(worker)) == 1
+
+
+def test_name_changed_by_another_client_is_written_again():
+    exporter, pe, worker, _ = make_exporter()
+    exporter.queue_port('sys:a', 10, 'Mine')
+    exporter.flush()
+    assert notify(exporter, pe, 10, 'Mine')
+
+    # another client writes its own pretty name
+    assert not notify(exporter, pe, 10, 'Theirs')
+    exporter.queue_port('sys:a', 10, 'Mine')
+    exporter.flush()
+    assert written(worker) == [(False, 'sys:a', 'Mine')] * 2
+
+
+def test_failed_write_is_rolled_back():
+    exporter, pe, worker, applied = make_exporter()
+    pe.metadatas[10] = {PRETTY_NAME_KEY: 'Old'}
+    exporter.queue_port('sys:a', 10, 'New')
+    exporter.queue_port('sys:b', 11, 'Other')
+    exporter.flush()
+
+    request = worker.requests[0]
+    request.failed_writes = [(False, 'sys:a', 'New')]
+    request.error = 'no such port'
+    exporter.write_done(request)
+
+    assert (10, PRETTY_NAME_KEY, 'Old') == applied[-1]
+    assert (11, PRETTY_NAME_KEY, 'Other') in applied
+    # not pending anymore, it can be written again
+    exporter.queue_port('sys:a', 10, 'New')
+    exporter.flush()
+    assert written(worker)[-1] == (False, 'sys:a', 'New')
+
+
+def test_request_not_executed_rolls_back_all_writes():
+    exporter, _, worker, applied = make_exporter()
+    exporter.queue_port('sys:a', 10, 'New')
+    exporter.flush()
+
+    request = worker.requests[0]
+    request.failed_writes = None
+    request.error = 'JACK is not running'
+    exporter.write_done(request)
+    assert applied == [(10, PRETTY_NAME_KEY, 'New'),
+                       (10, PRETTY_NAME_KEY, '')]
+
+
+def test_later_write_is_not_rolled_back():
+    exporter, _, worker, applied = make_exporter()
+    exporter.queue_port('sys:a', 10, 'First')
+    exporter.flush()
+    exporter.queue_port('sys:a', 10, 'Second')
+    exporter.flush()
+
+    request = worker.requests[0]
+    request.failed_writes = list(request.args[0])
+    exporter.write_done(request)
+    assert applied[-1] == (10, PRETTY_NAME_KEY, 'Second')
+
+
+def test_writes_are_not_sent_when_jack_is_stopped():
+    exporter, pe, worker, _ = make_exporter()
+    pe.jack_running = False
+    exporter.queue_port('sys:a', 10, 'New')
+    exporter.flush()
+    assert worker.requests == []
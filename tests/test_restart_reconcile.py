@@ -0,0 +1,97 @@
+from conftest import graph_state, require_offscreen
+
+
+FIRST_CONNECTIONS = {('synth:out', 'reverb:in'),
+                     ('reverb:out', 'system:playback_1')}
+
+
+def first_graph() -> dict:
+    return graph_state(
+        [('synth:out', True), ('reverb:in', False), ('reverb:out', True),
+         ('system:playback_1', False)],
+        sorted(FIRST_CONNECTIONS))
+
+
+def canvas_ports(mng) -> set[str]:
+    return {p.full_name for g in mng.groups for p in g.ports}
+
+
+def canvas_connections(mng) -> set[tuple[str, str]]:
+    return {(c.port_out.full_name, c.port_in.full_name)
+            for c in mng.connections}
+
+
+def start_and_stop(mng):
+    mng.pe.set_state(first_graph())
+    mng.server_restarted()
+    mng.server_stopped()
+    assert mng._restart_grace_timer.isActive()
+    # the canvas is kept while JACK restarts
+    assert 'synth:out' in canvas_ports(mng)
+
+
+def test_grace_covers_the_reconnection_attempts():
+    require_offscreen()
+    from jack_reconnect import RECONNECT_INTERVAL, ReconnectBackoff
+    from patchance_pb_manager import RESTART_GRACE_ATTEMPTS, RESTART_GRACE_MS
+
+    assert RESTART_GRACE_ATTEMPTS >= 3
+    assert RESTART_GRACE_MS > RECONNECT_INTERVAL + 1000 * \
+        ReconnectBackoff().max_elapsed(RESTART_GRACE_ATTEMPTS)
+
+
+def test_restart_applies_only_the_differences(offscreen_main):
+    mng = offscreen_main.patchbay_manager
+    start_and_stop(mng)
+    kept_port = mng.get_port_from_name('reverb:out')
+    kept_conn = mng.get_connection_from_names(
+        'reverb:out', 'system:playback_1')
+
+    mng.pe.set_state(graph_state(
+        [('reverb:out', True), ('system:playback_1', False),
+         ('synth:out', True), ('delay:in', False)],
+        [('reverb:out', 'system:playback_1'), ('synth:out', 'delay:in')]))
+    mng.server_restarted()
+
+    assert not mng._restart_grace_timer.isActive()
+    assert canvas_ports(mng) == {
+        'reverb:out', 'system:playback_1', 'synth:out', 'delay:in'}
+    assert canvas_connections(mng) == {
+        ('reverb:out', 'system:playback_1'), ('synth:out', 'delay:in')}
+    assert mng.get_port_from_name('reverb:out') is kept_port
+    assert mng.get_connection_from_names(
+        'reverb:out', 'system:playback_1') is kept_conn
+    assert kept_port.uuid == 1
+
+
+def test_restart_renames_a_port_with_the_same_uuid(offscreen_main):
+    mng = offscreen_main.patchbay_manager
+    start_and_stop(mng)
+    port = mng.get_port_from_name('synth:out')
+
+    mng.pe.set_state(graph_state(
+        [('synth:main_out', True), ('reverb:in', False),
+         ('reverb:out', True), ('system:playback_1', False)],
+        [('synth:main_out', 'reverb:in'),
+         ('reverb:out', 'system:playback_1')]))
+    mng.server_restarted()
+
+    assert mng.get_port_from_name('synth:main_out') is port
+    assert 'synth:out' not in canvas_ports(mng)
+    assert canvas_connections(mng) == {
+        ('synth:main_out', 'reverb:in'),
+        ('reverb:out', 'system:playback_1')}
+
+
+def test_canvas_cleared_when_the_grace_expires(offscreen_main):
+    mng = offscreen_main.patchbay_manager
+    start_and_stop(mng)
+
+    mng._restart_grace_timer.stop()
+    mng._apply_server_stopped()
+    assert canvas_ports(mng) == set()
+    assert not mng.connections
+
+    mng.pe.set_state(first_graph())
+    mng.server_restarted()
+    assert canvas_connections(mng) == FIRST_CONNECTIONS
@@ -0,0 +1,198 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from pretty_export import PRETTY_NAME_KEY
+from search_index import PatchbaySearchIndex, SearchIndex
+
+
+def test_search_is_case_insensitive_substring():
+    index = SearchIndex()
+    index.set_entry('system', '', ['system'])
+    index.set_entry('system', 'system:capture_1', ['system:capture_1'])
+    index.set_entry('Hydrogen', '', ['Hydrogen', 'Drums'])
+
+    assert sorted(index.search('CAPTURE_1')) == [
+        ('system', 'system:capture_1')]
+    assert index.search('drum') == [('Hydrogen', '')]
+    assert sorted(index.search('y')) == [
+        ('Hydrogen', ''), ('system', ''), ('system', 'system:capture_1')]
+    assert index.search('') == []
+    assert index.search('nothing') == []
+
+
+def test_long_pattern_is_verified_not_only_its_grams():
+    index = SearchIndex()
+    # contains all the 3-grams of 'abcd' but not 'abcd'
+    index.set_entry('client', '', ['abcxbcd'])
+    assert index.search('abcd') == []
+    index.set_entry('client', '', ['xabcdx'])
+    assert index.search('abcd') == [('client', '')]
+
+
+def test_set_entry_replaces_and_remove_entry_cleans():
+    index = SearchIndex()
+    index.set_entry('a', 'a:out', ['a:out', 'Left'])
+    index.set_entry('a', 'a:out', ['a:out'])
+    assert index.search('left') == []
+
+    index.remove_entry('a', 'a:out')
+    assert len(index) == 0
+    assert not index.has_ports('a')
+    assert index._postings == {}
+
+
+def test_count_matches():
+    index = SearchIndex()
+    index.set_entry('a', '', ['a'])
+    index.set_entry('a', 'a:out_1', ['a:out_1'])
+    index.set_entry('a', 'a:out_2', ['a:out_2'])
+    index.set_entry('b', '', ['b'])
+    index.set_entry('b', 'b:out', ['b:out'])
+
+    assert index.count_matches('out') == (2, 3)
+    assert index.count_matches('out_') == (1, 2)
+
+
+def test_search_groups_and_group_matches():
+    index = SearchIndex()
+    index.set_entry('a', '', ['a'])
+    index.set_entry('a', 'a:out_1', ['a:out_1', 'Left'])
+    index.set_entry('b', '', ['b', 'Bass'])
+
+    assert index.search_groups('LEFT') == {'a'}
+    assert index.search_groups('a') == {'a', 'b'}
+    assert index.group_matches('a', 'Left')
+    assert index.group_matches('b', 'bass')
+    assert not index.group_matches('b', 'left')
+    assert not index.group_matches('c', 'c')
+
+
+class FakeCustomNames:
+    def __init__(self):
+        self.groups = dict[str, str]()
+        self.ports = dict[str, str]()
+
+    def custom_group(self, name: str) -> str:
+        return self.groups.get(name, '')
+
+    def custom_port(self, name: str) -> str:
+        return self.ports.get(name, '')
+
+
+def make_port(full_name: str, uuid: int) -> SimpleNamespace:
+    return SimpleNamespace(full_name=full_name, uuid=uuid)
+
+
+def make_index() -> PatchbaySearchIndex:
+    pe = SimpleNamespace(
+        metadatas={12: {PRETTY_NAME_KEY: 'Kick'}},
+        client_name_uuids={'drums': 10})
+    groups = [SimpleNamespace(name='drums',
+                              ports=[make_port('drums:out_1', 12),
+                                     make_port('drums:out_2', 13)])]
+    mng = SimpleNamespace(pe=pe, groups=groups,
+                          custom_names=FakeCustomNames())
+    index = PatchbaySearchIndex(mng)
+    index.rebuild()
+    return index
+
+
+def test_rebuild_indexes_ports_and_pretty_names():
+    index = make_index()
+    assert len(index) == 3
+    assert index.search('kick') == [('drums', 'drums:out_1')]
+
+
+def test_pretty_name_and_custom_name_changes():
+    index = make_index()
+    index.metadata_changed(13, PRETTY_NAME_KEY, 'Snare')
+    assert index.search('snare') == [('drums', 'drums:out_2')]
+
+    index.metadata_changed(13, PRETTY_NAME_KEY, '')
+    assert index.search('snare') == []
+
+    index.mng.custom_names.groups['drums'] = 'Drum Machine'
+    index.custom_name_changed('drums')
+    assert index.search('machine') == [('drums', '')]
+
+
+def test_port_renamed_keeps_pretty_name():
+    index = make_index()
+    index.port_renamed('drums:out_1', 'drums:kick_out', 0, 'drums')
+    assert index.search('kick') == [('drums', 'drums:kick_out')]
+    assert index.search('out_1') == []
+
+
+def test_client_entry_removed_with_its_last_port():
+    index = make_index()
+    index.port_removed('drums:out_1')
+    assert ('drums', '') in index.search('drums')
+    index.port_removed('drums:out_2')
+    assert index.search('drums') == []
+    assert len(index) == 0
+
+
+def test_ports_of_one_client_in_several_groups():
+    # as a2j ports, split in one patchbay group per device
+    index = make_index()
+    index.port_added('a2j:Keys [20] (capture): in', 20, 'Keys')
+    index.port_added('a2j:Pads [24] (capture): in', 24, 'Pads')
+
+    assert index.search_groups('keys') == {'Keys'}
+    assert index.search_groups('a2j') == {'Keys', 'Pads'}
+    assert index.count_matches('a2j') == (2, 2)
+
+    index.mng.custom_names.ports['a2j:Pads [24] (capture): in'] = 'Drum pads'
+    index.custom_name_changed('a2j:Pads [24] (capture): in')
+    assert index.search_groups('drum pads') == {'Pads'}
+
+    index.port_removed('a2j:Keys [20] (capture): in')
+    assert index.search_groups('a2j') == {'Pads'}
+    assert ('Keys', '') not in index._texts
+
+
+def filtered_graph(mng):
+    from conftest import graph_state
+
+    mng.pe.set_state(graph_state(
+        [('synth:out', True), ('reverb:in', False), ('reverb:out', True),
+         ('system:playback_1', False)],
+        [('synth:out', 'reverb:in'), ('reverb:out', 'system:playback_1')]))
+    mng.server_restarted()
+
+
+def test_filter_groups_counts_as_the_base_method(offscreen_main):
+    from patchbay import PatchbayManager
+
+    mng = offscreen_main.patchbay_manager
+    filtered_graph(mng)
+    texts = ('synth', 'reverb', 'out', 'playback_1', 'nothing', '')
+    expected = [PatchbayManager.filter_groups(mng, text) for text in texts]
+    assert [mng.filter_groups(text) for text in texts] == expected
+
+
+def test_filter_groups_updates_only_the_changed_groups(offscreen_main):
+    mng = offscreen_main.patchbay_manager
+    filtered_graph(mng)
+    hidden = dict[str, bool]()
+    for group in mng.groups:
+        group.semi_hide = lambda yesno, name=group.name: \
+            hidden.__setitem__(name, yesno)
+
+    mng.filter_groups('s')
+    assert hidden == {'synth': False, 'reverb': True, 'system': False}
+
+    hidden.clear()
+    mng.filter_groups('syn')
+    assert hidden == {'system': True}
+
+    hidden.clear()
+    mng.filter_groups('synt')
+    assert hidden == {}
+
+    hidden.clear()
+    mng.filter_groups('')
+    assert hidden == {'synth': False, 'reverb': False, 'system': False}
@@ -0,0 +1,102 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+pytest.importorskip('patch_engine')
+
+from qtpy.QtCore import QCoreApplication
+
+from engine_loop import JackNeed, PeriodicJob, TickScheduler
+
+
+@pytest.fixture(scope='module', autouse=True)
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def make_job(name: str, calls: list, **kwargs) -> PeriodicJob:
+    return PeriodicJob(name, lambda: calls.append(name), **kwargs)
+
+
+def test_current_interval():
+    job = PeriodicJob('job', lambda: None, 50, 1000, idle_interval=200)
+    assert job.current_interval(True, True) == 50
+    assert job.current_interval(True, False) == 200
+    assert job.current_interval(False, True) == 1000
+
+    job.idle_interval = None
+    assert job.current_interval(True, False) == 50
+
+
+def test_jobs_run_with_their_jack_need():
+    pe = SimpleNamespace(jack_running=True)
+    scheduler = TickScheduler(pe)
+    calls = []
+    scheduler.add_job(make_job('running', calls, interval=50,
+                               hidden_interval=50))
+    scheduler.add_job(make_job('stopped', calls, interval=50,
+                               hidden_interval=50,
+                               jack_need=JackNeed.STOPPED))
+    scheduler.add_job(make_job('any', calls, interval=50,
+                               hidden_interval=50, jack_need=JackNeed.ANY))
+
+    scheduler.start()
+    assert calls == ['running', 'any']
+    # nothing is due yet
+    scheduler._run_due_jobs()
+    assert calls == ['running', 'any']
+    scheduler.stop()
+
+
+def test_disabled_and_delayed_jobs():
+    pe = SimpleNamespace(jack_running=True)
+    scheduler = TickScheduler(pe)
+    calls = []
+    scheduler.add_job(make_job('job', calls, interval=50,
+                               hidden_interval=50))
+    scheduler.set_job_enabled('job', False)
+    scheduler.start()
+    assert calls == []
+
+    scheduler.set_job_enabled('job', True)
+    scheduler._run_due_jobs()
+    assert calls == ['job']
+
+    scheduler.delay_job('job', 0)
+    scheduler._run_due_jobs()
+    assert calls == ['job', 'job']
+    scheduler.stop()
+
+
+def test_hidden_window_delays_and_shown_window_brings_back():
+    pe = SimpleNamespace(jack_running=True)
+    scheduler = TickScheduler(pe)
+    job = make_job('job', [], interval=50, hidden_interval=5000)
+    scheduler.add_job(job)
+    scheduler.start()
+    first_due = job.next_due
+
+    scheduler.set_displayed(False)
+    assert job.next_due > first_due + 4
+
+    scheduler.set_displayed(True)
+    assert job.next_due <= max(first_due, time.monotonic())
+    scheduler.stop()
+
+
+def test_failing_job_does_not_stop_the_others():
+    pe = SimpleNamespace(jack_running=True)
+    scheduler = TickScheduler(pe)
+    calls = []
+
+    def fail():
+        raise RuntimeError('job failure')
+
+    scheduler.add_job(PeriodicJob('fail', fail, 50, 50))
+    scheduler.add_job(make_job('job', calls, interval=50,
+                               hidden_interval=50))
+    scheduler.start()
+    assert calls == ['job']
+    scheduler.stop()